@@ -0,0 +1,116 @@
+"""
+Gunicorn configuration.
+
+Pick a serving profile with GUNICORN_PROFILE:
+
+- ``sync``: one request per worker process; the simplest, but a worker is
+  idle while it waits on Postgres.
+- ``gthread`` (default): a few processes with a thread pool each, so
+  requests that wait on the database overlap without extra memory.
+- ``uvicorn``: ASGI workers serving ``school_management.asgi``. Django runs
+  sync views on a single thread per worker under ASGI, so this profile
+  only pays off for async views.
+
+Every value can be overridden with the GUNICORN_* variables below. Set
+GUNICORN_RELOAD=true for development; it disables ``preload_app``.
+
+The profile response cache is only invalidated in the process that handled
+the write, so with more than one worker it needs the shared Redis cache
+(set REDIS_URL); over the per-process cache it is turned off.
+
+With more than one worker the request metrics are written to
+PROMETHEUS_MULTIPROC_DIR (a directory on tmpfs unless set) and /metrics
+sums them over all workers, including ones that were recycled.
+"""
+import glob
+import multiprocessing
+import os
+
+PROFILES = {
+    'sync': {
+        'worker_class': 'sync',
+        'wsgi_app': 'school_management.wsgi:application',
+        'workers': multiprocessing.cpu_count() * 2 + 1,
+        'threads': 1,
+    },
+    'gthread': {
+        'worker_class': 'gthread',
+        'wsgi_app': 'school_management.wsgi:application',
+        'workers': multiprocessing.cpu_count() + 1,
+        'threads': 4,
+    },
+    'uvicorn': {
+        'worker_class': 'uvicorn.workers.UvicornWorker',
+        'wsgi_app': 'school_management.asgi:application',
+        'workers': multiprocessing.cpu_count() + 1,
+        'threads': 1,
+    },
+}
+
+profile_name = os.getenv('GUNICORN_PROFILE', 'gthread')
+if profile_name not in PROFILES:
+    raise RuntimeError('Unknown GUNICORN_PROFILE %r, expected one of %s.' % (profile_name, ', '.join(PROFILES)))
+profile = PROFILES[profile_name]
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+wsgi_app = profile['wsgi_app']
+worker_class = profile['worker_class']
+workers = int(os.getenv('GUNICORN_WORKERS', profile['workers']))
+threads = int(os.getenv('GUNICORN_THREADS', profile['threads']))
+
+reload = os.getenv('GUNICORN_RELOAD', 'false').lower() == 'true'
+# Import Django once in the master so workers share its pages copy-on-write.
+preload_app = not reload
+
+# Recycle workers to bound slow memory growth; the jitter keeps them from
+# restarting at the same time.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Heartbeat files on tmpfs instead of the container's overlay filesystem.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+# Set before the application, and with it prometheus_client, is imported.
+if workers > 1:
+    os.environ.setdefault(
+        'PROMETHEUS_MULTIPROC_DIR', os.path.join(worker_tmp_dir or '/tmp', 'school_management_metrics')
+    )
+
+
+def on_starting(server):
+    # Values left by a previous run would be added to this one's.
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # Connections opened while preloading must not be shared across processes.
+    from django.db import connections
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    from school_management.account.cache import profile_cache
+
+    if worker.cfg.workers > 1 and profile_cache.is_process_local():
+        profile_cache.enabled = False
+        worker.log.warning(
+            'Profile response cache disabled: %d workers would each keep a copy of it. '
+            'Set REDIS_URL to share it between them.', worker.cfg.workers
+        )
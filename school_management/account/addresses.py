@@ -0,0 +1,111 @@
+"""
+Shared, content-addressed addresses.
+
+Users living at the same address link to one `Address` row instead of
+each getting a copy. An address is identified by `content_hash`, a hash
+of its canonical fields, which has a unique index; `Address.save` and
+`Address.objects.get_or_create_bulk` fill it in. A new address, however
+it is created, takes over the existing row with the same hash.
+
+Since other users may share it, a hashed row is never changed in place:
+`User.replace_address` moves one user's link onto the row for the new
+content instead.
+
+Rows written before the hash existed have none until
+`manage.py dedupe_addresses` hashes them, merging duplicates and moving
+their user links onto the row that is kept.
+"""
+import hashlib
+import re
+import unicodedata
+
+from django.db import router, transaction
+
+# The fields that make up an address. The type is part of the row, so
+# users sharing a row must share it too.
+ADDRESS_FIELDS = ("street", "city_area", "city", "province", "postal_code", "address_type")
+
+_whitespace = re.compile(r"\s+")
+
+
+def canonicalize(value):
+    """`value` in NFKC form, stripped and with runs of whitespace collapsed."""
+    return _whitespace.sub(" ", unicodedata.normalize("NFKC", value or "")).strip()
+
+
+def normalize_address(data):
+    """The canonical address fields of the mapping `data`."""
+    normalized = {field: canonicalize(data.get(field)) for field in ADDRESS_FIELDS}
+    normalized["postal_code"] = normalized["postal_code"].replace(" ", "").upper()
+    return normalized
+
+
+def content_hash(normalized):
+    """SHA-256 of normalized address fields, ignoring case."""
+    content = "\x1f".join(normalized[field].casefold() for field in ADDRESS_FIELDS)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def deduplicate(batch_size, progress=None):
+    """Hash the addresses that have no hash, merging duplicates.
+
+    Rows are processed oldest first, `batch_size` per transaction. The
+    first row with a hash keeps it and the others' user links are moved
+    onto it before they are deleted. Returns the number of rows hashed
+    and merged.
+    """
+    from .models import Address, User
+
+    through = User.addresses.through
+    using = router.db_for_write(Address)
+    report = progress or (lambda message: None)
+    counts = {"hashed": 0, "merged": 0, "links": 0}
+
+    while True:
+        with transaction.atomic(using=using):
+            addresses = list(
+                Address.objects.using(using).select_for_update()
+                .filter(content_hash__isnull=True).order_by("id")[:batch_size]
+            )
+            if not addresses:
+                break
+            hashes = {}
+            for address in addresses:
+                normalized = normalize_address({field: getattr(address, field) for field in ADDRESS_FIELDS})
+                hashes[address.pk] = (content_hash(normalized), normalized)
+
+            kept = dict(
+                Address.objects.using(using)
+                .filter(content_hash__in={value for value, _ in hashes.values()})
+                .values_list("content_hash", "pk")
+            )
+            hashed = []
+            merged = {}
+            for address in addresses:
+                value, normalized = hashes[address.pk]
+                if value in kept:
+                    merged[address.pk] = kept[value]
+                    continue
+                kept[value] = address.pk
+                for field, field_value in normalized.items():
+                    setattr(address, field, field_value)
+                address.content_hash = value
+                hashed.append(address)
+
+            Address.objects.using(using).bulk_update(hashed, ["content_hash", *ADDRESS_FIELDS])
+            if merged:
+                links = list(
+                    through.objects.using(using).filter(address_id__in=merged).values_list("user_id", "address_id")
+                )
+                through.objects.using(using).bulk_create(
+                    [through(user_id=user_id, address_id=merged[address_id]) for user_id, address_id in links],
+                    ignore_conflicts=True,
+                )
+                through.objects.using(using).filter(address_id__in=merged).delete()
+                Address.objects.using(using).filter(pk__in=merged).delete()
+                counts["links"] += len(links)
+
+        counts["hashed"] += len(hashed)
+        counts["merged"] += len(merged)
+        report("Hashed %d addresses, merged %d duplicates." % (counts["hashed"], counts["merged"]))
+    return counts
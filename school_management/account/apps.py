@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AccountConfig(AppConfig):
     name = 'school_management.account'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+  path('users/', async_views.AsyncUserList.as_view(), name='async-user-list'),
+  path('users/<int:pk>/', async_views.AsyncUserDetail.as_view(), name='async-user-detail'),
+  path('student_profile', async_views.AsyncStudentProfile.as_view(), name='async-student-profile'),
+  path('teacher_profile', async_views.AsyncTeacherProfile.as_view(), name='async-teacher-profile')
+]
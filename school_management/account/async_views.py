@@ -0,0 +1,206 @@
+"""
+Async implementations of the profile and user endpoints for the ASGI stack.
+
+DRF's views are synchronous, so under ASGI each request holds a thread
+from `sync_to_async` for its whole duration. These are plain Django async
+views reusing the serializers, filters, pagination and response cache of
+`views.py`: they wait on the database through the async ORM and hash
+passwords on a dedicated executor.
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.db import DEFAULT_DB_ALIAS, IntegrityError
+from django.http import HttpResponse
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status
+from rest_framework.exceptions import (
+  APIException,
+  AuthenticationFailed,
+  MethodNotAllowed,
+  NotAuthenticated,
+  NotFound,
+  ParseError,
+  ValidationError
+)
+from rest_framework.request import Request
+
+from school_management.core.conditional import make_etag, not_modified_response, set_validators
+from school_management.core.parsers import loads
+from school_management.core.renderers import FastJSONRenderer
+from . import Role
+from .authentication import AsyncJWTAuthentication
+from .cache import profile_cache
+from .filters import UserFilter
+from .models import StudentProfile, TeacherProfile, User
+from .pagination import UserPagination
+from .serializers import BulkUserSerializer, StudentProfileSerializer, TeacherProfileSerializer, UserSerializer, \
+  user_values
+from .utils import ahash_password
+from .views import get_page_validators
+
+
+class AsyncAPIView(View):
+  """
+  Authenticates with the JWT header and renders `APIException`s the way
+  DRF would, for views that are not DRF views.
+  """
+  authentication_class = AsyncJWTAuthentication
+  authentication_required = False
+  renderer = FastJSONRenderer()
+
+  @classmethod
+  def as_view(cls, **initkwargs):
+    view = super().as_view(**initkwargs)
+    # Token authentication, like DRF's views.
+    view.csrf_exempt = True
+    return view
+
+  async def dispatch(self, request, *args, **kwargs):
+    try:
+      await self.perform_authentication(request)
+      return await super().dispatch(request, *args, **kwargs)
+    except APIException as exc:
+      return self.handle_exception(exc)
+
+  def http_method_not_allowed(self, request, *args, **kwargs):
+    raise MethodNotAllowed(request.method)
+
+  async def perform_authentication(self, request):
+    authenticator = self.authentication_class()
+    result = await authenticator.aauthenticate(request)
+    request.user, request.auth = result if result is not None else (AnonymousUser(), None)
+    if self.authentication_required and not request.user.is_authenticated:
+      raise NotAuthenticated
+
+  def handle_exception(self, exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = self.render(data, exc.status_code)
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+      response['WWW-Authenticate'] = self.authentication_class().authenticate_header(self.request)
+    return response
+
+  def render(self, data, status_code=status.HTTP_200_OK):
+    return HttpResponse(self.renderer.render(data), status=status_code, content_type=self.renderer.media_type)
+
+  def parse_body(self, request):
+    try:
+      return loads(request.body)
+    except ValueError as exc:
+      raise ParseError('JSON parse error - %s' % exc)
+
+
+class AsyncProfileView(AsyncAPIView):
+  """Async counterpart of `CachedProfileMixin.retrieve`."""
+  authentication_required = True
+  profile_model = None
+  profile_kind = None
+  serializer_class = None
+  # Relations the serializer reads, fetched up front so serializing is
+  # CPU-only and never touches the ORM from the event loop.
+  prefetch = ()
+  vary_headers = ['Authorization']
+
+  async def get_object(self):
+    # Read from the primary, see `CachedProfileMixin`; the prefetches follow.
+    queryset = self.profile_model.objects.using(DEFAULT_DB_ALIAS).prefetch_related(*self.prefetch)
+    try:
+      return await queryset.aget(user_id=self.request.user.pk)
+    except self.profile_model.DoesNotExist:
+      raise NotFound
+
+  async def get(self, request, *args, **kwargs):
+    version, entry = await profile_cache.aget(self.profile_kind, request.user.pk)
+    cache_status = 'HIT'
+    if entry is None:
+      cache_status = 'MISS'
+      profile = await self.get_object()
+      etag = make_etag(self.profile_kind, profile.pk, profile.modified)
+      not_modified = not_modified_response(request, etag, profile.modified, self.vary_headers)
+      if not_modified is not None:
+        return not_modified
+
+      entry = {
+        'data': self.serializer_class(profile).data,
+        'etag': etag,
+        'last_modified': profile.modified,
+      }
+      await profile_cache.aset(self.profile_kind, request.user.pk, version, entry)
+    else:
+      not_modified = not_modified_response(request, entry['etag'], entry['last_modified'], self.vary_headers)
+      if not_modified is not None:
+        not_modified['X-Cache'] = cache_status
+        return not_modified
+
+    response = self.render(entry['data'])
+    response['X-Cache'] = cache_status
+    return set_validators(response, entry['etag'], entry['last_modified'], self.vary_headers)
+
+
+class AsyncStudentProfile(AsyncProfileView):
+  profile_model = StudentProfile
+  profile_kind = Role.STUDENT
+  serializer_class = StudentProfileSerializer
+  prefetch = ('subjects',)
+
+
+class AsyncTeacherProfile(AsyncProfileView):
+  profile_model = TeacherProfile
+  profile_kind = Role.TEACHER
+  serializer_class = TeacherProfileSerializer
+  prefetch = ('students', 'subjects')
+
+
+class AsyncUserList(AsyncAPIView):
+  filterset_class = UserFilter
+
+  async def get(self, request, *args, **kwargs):
+    drf_request = Request(request)
+    queryset = DjangoFilterBackend().filter_queryset(drf_request, User.objects.all(), self)
+    paginator = UserPagination()
+    page_queryset = paginator.get_page_queryset(user_values.values(queryset, 'id', 'modified'), drf_request)
+    page = paginator.paginate_rows([row async for row in page_queryset])
+
+    etag, last_modified = get_page_validators(request, paginator, page)
+    not_modified = not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+      return not_modified
+
+    data = paginator.get_paginated_data(user_values.to_representation(page))
+    return set_validators(self.render(data), etag, last_modified)
+
+  async def post(self, request, *args, **kwargs):
+    serializer = BulkUserSerializer(data=self.parse_body(request))
+    serializer.is_valid(raise_exception=True)
+    data = dict(serializer.validated_data)
+    email = User.objects.normalize_email(data.pop('email'))
+    duplicate = ValidationError({'email': ['user with this email already exists.']})
+    if await User.objects.filter(email=email).aexists():
+      raise duplicate
+
+    password = await ahash_password(data.pop('password'))
+    try:
+      user = await User.objects.acreate(email=email, password=password, **data)
+    except IntegrityError:
+      raise duplicate
+
+    # Create blank role profiles
+    if user.role == Role.STUDENT:
+      await StudentProfile.objects.acreate(user=user)
+    elif user.role == Role.TEACHER:
+      await TeacherProfile.objects.acreate(user=user)
+
+    return self.render(UserSerializer(user).data, status.HTTP_201_CREATED)
+
+
+class AsyncUserDetail(AsyncAPIView):
+  async def get(self, request, pk, *args, **kwargs):
+    try:
+      user = await User.objects.aget(pk=pk)
+    except User.DoesNotExist:
+      raise NotFound
+
+    etag = make_etag(user.pk, user.modified)
+    not_modified = not_modified_response(request, etag, user.modified)
+    if not_modified is not None:
+      return not_modified
+    return set_validators(self.render(UserSerializer(user).data), etag, user.modified)
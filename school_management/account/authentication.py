@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.models import TokenUser
+
+
+class ClaimsUser(TokenUser):
+    """
+    A user built from the claims added by the token endpoints. The claims
+    are read from the user row whenever an access token is issued, so they
+    lag behind it by at most one access token lifetime.
+    """
+
+    @property
+    def role(self):
+        return self.token.get("role", "")
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates without a `User` query when the token carries the role
+    claims; older tokens fall back to the regular database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if "role" not in validated_token:
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
+
+
+class AsyncJWTAuthentication(ClaimsJWTAuthentication):
+    """
+    JWT authentication for the async views. Decoding the token is CPU-only;
+    the `User` lookup, when the token needs one, goes through the async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if settings.JWT_STATELESS_AUTH and "role" in validated_token:
+            return ClaimsUser(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
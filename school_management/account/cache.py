@@ -0,0 +1,114 @@
+"""
+Per-user cache of the profile endpoint responses.
+
+Entries are stored under a per-user version token. Invalidating a profile
+replaces its token once the writing transaction commits, so a response
+computed from data read before the commit can never be served afterwards.
+Tokens are random rather than counters: a version key the cache evicts is
+replaced by a new token, so the entries stored under the lost one are
+never served again.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from school_management.core.metrics import registry
+
+registry.counter("profile_cache_hits", "Profile response cache hits.")
+registry.counter("profile_cache_misses", "Profile response cache misses.")
+registry.counter("profile_cache_invalidations", "Profile response cache invalidations.")
+
+
+class ProfileResponseCache:
+    def __init__(self, alias=None):
+        self.alias = alias
+        # Cleared by servers running several processes over a cache each
+        # process has its own copy of, see `is_process_local`.
+        self.enabled = True
+
+    @property
+    def cache(self):
+        return caches[self.alias or settings.PROFILE_CACHE_ALIAS]
+
+    def is_process_local(self):
+        """Whether each process has its own copy of the cache.
+
+        Invalidations only reach the copy of the process that handled the
+        write, so such a cache must not be shared by several workers.
+        """
+        return isinstance(self.cache, LocMemCache)
+
+    def _count(self, name, amount=1):
+        registry.inc("profile_cache_%s" % name, amount)
+
+    def _version_key(self, kind, user_id):
+        return "profile:%s:%s:version" % (kind, user_id)
+
+    def _data_key(self, kind, user_id, version):
+        return "profile:%s:%s:%s" % (kind, user_id, version)
+
+    def _version(self, kind, user_id):
+        version = uuid.uuid4().hex
+        version_key = self._version_key(kind, user_id)
+        if not self.cache.add(version_key, version, None):
+            version = self.cache.get(version_key, version)
+        return version
+
+    def get(self, kind, user_id):
+        """Return `(version, data)`; `data` is None on a miss."""
+        if not self.enabled:
+            self._count("misses")
+            return None, None
+        version = self._version(kind, user_id)
+        data = self.cache.get(self._data_key(kind, user_id, version))
+        self._count("hits" if data is not None else "misses")
+        return version, data
+
+    def set(self, kind, user_id, version, data):
+        if not self.enabled:
+            return
+        self.cache.set(self._data_key(kind, user_id, version), data, settings.PROFILE_CACHE_TIMEOUT)
+
+    async def _aversion(self, kind, user_id):
+        version = uuid.uuid4().hex
+        version_key = self._version_key(kind, user_id)
+        if not await self.cache.aadd(version_key, version, None):
+            version = await self.cache.aget(version_key, version)
+        return version
+
+    async def aget(self, kind, user_id):
+        """`get` for async views, which must not block the event loop on the cache."""
+        if not self.enabled:
+            self._count("misses")
+            return None, None
+        version = await self._aversion(kind, user_id)
+        data = await self.cache.aget(self._data_key(kind, user_id, version))
+        self._count("hits" if data is not None else "misses")
+        return version, data
+
+    async def aset(self, kind, user_id, version, data):
+        if not self.enabled:
+            return
+        await self.cache.aset(self._data_key(kind, user_id, version), data, settings.PROFILE_CACHE_TIMEOUT)
+
+    def invalidate(self, kind, user_ids):
+        """Drop the cached responses of `user_ids` when the transaction commits."""
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if user_ids and self.enabled:
+            transaction.on_commit(lambda: self._bump(kind, user_ids))
+
+    def _bump(self, kind, user_ids):
+        cache = self.cache
+        for user_id in user_ids:
+            version_key = self._version_key(kind, user_id)
+            version = cache.get(version_key)
+            cache.set(version_key, uuid.uuid4().hex, None)
+            if version is not None:
+                cache.delete(self._data_key(kind, user_id, version))
+        self._count("invalidations", len(user_ids))
+
+
+profile_cache = ProfileResponseCache()
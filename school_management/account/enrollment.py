@@ -0,0 +1,141 @@
+from collections import defaultdict
+
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+
+from school_management.subject.scheduling import IntervalIndex, subject_interval
+from .signals import collect_profile_changes
+
+
+def _link_fields(relation):
+    """Return the through model and its source/target id attributes."""
+    field = relation.field
+    through = relation.through
+    source = through._meta.get_field(field.m2m_field_name()).attname
+    target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+    return through, source, target
+
+
+def _existing_pairs(through, source, target, sources, targets):
+    return set(through.objects.filter(**{
+        source + "__in": [instance.pk for instance in sources],
+        target + "__in": [instance.pk for instance in targets],
+    }).values_list(source, target))
+
+
+def _send_m2m_changed(relation, action, instance, pk_set, using):
+    m2m_changed.send(
+        sender=relation.through,
+        action=action,
+        instance=instance,
+        reverse=False,
+        model=relation.field.related_model,
+        pk_set=pk_set,
+        using=using,
+    )
+
+
+def add_links(relation, sources, targets):
+    """Link every instance in `sources` to every instance in `targets`.
+
+    `relation` is a forward many-to-many descriptor such as
+    `StudentProfile.subjects`. Only the missing rows are inserted, with a
+    single `bulk_create` on the through table, and `m2m_changed` is sent
+    per source exactly as `add()` would; the profile changes it signals
+    are applied once for all sources. Returns the number of new links.
+    """
+    through, source, target = _link_fields(relation)
+    using = router.db_for_write(through)
+
+    with transaction.atomic(using=using, savepoint=False), collect_profile_changes():
+        existing = _existing_pairs(through, source, target, sources, targets)
+        added = {}
+        for instance in sources:
+            pk_set = {
+                target_instance.pk for target_instance in targets
+                if (instance.pk, target_instance.pk) not in existing
+            }
+            if pk_set:
+                added[instance] = pk_set
+
+        for instance, pk_set in added.items():
+            _send_m2m_changed(relation, "pre_add", instance, pk_set, using)
+        through.objects.using(using).bulk_create([
+            through(**{source: instance.pk, target: target_pk})
+            for instance, pk_set in added.items()
+            for target_pk in pk_set
+        ], ignore_conflicts=True)
+        for instance, pk_set in added.items():
+            _send_m2m_changed(relation, "post_add", instance, pk_set, using)
+
+    return sum(len(pk_set) for pk_set in added.values())
+
+
+def remove_links(relation, sources, targets):
+    """Unlink every instance in `sources` from every instance in `targets`.
+
+    The links are removed with a single DELETE on the through table and
+    `m2m_changed` is sent per source for the links that existed, with the
+    profile changes applied once as in `add_links`. Returns the number of
+    removed links.
+    """
+    through, source, target = _link_fields(relation)
+    using = router.db_for_write(through)
+
+    with transaction.atomic(using=using, savepoint=False), collect_profile_changes():
+        existing = _existing_pairs(through, source, target, sources, targets)
+        removed = {}
+        for instance in sources:
+            pk_set = {
+                target_instance.pk for target_instance in targets
+                if (instance.pk, target_instance.pk) in existing
+            }
+            if pk_set:
+                removed[instance] = pk_set
+
+        for instance, pk_set in removed.items():
+            _send_m2m_changed(relation, "pre_remove", instance, pk_set, using)
+        if removed:
+            through.objects.using(using).filter(**{
+                source + "__in": [instance.pk for instance in removed],
+                target + "__in": [instance.pk for instance in targets],
+            }).delete()
+        for instance, pk_set in removed.items():
+            _send_m2m_changed(relation, "post_remove", instance, pk_set, using)
+
+    return sum(len(pk_set) for pk_set in removed.values())
+
+
+def find_schedule_conflicts(relation, sources, subjects):
+    """Check adding `subjects` to every source against their timetables.
+
+    `relation` is a forward many-to-many to `Subject`, such as
+    `StudentProfile.subjects`. The current timetables of all sources are
+    read in one query and each new subject is checked in O(log n). Returns
+    `(source, new_subject_id, conflicting_subject_id)` tuples.
+    """
+    through, source, target = _link_fields(relation)
+    subject_field = relation.field.m2m_reverse_field_name()
+    timetables = defaultdict(list)
+    rows = through.objects.filter(**{
+        source + "__in": [instance.pk for instance in sources]
+    }).values_list(
+        source, target, subject_field + "__schedule", subject_field + "__duration"
+    )
+    for source_id, subject_id, schedule, duration in rows:
+        timetables[source_id].append((schedule, schedule + duration, subject_id))
+
+    new_intervals = sorted(subject_interval(subject) for subject in subjects)
+    conflicts = []
+    for instance in sources:
+        enrolled = {interval[2] for interval in timetables[instance.pk]}
+        index = IntervalIndex(timetables[instance.pk])
+        for start, end, subject_id in new_intervals:
+            if subject_id in enrolled:
+                continue
+            overlap = index.find_overlap(start, end)
+            if overlap is not None:
+                conflicts.append((instance, subject_id, overlap[2]))
+            else:
+                index.add(start, end, subject_id)
+    return conflicts
@@ -0,0 +1,97 @@
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from school_management.subject.models import Subject
+from .models import StudentProfile, User
+
+EXPORT_FIELDS = [
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "age",
+    "sex",
+    "contact_number",
+    "role",
+    "mother_name",
+    "father_name",
+    "subjects",
+    "students",
+]
+
+
+def get_export_queryset(queryset=None):
+    """Users with their profiles joined and the M2M ids prefetched per chunk."""
+    queryset = queryset if queryset is not None else User.objects.all()
+    return queryset.select_related(
+        "student_profile", "teacher_profile"
+    ).prefetch_related(
+        Prefetch("student_profile__subjects", queryset=Subject.objects.only("id")),
+        Prefetch("teacher_profile__subjects", queryset=Subject.objects.only("id")),
+        Prefetch("teacher_profile__students", queryset=StudentProfile.objects.only("id")),
+    ).order_by("id")
+
+
+def export_records(queryset, chunk_size):
+    """Yield one flat record per user, reading `chunk_size` users at a time.
+
+    `iterator()` keeps only the current chunk in memory and runs the
+    prefetch queries once per chunk.
+    """
+    for user in queryset.iterator(chunk_size=chunk_size):
+        student_profile = getattr(user, "student_profile", None)
+        teacher_profile = getattr(user, "teacher_profile", None)
+        profile = student_profile or teacher_profile
+
+        yield {
+            "id": user.id,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "age": user.age,
+            "sex": user.sex,
+            "contact_number": str(user.contact_number) if user.contact_number else "",
+            "role": user.role,
+            "mother_name": student_profile.mother_name if student_profile else "",
+            "father_name": student_profile.father_name if student_profile else "",
+            "subjects": [subject.id for subject in profile.subjects.all()] if profile else [],
+            "students": [student.id for student in teacher_profile.students.all()] if teacher_profile else [],
+        }
+
+
+class _Echo:
+    """File-like object whose `write` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _buffered(lines, size):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_csv(records, buffer_size=500):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(EXPORT_FIELDS)
+        for record in records:
+            record["subjects"] = ";".join(map(str, record["subjects"]))
+            record["students"] = ";".join(map(str, record["students"]))
+            yield writer.writerow([record[field] for field in EXPORT_FIELDS])
+
+    return _buffered(lines(), buffer_size)
+
+
+def stream_ndjson(records, buffer_size=500):
+    lines = (json.dumps(record) + "\n" for record in records)
+    return _buffered(lines, buffer_size)
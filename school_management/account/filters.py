@@ -0,0 +1,26 @@
+import django_filters
+from django.db.models import Exists, OuterRef
+
+from school_management.core import GradeLevel
+from . import Role, Sex
+from .models import StudentProfile, User
+
+
+class UserFilter(django_filters.FilterSet):
+  role = django_filters.ChoiceFilter(choices=Role.CHOICES)
+  sex = django_filters.ChoiceFilter(choices=Sex.CHOICES)
+  age_min = django_filters.NumberFilter(field_name='age', lookup_expr='gte')
+  age_max = django_filters.NumberFilter(field_name='age', lookup_expr='lte')
+  grade_level = django_filters.ChoiceFilter(choices=GradeLevel.CHOICES, method='filter_grade_level')
+
+  class Meta:
+    model = User
+    fields = ['role', 'sex', 'age_min', 'age_max', 'grade_level']
+
+  def filter_grade_level(self, queryset, name, value):
+    # A semi-join keeps one row per user without a DISTINCT over the page.
+    enrollments = StudentProfile.subjects.through.objects.filter(
+      studentprofile__user_id=OuterRef('pk'),
+      subject__grade_level=value
+    )
+    return queryset.filter(Exists(enrollments))
@@ -0,0 +1,717 @@
+"""
+Bulk onboarding of a school from CSV files.
+
+The files are loaded into staging tables (`COPY` on PostgreSQL, batched
+`executemany` on SQLite), validated and resolved against the existing
+rows with set-wise SQL, and then inserted with one `INSERT ... SELECT`
+per table, except addresses, which are hashed in chunks and shared with
+equal existing ones (see `account.addresses`). Passwords are hashed in chunks on a process pool, unless the
+file carries Django password hashes already or `unusable_passwords` is
+set. Validation rejects rows with values longer than their columns allow
+and student enrollments that overlap another subject of the student.
+
+Every step is idempotent and recorded in a JSON checkpoint file, so an
+interrupted import resumes where it stopped. The staged users hold the
+plaintext passwords until they are hashed, so a run that ends before
+that drops the staging tables and the next one starts over from the
+files.
+
+CSV columns (a header row is required, extra columns are rejected):
+
+- users: email, first_name, last_name, age, sex, role, contact_number,
+  password, password_hash
+- addresses: email, street, city_area, city, province, postal_code,
+  address_type
+- subjects: key, name, schedule, duration (minutes), course, grade_level
+- enrollments: email, subject (a subjects `key`); students and teachers
+  are linked to the subject according to the user's role
+"""
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from itertools import groupby
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from school_management.core import GradeLevel
+from school_management.subject.models import Subject
+from school_management.subject.scheduling import find_conflicts
+from . import AddressType, Role, Sex
+from .addresses import ADDRESS_FIELDS
+from .cache import profile_cache
+from .models import Address, StudentProfile, TeacherProfile, User
+from .search import rebuild_index
+from .utils import hash_password
+
+SOURCES = {
+    "users": (
+        ["email", "first_name", "last_name", "age", "sex", "role", "contact_number", "password", "password_hash"],
+        ["email"],
+    ),
+    "addresses": (
+        ["email", "street", "city_area", "city", "province", "postal_code", "address_type"],
+        ["email", "city_area", "city", "province", "postal_code", "address_type"],
+    ),
+    "subjects": (
+        ["key", "name", "schedule", "duration", "course", "grade_level"],
+        ["key", "name", "schedule"],
+    ),
+    "enrollments": (
+        ["email", "subject"],
+        ["email", "subject"],
+    ),
+}
+
+STEPS = ["stage", "validate", "hash", "users", "profiles", "addresses", "subjects", "enrollments", "search", "cleanup"]
+
+STAGING_PREFIX = "import_school_"
+
+# Models whose field lengths bound the staged columns of the same name.
+LENGTH_CHECKED = {"users": User, "addresses": Address, "subjects": Subject}
+
+# Password value Django treats as unusable (see `is_password_usable`).
+UNUSABLE_PASSWORD = "!"
+
+VENDOR_SQL = {
+    "postgresql": {
+        "id_column": "id BIGSERIAL PRIMARY KEY",
+        "not_integer": "{column} !~ '^[0-9]+$'",
+        "not_datetime": "{column} !~ '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}[ T][0-9]{{2}}:[0-9]{{2}}'",
+        "datetime": "CAST({column} AS TIMESTAMP WITH TIME ZONE)",
+        "minutes": "make_interval(mins => CAST({column} AS INTEGER))",
+        "normalize_email": "split_part({column}, '@', 1) || '@' || lower(split_part({column}, '@', 2))",
+    },
+    "sqlite": {
+        "id_column": "id INTEGER PRIMARY KEY",
+        "not_integer": "({column} = '' OR {column} GLOB '*[^0-9]*')",
+        # Schedules are parsed while staging; unparseable ones are staged as NULL.
+        "not_datetime": "{column} IS NULL",
+        "datetime": "{column}",
+        "minutes": "CAST({column} AS INTEGER) * 60000000",
+        "normalize_email": (
+            "substr({column}, 1, instr({column}, '@')) || lower(substr({column}, instr({column}, '@') + 1))"
+        ),
+    },
+}
+
+
+def _setup_worker():
+    # Workers started with "spawn" import the project from scratch.
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+class SchoolImporter:
+    def __init__(self, sources, checkpoint_path, workers=None, hash_chunk_size=2000, unusable_passwords=False,
+                 progress=None):
+        """
+        `sources` maps source names from SOURCES to CSV paths; `users` is
+        required. `progress` is called with a message after each step.
+        """
+        if "users" not in sources:
+            raise ValueError("A users file is required.")
+        unknown = set(sources) - set(SOURCES)
+        if unknown:
+            raise ValueError("Unknown sources: %s." % ", ".join(sorted(unknown)))
+        if connection.vendor not in VENDOR_SQL:
+            raise ValueError("Importing is supported on PostgreSQL and SQLite, not %s." % connection.vendor)
+
+        self.sources = {name: os.path.abspath(path) for name, path in sources.items()}
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers or settings.PASSWORD_HASHING_WORKERS
+        self.hash_chunk_size = hash_chunk_size
+        self.unusable_passwords = unusable_passwords
+        self.report = progress or (lambda message: None)
+        self.vendor_sql = VENDOR_SQL[connection.vendor]
+        self.tables = self._table_names()
+        self.state = None
+
+    # Checkpoints
+
+    def _fingerprint(self):
+        fingerprint = {}
+        for name, path in sorted(self.sources.items()):
+            stat = os.stat(path)
+            fingerprint[name] = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime}
+        return fingerprint
+
+    def _load_checkpoint(self, restart):
+        fingerprint = self._fingerprint()
+        if os.path.exists(self.checkpoint_path) and not restart:
+            with open(self.checkpoint_path) as checkpoint_file:
+                state = json.load(checkpoint_file)
+            if state["sources"] != fingerprint or state["unusable_passwords"] != self.unusable_passwords:
+                raise ValueError(
+                    "The checkpoint %s belongs to other files or options; "
+                    "pass restart to start over." % self.checkpoint_path
+                )
+            self.report("Resuming after step %s." % (state["done"][-1] if state["done"] else "(none)"))
+            return state
+        return {
+            "sources": fingerprint,
+            "unusable_passwords": self.unusable_passwords,
+            "done": [],
+            "hashed_through": 0,
+            "counts": {},
+            "errors": {},
+        }
+
+    def _save_checkpoint(self):
+        temporary_path = self.checkpoint_path + ".tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(self.state, checkpoint_file, indent=2)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    # SQL helpers
+
+    def _table_names(self):
+        quote = connection.ops.quote_name
+        tables = {
+            "user": User._meta.db_table,
+            "address": Address._meta.db_table,
+            "user_addresses": User.addresses.through._meta.db_table,
+            "student": StudentProfile._meta.db_table,
+            "teacher": TeacherProfile._meta.db_table,
+            "subject": Subject._meta.db_table,
+            "student_subjects": StudentProfile.subjects.through._meta.db_table,
+            "teacher_subjects": TeacherProfile.subjects.through._meta.db_table,
+            "subject_ids": STAGING_PREFIX + "subject_ids",
+            "address_ids": STAGING_PREFIX + "address_ids",
+        }
+        tables.update({"stage_" + name: STAGING_PREFIX + name for name in SOURCES})
+        return {name: quote(table) for name, table in tables.items()}
+
+    def _sql(self, template, **snippets):
+        """Fill in the table names and the vendor specific `snippets`."""
+        values = dict(self.tables)
+        for name, (snippet, column) in snippets.items():
+            values[name] = self.vendor_sql[snippet].format(column=column)
+        return template.format(**values)
+
+    def _execute(self, template, params=(), **snippets):
+        with connection.cursor() as cursor:
+            cursor.execute(self._sql(template, **snippets), list(params))
+            return cursor.rowcount
+
+    def _fetch(self, template, params=(), **snippets):
+        with connection.cursor() as cursor:
+            cursor.execute(self._sql(template, **snippets), list(params))
+            return cursor.fetchall()
+
+    def _count(self, name, value):
+        self.state["counts"][name] = self.state["counts"].get(name, 0) + max(value, 0)
+
+    # Running
+
+    def run(self, restart=False, until=None):
+        """Run the remaining steps, stopping after `until` if given."""
+        self.state = self._load_checkpoint(restart)
+        if restart:
+            self._drop_staging()
+        try:
+            for step in STEPS:
+                if step in self.state["done"]:
+                    continue
+                started = time.monotonic()
+                getattr(self, "step_" + step)()
+                self.state["done"].append(step)
+                if step != "cleanup":
+                    self._save_checkpoint()
+                elif os.path.exists(self.checkpoint_path):
+                    os.remove(self.checkpoint_path)
+                self.report("%s done in %.1fs." % (step, time.monotonic() - started))
+                if step == until:
+                    break
+        finally:
+            if "hash" not in self.state["done"]:
+                # Plaintext passwords must not outlive the run.
+                self._drop_staging()
+                if os.path.exists(self.checkpoint_path):
+                    os.remove(self.checkpoint_path)
+        return self.state
+
+    def _drop_staging(self):
+        for name in list(SOURCES) + ["subject_ids", "address_ids"]:
+            self._execute("DROP TABLE IF EXISTS %s" % connection.ops.quote_name(STAGING_PREFIX + name))
+
+    # Staging
+
+    def step_stage(self):
+        for name, path in self.sources.items():
+            columns, required = SOURCES[name]
+            with open(path, newline="", encoding="utf-8") as source:
+                header = [column.strip() for column in next(csv.reader(source), [])]
+                unknown = set(header) - set(columns)
+                missing = set(required) - set(header)
+                if unknown or missing:
+                    raise ValueError("%s: unknown columns %s, missing columns %s." % (
+                        path, sorted(unknown) or "none", sorted(missing) or "none"
+                    ))
+
+                table = self.tables["stage_" + name]
+                definitions = [self.vendor_sql["id_column"]]
+                definitions += ["%s TEXT" % connection.ops.quote_name(column) for column in columns]
+                definitions += ["error TEXT", "existing INTEGER"]
+                if name == "addresses":
+                    definitions.append("content_hash TEXT")
+                self._execute("DROP TABLE IF EXISTS %s" % table)
+                self._execute("CREATE TABLE %s (%s)" % (table, ", ".join(definitions)))
+
+                source.seek(0)
+                if connection.vendor == "postgresql":
+                    rows = self._copy(source, table, header)
+                else:
+                    rows = self._insert_batches(source, table, header, name)
+            self.state["counts"]["staged_" + name] = rows
+            self.report("Staged %d %s rows." % (rows, name))
+
+    def _copy(self, source, table, header):
+        quoted = ", ".join(connection.ops.quote_name(column) for column in header)
+        with connection.cursor() as cursor:
+            cursor.copy_expert("COPY %s (%s) FROM STDIN WITH (FORMAT csv, HEADER true)" % (table, quoted), source)
+            cursor.execute("SELECT COUNT(*) FROM %s" % table)
+            return cursor.fetchone()[0]
+
+    def _insert_batches(self, source, table, header, name):
+        quoted = ", ".join(connection.ops.quote_name(column) for column in header)
+        statement = "INSERT INTO %s (%s) VALUES (%s)" % (table, quoted, ", ".join(["%s"] * len(header)))
+        schedule = header.index("schedule") if name == "subjects" else None
+        reader = csv.reader(source)
+        next(reader)
+
+        rows = 0
+        batch = []
+        with connection.cursor() as cursor:
+            for row in reader:
+                # Empty fields are NULL, as with COPY.
+                values = [value if value != "" else None for value in row[:len(header)]]
+                values += [None] * (len(header) - len(values))
+                if schedule is not None:
+                    values[schedule] = self._adapt_datetime(values[schedule])
+                batch.append(values)
+                if len(batch) >= settings.BULK_CREATE_BATCH_SIZE:
+                    cursor.executemany(statement, batch)
+                    rows += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(statement, batch)
+                rows += len(batch)
+        return rows
+
+    def _adapt_datetime(self, value):
+        parsed = parse_datetime(value.strip()) if value else None
+        if parsed is None:
+            return None
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return connection.ops.adapt_datetimefield_value(parsed)
+
+    # Validation
+
+    def _mark(self, source, error, condition, params=(), **snippets):
+        return self._execute(
+            "UPDATE {stage_%s} SET error = %%s WHERE error IS NULL AND (%s)" % (source, condition),
+            [error, *params],
+            **snippets
+        )
+
+    def step_validate(self):
+        if "users" in self.sources:
+            self._execute("UPDATE {stage_users} SET email = TRIM(email) WHERE email IS NOT NULL")
+            self._mark("users", "invalid email", "email IS NULL OR email NOT LIKE '%%_@_%%'")
+            self._execute(
+                "UPDATE {stage_users} SET email = {normalized} WHERE error IS NULL",
+                normalized=("normalize_email", "email")
+            )
+            self._mark("users", "missing name", "first_name IS NULL OR last_name IS NULL")
+            self._mark("users", "invalid sex", "sex IS NULL OR sex NOT IN (%s, %s)", [Sex.MALE, Sex.FEMALE])
+            roles = [role for role, _ in Role.CHOICES]
+            self._mark(
+                "users", "invalid role",
+                "role IS NOT NULL AND role NOT IN (%s)" % ", ".join(["%s"] * len(roles)),
+                roles
+            )
+            self._mark("users", "invalid age", "age IS NOT NULL AND {not_integer}", not_integer=("not_integer", "age"))
+            self._mark("users", "invalid contact number", "contact_number IS NOT NULL AND contact_number NOT LIKE '+%%'")
+            self._mark(
+                "users", "duplicate email in file",
+                "id NOT IN (SELECT MIN(id) FROM {stage_users} WHERE error IS NULL GROUP BY email)"
+            )
+            self._execute(
+                "UPDATE {stage_users} SET existing = 1 WHERE error IS NULL "
+                "AND EXISTS (SELECT 1 FROM {user} u WHERE u.email = {stage_users}.email)"
+            )
+
+        if "addresses" in self.sources:
+            self._execute("UPDATE {stage_addresses} SET email = TRIM(email) WHERE email IS NOT NULL")
+            self._execute(
+                "UPDATE {stage_addresses} SET email = {normalized} WHERE email IS NOT NULL",
+                normalized=("normalize_email", "email")
+            )
+            self._mark(
+                "addresses", "missing field",
+                "email IS NULL OR city_area IS NULL OR city IS NULL OR province IS NULL OR postal_code IS NULL"
+            )
+            types = [address_type for address_type, _ in AddressType.CHOICES]
+            self._mark(
+                "addresses", "invalid address type",
+                "address_type IS NULL OR address_type NOT IN (%s)" % ", ".join(["%s"] * len(types)),
+                types
+            )
+
+        if "subjects" in self.sources:
+            self._mark("subjects", "missing key or name", "{stage_subjects}.key IS NULL OR name IS NULL")
+            self._mark(
+                "subjects", "invalid schedule", "{not_datetime}",
+                not_datetime=("not_datetime", "schedule")
+            )
+            self._mark(
+                "subjects", "invalid duration", "duration IS NOT NULL AND {not_integer}",
+                not_integer=("not_integer", "duration")
+            )
+            levels = [level for level, _ in GradeLevel.CHOICES]
+            self._mark(
+                "subjects", "invalid grade level",
+                "grade_level IS NOT NULL AND grade_level NOT IN (%s)" % ", ".join(["%s"] * len(levels)),
+                levels
+            )
+            self._mark(
+                "subjects", "duplicate key in file",
+                "id NOT IN (SELECT MIN(id) FROM {stage_subjects} WHERE error IS NULL GROUP BY {stage_subjects}.key)"
+            )
+
+        if "enrollments" in self.sources:
+            self._execute("UPDATE {stage_enrollments} SET email = TRIM(email) WHERE email IS NOT NULL")
+            self._execute(
+                "UPDATE {stage_enrollments} SET email = {normalized} WHERE email IS NOT NULL",
+                normalized=("normalize_email", "email")
+            )
+            self._mark("enrollments", "missing email or subject", "email IS NULL OR subject IS NULL")
+
+        self._mark_too_long()
+        if "enrollments" in self.sources and "subjects" in self.sources:
+            self._mark_schedule_conflicts()
+
+        for name in self.sources:
+            rows = self._fetch(
+                "SELECT id, error FROM {stage_%s} WHERE error IS NOT NULL ORDER BY id" % name
+            )
+            self.state["errors"][name] = {
+                "count": len(rows),
+                # The staging id is the data row number; the header is line 1.
+                "examples": ["line %d: %s" % (row_id + 1, error) for row_id, error in rows[:20]],
+            }
+
+    def _mark_too_long(self):
+        for name, model in LENGTH_CHECKED.items():
+            if name not in self.sources:
+                continue
+            for column in SOURCES[name][0]:
+                try:
+                    max_length = model._meta.get_field(column).max_length
+                except FieldDoesNotExist:
+                    continue
+                if max_length and column != "password":
+                    self._mark(
+                        name, "%s longer than %d characters" % (column, max_length),
+                        "LENGTH(%s) > %%s" % connection.ops.quote_name(column), [max_length]
+                    )
+
+    def _staged_datetime(self, value):
+        # Both vendors read schedules without an offset as UTC.
+        parsed = parse_datetime(value) if isinstance(value, str) else value
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+
+    def _mark_schedule_conflicts(self):
+        """Reject student enrollments that overlap another of the student's subjects.
+
+        The subjects a student is enrolled in already come first and the
+        file's rows follow in order; a row is rejected when it overlaps one
+        kept before it, as the enrollment endpoints would reject it.
+        """
+        default_duration = Subject._meta.get_field("duration").default
+        rows = []
+        for row_id, email, key, name, schedule, duration, course, grade_level in self._fetch(
+            "SELECT e.id, e.email, e.subject, s.name, s.schedule, s.duration, "
+            "COALESCE(s.course, ''), COALESCE(s.grade_level, '') "
+            "FROM {stage_enrollments} e JOIN {stage_subjects} s ON s.key = e.subject AND s.error IS NULL "
+            "WHERE e.error IS NULL AND (EXISTS (SELECT 1 FROM {user} u WHERE u.email = e.email AND u.role = %s) "
+            "OR EXISTS (SELECT 1 FROM {stage_users} u WHERE u.email = e.email AND u.error IS NULL "
+            "AND u.existing IS NULL AND u.role = %s)) ORDER BY e.email, e.id",
+            [Role.STUDENT, Role.STUDENT]
+        ):
+            start = self._staged_datetime(schedule)
+            if start is None:
+                continue
+            length = timedelta(minutes=int(duration)) if duration else default_duration
+            rows.append((row_id, email, key, (name, start, course, grade_level), start, start + length))
+
+        enrolled = defaultdict(dict)
+        emails = sorted({row[1] for row in rows})
+        for offset in range(0, len(emails), settings.BULK_CREATE_BATCH_SIZE):
+            links = StudentProfile.subjects.through.objects.filter(
+                studentprofile__user__email__in=emails[offset:offset + settings.BULK_CREATE_BATCH_SIZE]
+            ).values_list(
+                "studentprofile__user__email", "subject__name", "subject__schedule", "subject__duration",
+                "subject__course", "subject__grade_level"
+            )
+            for email, name, schedule, duration, course, grade_level in links:
+                enrolled[email][(name, schedule, course, grade_level)] = (schedule, schedule + duration)
+
+        rejected = {}
+        for email, email_rows in groupby(rows, key=lambda row: row[1]):
+            # Existing subjects sort before every row; a subject already
+            # enrolled in or listed twice is not checked again.
+            labels, order, intervals = {}, {}, []
+            for identity, (start, end) in enrolled[email].items():
+                key = ("enrolled", identity)
+                labels[key], order[key] = identity[0], -1
+                intervals.append((start, end, key))
+            seen = set(enrolled[email])
+            for row_id, _, subject_key, identity, start, end in email_rows:
+                if identity not in seen:
+                    seen.add(identity)
+                    labels[row_id], order[row_id] = subject_key, row_id
+                    intervals.append((start, end, row_id))
+
+            pairs = sorted(
+                (sorted(pair, key=order.get) for pair in find_conflicts(intervals)),
+                key=lambda pair: (order[pair[1]], order[pair[0]])
+            )
+            for earlier, later in pairs:
+                if order[later] >= 0 and later not in rejected and earlier not in rejected:
+                    rejected[later] = "schedule conflict with subject %s" % labels[earlier]
+
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                self._sql("UPDATE {stage_enrollments} SET error = %s WHERE id = %s"),
+                [(error, row_id) for row_id, error in sorted(rejected.items())]
+            )
+
+    def errors(self):
+        return self.state["errors"]
+
+    # Passwords
+
+    def step_hash(self):
+        if self.unusable_passwords:
+            changed = self._execute(
+                "UPDATE {stage_users} SET password_hash = %s "
+                "WHERE error IS NULL AND existing IS NULL AND password_hash IS NULL",
+                [UNUSABLE_PASSWORD]
+            )
+            self._clear_passwords()
+            self.report("Set %d unusable passwords." % changed)
+            return
+
+        pending = (
+            "FROM {stage_users} WHERE error IS NULL AND existing IS NULL "
+            "AND password_hash IS NULL AND id > %s"
+        )
+        total = self._fetch("SELECT COUNT(*) " + pending, [self.state["hashed_through"]])[0][0]
+        done = 0
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_setup_worker) as executor:
+            while True:
+                rows = self._fetch(
+                    "SELECT id, password " + pending + " ORDER BY id LIMIT %s",
+                    [self.state["hashed_through"], self.hash_chunk_size]
+                )
+                if not rows:
+                    break
+                chunksize = max(1, len(rows) // (self.workers * 4))
+                hashes = executor.map(hash_password, [password or "" for _, password in rows], chunksize=chunksize)
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.executemany(
+                        self._sql("UPDATE {stage_users} SET password_hash = %s, password = NULL WHERE id = %s"),
+                        [(password_hash, row_id) for password_hash, (row_id, _) in zip(hashes, rows)]
+                    )
+                self.state["hashed_through"] = rows[-1][0]
+                done += len(rows)
+                elapsed = time.monotonic() - started
+                self.report("Hashed %d/%d passwords (%.0f/s)." % (done, total, done / elapsed if elapsed else 0))
+        self._clear_passwords()
+
+    def _clear_passwords(self):
+        # Existing users and invalid rows are never hashed.
+        self._execute("UPDATE {stage_users} SET password = NULL WHERE password IS NOT NULL")
+
+    # Inserts
+
+    def step_users(self):
+        now = timezone.now()
+        with transaction.atomic():
+            inserted = self._execute(
+                "INSERT INTO {user} (email, password, first_name, last_name, age, sex, role, contact_number, "
+                "is_staff, is_superuser, modified) "
+                "SELECT email, COALESCE(password_hash, ''), first_name, last_name, CAST(age AS INTEGER), sex, "
+                "COALESCE(role, ''), COALESCE(contact_number, ''), %s, %s, %s "
+                "FROM {stage_users} s WHERE s.error IS NULL "
+                "AND NOT EXISTS (SELECT 1 FROM {user} u WHERE u.email = s.email)",
+                [False, False, now]
+            )
+        self._count("users", inserted)
+        self.report("Inserted %d users." % inserted)
+
+    def step_profiles(self):
+        now = timezone.now()
+        for role, table in ((Role.STUDENT, "student"), (Role.TEACHER, "teacher")):
+            extra_columns = ", mother_name, father_name" if role == Role.STUDENT else ""
+            extra_values = ", '', ''" if role == Role.STUDENT else ""
+            with transaction.atomic():
+                inserted = self._execute(
+                    "INSERT INTO {%s} (user_id, created, modified%s) "
+                    "SELECT u.id, %%s, %%s%s FROM {stage_users} s JOIN {user} u ON u.email = s.email "
+                    "WHERE s.error IS NULL AND u.role = %%s "
+                    "AND NOT EXISTS (SELECT 1 FROM {%s} p WHERE p.user_id = u.id)"
+                    % (table, extra_columns, extra_values, table),
+                    [now, now, role]
+                )
+            self._count("%s_profiles" % role, inserted)
+            self.report("Inserted %d %s profiles." % (inserted, role))
+
+    def step_addresses(self):
+        if "addresses" not in self.sources:
+            return
+        # Addresses are shared by content hash, which is computed in Python;
+        # each chunk creates its addresses and records their hashes together,
+        # so an interrupted step resumes with the rows left unhashed.
+        inserted = 0
+        while True:
+            with transaction.atomic():
+                rows = self._fetch(
+                    "SELECT id, street, city_area, city, province, postal_code, address_type "
+                    "FROM {stage_addresses} WHERE error IS NULL AND content_hash IS NULL ORDER BY id LIMIT %s",
+                    [settings.BULK_CREATE_BATCH_SIZE]
+                )
+                if not rows:
+                    break
+                pairs = Address.objects.get_or_create_bulk(
+                    [dict(zip(ADDRESS_FIELDS, row[1:])) for row in rows]
+                )
+                inserted += sum(created for _, created in pairs)
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        self._sql("UPDATE {stage_addresses} SET content_hash = %s WHERE id = %s"),
+                        [[address.content_hash, row[0]] for row, (address, _) in zip(rows, pairs)]
+                    )
+
+        with transaction.atomic():
+            self._execute("DROP TABLE IF EXISTS {address_ids}")
+            self._execute(
+                "CREATE TABLE {address_ids} AS "
+                "SELECT DISTINCT u.id AS user_id, a.id AS address_id FROM {stage_addresses} s "
+                "JOIN {user} u ON u.email = s.email "
+                "JOIN {address} a ON a.content_hash = s.content_hash "
+                "WHERE s.error IS NULL"
+            )
+            linked = self._execute(
+                "INSERT INTO {user_addresses} (user_id, address_id) "
+                "SELECT r.user_id, r.address_id FROM {address_ids} r "
+                "WHERE NOT EXISTS (SELECT 1 FROM {user_addresses} l "
+                "WHERE l.user_id = r.user_id AND l.address_id = r.address_id)"
+            )
+        self._count("addresses", inserted)
+        self._count("address_links", linked)
+        self.report("Inserted %d addresses and %d user links." % (inserted, linked))
+
+    def step_subjects(self):
+        if "subjects" not in self.sources:
+            return
+        default_minutes = int(Subject._meta.get_field("duration").default / timedelta(minutes=1))
+        match = (
+            "j.name = s.name AND j.schedule = {schedule} AND j.course = COALESCE(s.course, '') "
+            "AND j.grade_level = COALESCE(s.grade_level, '')"
+        )
+        with transaction.atomic():
+            inserted = self._execute(
+                "INSERT INTO {subject} (name, schedule, duration, course, grade_level) "
+                "SELECT name, {schedule}, {duration}, COALESCE(course, ''), COALESCE(grade_level, '') "
+                "FROM {stage_subjects} s WHERE s.error IS NULL "
+                "AND NOT EXISTS (SELECT 1 FROM {subject} j WHERE " + match + ")",
+                schedule=("datetime", "s.schedule"),
+                duration=("minutes", "COALESCE(s.duration, '%d')" % default_minutes)
+            )
+            self._execute("DROP TABLE IF EXISTS {subject_ids}")
+            self._execute(
+                "CREATE TABLE {subject_ids} AS "
+                "SELECT s.key AS subject_key, MIN(j.id) AS subject_id FROM {stage_subjects} s "
+                "JOIN {subject} j ON " + match + " WHERE s.error IS NULL GROUP BY s.key",
+                schedule=("datetime", "s.schedule")
+            )
+        self._count("subjects", inserted)
+        self.report("Inserted %d subjects." % inserted)
+
+    def step_enrollments(self):
+        if "enrollments" not in self.sources:
+            return
+        if "subjects" not in self.sources:
+            raise ValueError("Enrollments refer to subject keys, so a subjects file is required.")
+
+        now = timezone.now()
+        relations = (
+            (Role.STUDENT, "student", "student_subjects", "studentprofile_id"),
+            (Role.TEACHER, "teacher", "teacher_subjects", "teacherprofile_id"),
+        )
+        for role, profile_table, through_table, profile_column in relations:
+            resolved = (
+                "FROM {stage_enrollments} e JOIN {user} u ON u.email = e.email "
+                "JOIN {%s} p ON p.user_id = u.id "
+                "JOIN {subject_ids} r ON r.subject_key = e.subject "
+                "WHERE e.error IS NULL AND u.role = %%s" % profile_table
+            )
+            with transaction.atomic():
+                linked = self._execute(
+                    "INSERT INTO {%s} (%s, subject_id) SELECT DISTINCT p.id, r.subject_id " % (through_table, profile_column)
+                    + resolved
+                    + " AND NOT EXISTS (SELECT 1 FROM {%s} t WHERE t.%s = p.id AND t.subject_id = r.subject_id)"
+                    % (through_table, profile_column),
+                    [role]
+                )
+                # Profiles that existed before the import may have cached responses.
+                existing_users = [
+                    user_id for user_id, in self._fetch(
+                        "SELECT DISTINCT u.id " + resolved
+                        + " AND NOT EXISTS (SELECT 1 FROM {stage_users} s "
+                        "WHERE s.email = u.email AND s.error IS NULL AND s.existing IS NULL)",
+                        [role]
+                    )
+                ]
+                if existing_users:
+                    for start in range(0, len(existing_users), settings.BULK_CREATE_BATCH_SIZE):
+                        batch = existing_users[start:start + settings.BULK_CREATE_BATCH_SIZE]
+                        self._execute(
+                            "UPDATE {%s} SET modified = %%s WHERE user_id IN (%s)"
+                            % (profile_table, ", ".join(["%s"] * len(batch))),
+                            [now, *batch]
+                        )
+                    profile_cache.invalidate(role, existing_users)
+            self._count("%s_enrollments" % role, linked)
+            self.report("Inserted %d %s enrollments." % (linked, role))
+
+        unresolved = self._fetch(
+            "SELECT COUNT(*) FROM {stage_enrollments} e WHERE e.error IS NULL "
+            "AND NOT EXISTS (SELECT 1 FROM {user} u JOIN {subject_ids} r ON r.subject_key = e.subject "
+            "WHERE u.email = e.email)"
+        )[0][0]
+        self.state["counts"]["unresolved_enrollments"] = unresolved
+
+    def step_search(self):
+        # Inserted rows bypass the signals that index users on SQLite.
+        rebuild_index(missing_only=True)
+
+    def step_cleanup(self):
+        self._drop_staging()
@@ -0,0 +1,309 @@
+"""
+Command to benchmark the API against a synthetic school.
+"""
+
+import json
+import platform
+from datetime import timedelta
+from time import perf_counter
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+  teardown_test_environment
+from django.utils import timezone
+
+from school_management.account.models import StudentProfile, User
+from school_management.account.serializers import UserSerializer, user_values
+from school_management.account.synthetic import DOMAIN, build_school, get_admin, load_school
+from school_management.api.serializers import TokenObtainPairSerializer
+from school_management.core.benchmark import compare_results, queries_from_server_timing, run_requests, summarize
+
+
+class Command(BaseCommand):
+  help = (
+    'Build a synthetic school in a test database and measure latency, queries per request and '
+    'throughput of the main endpoints. Use --server to load test a running server instead.'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--teachers', type=int, default=100)
+    parser.add_argument('--subjects', type=int, default=400)
+    parser.add_argument('--subjects-per-student', type=int, default=6)
+    parser.add_argument('--students-per-teacher', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=200, help='Requests per scenario.')
+    parser.add_argument(
+      '--token-iterations',
+      type=int,
+      default=20,
+      help='Requests for the token scenario, which hashes a password per request.'
+    )
+    parser.add_argument('--sample-users', type=int, default=50, help='Distinct users the requests rotate through.')
+    parser.add_argument('--scenarios', nargs='+', help='Only run these scenarios.')
+    parser.add_argument('--server', help='Base URL of a running server to load test, e.g. http://127.0.0.1:8000.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clients used with --server.')
+    parser.add_argument(
+      '--build-only',
+      action='store_true',
+      help='Build the synthetic school in the configured database for --server runs, then exit.'
+    )
+    parser.add_argument(
+      '--serialization-rows',
+      type=int,
+      default=10000,
+      help='Users serialized at once to compare UserSerializer with the values() path; 0 skips it.'
+    )
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Fail if the results regressed against this results file.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed latency/throughput regression.')
+
+  def handle(self, *args, **options):
+    if options['build_only']:
+      self.build(options)
+      return
+
+    serialization = None
+    if options['server']:
+      school = load_school()
+      if school is None:
+        raise CommandError('No synthetic school in the database; run with --build-only first.')
+      results = self.run_scenarios(school, options, self.send_to_server)
+    else:
+      setup_test_environment()
+      old_config = setup_databases(
+        verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}, serialized_aliases=set()
+      )
+      try:
+        school = self.build(options)
+        with override_settings(METRICS_SAMPLE_RATE=1.0, SERVER_TIMING_HEADER=True):
+          results = self.run_scenarios(school, options, self.send_to_client)
+        if options['serialization_rows']:
+          serialization = self.compare_serialization(options['serialization_rows'])
+      finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+    report = {
+      'meta': {
+        'mode': 'server' if options['server'] else 'client',
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'school': school.summary(),
+        'iterations': options['iterations'],
+        'concurrency': options['concurrency'] if options['server'] else 1,
+      },
+      'scenarios': results,
+    }
+    if serialization is not None:
+      report['serialization'] = serialization
+    output = json.dumps(report, indent=2)
+    self.stdout.write(output)
+    if options['output']:
+      with open(options['output'], 'w') as output_file:
+        output_file.write(output + '\n')
+
+    if options['baseline']:
+      with open(options['baseline']) as baseline_file:
+        baseline = json.load(baseline_file)['scenarios']
+      regressions = compare_results(results, baseline, options['tolerance'])
+      if regressions:
+        for regression in regressions:
+          self.stderr.write(self.style.ERROR(regression))
+        raise CommandError('%d regression(s) against %s.' % (len(regressions), options['baseline']))
+      self.stderr.write(self.style.SUCCESS('No regressions against %s.' % options['baseline']))
+
+  def build(self, options):
+    started = perf_counter()
+    try:
+      school = build_school(
+        students=options['students'],
+        teachers=options['teachers'],
+        subjects=options['subjects'],
+        subjects_per_student=options['subjects_per_student'],
+        students_per_teacher=options['students_per_teacher'],
+        seed=options['seed'],
+        progress=lambda message: self.stderr.write('  ' + message)
+      )
+    except ValueError as exc:
+      raise CommandError(str(exc))
+    self.stderr.write('Built %s in %.1fs.' % (school.summary(), perf_counter() - started))
+    return school
+
+  def compare_serialization(self, rows, repeat=3):
+    """Best of `repeat` times to fetch and serialize `rows` users both ways."""
+    queryset = User.objects.order_by('id')[:rows]
+    paths = {
+      'serializer': lambda: UserSerializer(list(queryset), many=True).data,
+      'values': lambda: user_values.to_representation(list(user_values.values(queryset))),
+    }
+    timings = {}
+    for name, serialize in paths.items():
+      self.stderr.write('Serializing %d users with the %s path...' % (rows, name))
+      best = None
+      for _ in range(repeat):
+        started = perf_counter()
+        data = serialize()
+        elapsed = perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+      timings[name] = round(best * 1000, 2)
+    return {
+      'rows': len(data),
+      'serializer_ms': timings['serializer'],
+      'values_ms': timings['values'],
+      'speedup': round(timings['serializer'] / timings['values'], 2) if timings['values'] else None,
+    }
+
+  def get_scenarios(self, school, options):
+    sample = options['sample_users']
+    students = school.student_user_ids[:sample]
+    teachers = school.teacher_user_ids[:sample]
+    student_tokens = self.get_tokens(students)
+    teacher_tokens = self.get_tokens(teachers)
+    admin_token = self.get_tokens([get_admin().pk])
+    search_queries = self.get_search_queries(students)
+    # The enrollment scenario changes who takes the free slot's subjects.
+    free_subject_ids = set(school.free_subject_ids)
+    rosters = self.get_rosters(
+      [subject_id for subject_id in school.subject_ids if subject_id not in free_subject_ids][:sample]
+    )
+    json_type = {'Content-Type': 'application/json'}
+    iterations = options['iterations']
+
+    def authorized(tokens, index, **headers):
+      return dict(headers, Authorization='Bearer %s' % tokens[index % len(tokens)])
+
+    def enrollment(index):
+      # Alternately enroll a student in a subject of the free slot and drop it.
+      student = index // 2 % len(students)
+      body = json.dumps({'subjects': [school.free_subject_ids[student % len(school.free_subject_ids)]]})
+      method = 'POST' if index % 2 == 0 else 'DELETE'
+      return method, '/api/v1/account/student_profile/subjects', body, authorized(student_tokens, student, **json_type)
+
+    def check_in(index):
+      # Checks in every class once a day, from today on; reruns against the
+      # same database only hit the already recorded sessions.
+      subject_id, student_ids = rosters[index % len(rosters)]
+      session_date = timezone.localdate() + timedelta(days=index // len(rosters))
+      statuses = {'present': [], 'late': [], 'absent': []}
+      for position, student_id in enumerate(student_ids):
+        statuses['present' if position % 10 < 8 else 'late' if position % 10 == 8 else 'absent'].append(student_id)
+      body = json.dumps(dict(statuses, session_date=session_date.isoformat()))
+      return (
+        'POST', '/api/v1/attendance/subjects/%d/check_in' % subject_id, body, authorized(admin_token, 0, **json_type)
+      )
+
+    def token(index):
+      body = json.dumps({'email': 'student%d@%s' % (index % len(students), DOMAIN), 'password': school.password})
+      return 'POST', '/api/v1/token/', body, json_type
+
+    return {
+      'user_list': (iterations, lambda index: ('GET', '/api/v1/account/users/?page_size=50', None, {})),
+      'user_list_by_name': (
+        iterations,
+        lambda index: ('GET', '/api/v1/account/users/?page_size=50&ordering=name&role=student', None, {})
+      ),
+      'student_profile': (
+        iterations,
+        lambda index: ('GET', '/api/v1/account/student_profile', None, authorized(student_tokens, index))
+      ),
+      'teacher_profile': (
+        iterations,
+        lambda index: ('GET', '/api/v1/account/teacher_profile', None, authorized(teacher_tokens, index))
+      ),
+      'teacher_roster': (
+        iterations,
+        lambda index: ('GET', '/api/v1/account/teacher_profile/roster', None, authorized(teacher_tokens, index))
+      ),
+      'user_search': (
+        iterations,
+        lambda index: (
+          'GET', '/api/v1/account/users/search?' + urlencode({'q': search_queries[index % len(search_queries)]}),
+          None, authorized(admin_token, 0)
+        )
+      ),
+      'token': (options['token_iterations'], token),
+      'enrollment': (iterations, enrollment),
+      'attendance_check_in': (iterations, check_in),
+    }
+
+  def get_rosters(self, subject_ids):
+    """
+    `(subject_id, student profile ids)` of the subjects that have students,
+    at most as many students as a check-in takes.
+    """
+    rosters = {}
+    for subject_id, student_id in StudentProfile.subjects.through.objects.filter(
+      subject_id__in=subject_ids
+    ).order_by('subject_id', 'studentprofile_id').values_list('subject_id', 'studentprofile_id'):
+      rosters.setdefault(subject_id, []).append(student_id)
+    limit = settings.ATTENDANCE_CHECK_IN_MAX_RECORDS
+    return [(subject_id, student_ids[:limit]) for subject_id, student_ids in rosters.items()]
+
+  def get_search_queries(self, user_ids):
+    """
+    Names of `user_ids` as staff would type them: full names with one letter
+    of the last name wrong, and the first letters of last names.
+    """
+    queries = []
+    for index, (first_name, last_name) in enumerate(
+      User.objects.filter(pk__in=user_ids).order_by('id').values_list('first_name', 'last_name')
+    ):
+      if index % 2:
+        queries.append(last_name[:4])
+        continue
+      middle = len(last_name) // 2
+      typo = 'x' if last_name[middle] != 'x' else 'y'
+      queries.append('%s %s%s%s' % (first_name, last_name[:middle], typo, last_name[middle + 1:]))
+    return queries
+
+  def get_tokens(self, user_ids):
+    users = User.objects.in_bulk(user_ids)
+    return [str(TokenObtainPairSerializer.get_token(users[user_id]).access_token) for user_id in user_ids]
+
+  def run_scenarios(self, school, options, send):
+    scenarios = self.get_scenarios(school, options)
+    selected = options['scenarios'] or list(scenarios)
+    unknown = set(selected) - set(scenarios)
+    if unknown:
+      raise CommandError('Unknown scenario(s): %s. Choose from %s.' % (', '.join(sorted(unknown)), ', '.join(scenarios)))
+
+    results = {}
+    for name in selected:
+      requests, request_factory = scenarios[name]
+      self.stderr.write('Running %s (%d requests)...' % (name, requests))
+      results[name] = send(request_factory, requests, options)
+    return results
+
+  def send_to_server(self, request_factory, requests, options):
+    return run_requests(options['server'], request_factory, requests, options['concurrency'])
+
+  def send_to_client(self, request_factory, requests, options):
+    client = Client()
+    latencies = []
+    queries = []
+    errors = 0
+    started = perf_counter()
+    for index in range(requests):
+      method, path, body, headers = request_factory(index)
+      headers = dict(headers)
+      content_type = headers.pop('Content-Type', 'application/octet-stream')
+      extra = {'HTTP_%s' % name.upper().replace('-', '_'): value for name, value in headers.items()}
+
+      request_started = perf_counter()
+      response = client.generic(method, path, data=body or '', content_type=content_type, **extra)
+      elapsed = perf_counter() - request_started
+      if response.status_code >= 400:
+        errors += 1
+        continue
+      latencies.append(elapsed)
+      query_count = queries_from_server_timing(response.get('Server-Timing'))
+      if query_count is not None:
+        queries.append(query_count)
+    return summarize(latencies, errors, perf_counter() - started, queries)
@@ -0,0 +1,23 @@
+"""
+Command to hash and deduplicate the addresses saved before content hashing.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from school_management.account.addresses import deduplicate
+
+
+class Command(BaseCommand):
+  help = (
+    'Give every address without a content hash one, merging addresses with equal content into one '
+    'row and moving their user links onto it. Safe to interrupt and rerun.'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=1000, help='Addresses per transaction.')
+
+  def handle(self, *args, **options):
+    counts = deduplicate(options['batch_size'], progress=lambda message: self.stderr.write('  ' + message))
+    self.stdout.write(json.dumps(counts, indent=2))
@@ -0,0 +1,76 @@
+"""
+Command to onboard a school from CSV files.
+"""
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from school_management.account.importer import SOURCES, SchoolImporter
+
+
+class Command(BaseCommand):
+  help = (
+    'Import users, addresses, subjects and enrollments from CSV files through staging tables. '
+    'Interrupted imports resume from the checkpoint file. See school_management.account.importer '
+    'for the expected columns.'
+  )
+
+  def add_arguments(self, parser):
+    for name in SOURCES:
+      parser.add_argument('--%s' % name, help='CSV file of %s.' % name)
+    parser.add_argument(
+      '--checkpoint',
+      help='Checkpoint file; defaults to .import_school.json next to the users file.'
+    )
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start over.')
+    parser.add_argument('--workers', type=int, help='Password hashing processes.')
+    parser.add_argument('--hash-chunk-size', type=int, default=2000, help='Passwords hashed per batch.')
+    parser.add_argument(
+      '--unusable-passwords',
+      action='store_true',
+      help='Give users without a password_hash an unusable password instead of hashing the password column.'
+    )
+    parser.add_argument('--strict', action='store_true', help='Abort after validation if any row is invalid.')
+
+  def handle(self, *args, **options):
+    sources = {name: options[name] for name in SOURCES if options[name]}
+    if 'users' not in sources:
+      raise CommandError('--users is required.')
+    for path in sources.values():
+      if not os.path.isfile(path):
+        raise CommandError('%s does not exist.' % path)
+
+    checkpoint = options['checkpoint'] or os.path.join(
+      os.path.dirname(os.path.abspath(sources['users'])), '.import_school.json'
+    )
+    try:
+      importer = SchoolImporter(
+        sources,
+        checkpoint,
+        workers=options['workers'],
+        hash_chunk_size=options['hash_chunk_size'],
+        unusable_passwords=options['unusable_passwords'],
+        progress=lambda message: self.stderr.write('  ' + message)
+      )
+      if options['strict']:
+        importer.run(restart=options['restart'], until='validate')
+        self.report_errors(importer.errors())
+        if any(errors['count'] for errors in importer.errors().values()):
+          raise CommandError('Invalid rows found; fix them and rerun with --restart.')
+      state = importer.run(restart=options['restart'] and not options['strict'])
+    except ValueError as exc:
+      raise CommandError(str(exc))
+
+    if not options['strict']:
+      self.report_errors(state['errors'])
+    self.stdout.write(json.dumps(state['counts'], indent=2))
+
+  def report_errors(self, errors):
+    for name, source_errors in errors.items():
+      if not source_errors['count']:
+        continue
+      self.stderr.write(self.style.WARNING('%d invalid %s rows skipped:' % (source_errors['count'], name)))
+      for example in source_errors['examples']:
+        self.stderr.write('  ' + example)
@@ -0,0 +1,56 @@
+"""
+Command to report every schedule conflict in the school.
+"""
+
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+
+from school_management.account.models import StudentProfile, TeacherProfile
+from school_management.subject.scheduling import find_conflicts
+
+
+class Command(BaseCommand):
+  help = 'List every student and teacher enrolled in subjects whose schedules overlap.'
+
+  relations = [
+    ('student', StudentProfile.subjects),
+    ('teacher', TeacherProfile.subjects),
+  ]
+
+  def add_arguments(self, parser):
+    parser.add_argument('--chunk-size', type=int, default=5000)
+
+  def handle(self, *args, **options):
+    total = 0
+    for label, relation in self.relations:
+      for profile_id, conflicts in self.find_relation_conflicts(relation, options['chunk_size']):
+        total += len(conflicts)
+        for subject_id, other_subject_id in conflicts:
+          self.stdout.write('%s %s: subject %s overlaps subject %s' % (
+            label, profile_id, subject_id, other_subject_id
+          ))
+
+    style = self.style.WARNING if total else self.style.SUCCESS
+    self.stdout.write(style('%d schedule conflicts found.' % total))
+
+  def find_relation_conflicts(self, relation, chunk_size):
+    """
+    Stream the enrollments grouped by profile and sweep each timetable,
+    O(n log n) over all enrollments.
+    """
+    through = relation.through
+    source = through._meta.get_field(relation.field.m2m_field_name()).attname
+    subject = relation.field.m2m_reverse_field_name()
+    rows = through.objects.values_list(
+      source, subject + '_id', subject + '__schedule', subject + '__duration'
+    ).order_by(source).iterator(chunk_size=chunk_size)
+
+    for profile_id, enrollments in groupby(rows, key=itemgetter(0)):
+      conflicts = find_conflicts(
+        (schedule, schedule + duration, subject_id)
+        for _, subject_id, schedule, duration in enrollments
+      )
+      if conflicts:
+        yield profile_id, conflicts
@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0015_alter_studentprofile_user_alter_teacherprofile_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='account_user_name_idx'),
+        ),
+    ]
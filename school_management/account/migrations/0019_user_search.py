@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# Kept in sync with the document expressions in account.search.
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX account_user_search_trgm ON account_user "
+    "USING gin ((lower(first_name || ' ' || last_name || ' ' || email)) gin_trgm_ops)",
+    "CREATE INDEX account_studentprofile_parents_trgm ON account_studentprofile "
+    "USING gin ((lower(mother_name || ' ' || father_name)) gin_trgm_ops)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS account_studentprofile_parents_trgm",
+    "DROP INDEX IF EXISTS account_user_search_trgm",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE account_user_search USING fts5(document, tokenize='trigram')",
+    "INSERT INTO account_user_search (rowid, document) SELECT u.id, "
+    "' ' || u.first_name || ' ' || u.last_name || ' ' || u.email || ' ' "
+    "|| COALESCE(p.mother_name, '') || ' ' || COALESCE(p.father_name, '') || ' ' "
+    "FROM account_user u LEFT JOIN account_studentprofile p ON p.user_id = u.id",
+]
+
+SQLITE_REVERSE = [
+    "DROP TABLE IF EXISTS account_user_search",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0018_user_modified'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRESQL_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
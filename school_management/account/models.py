@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
-from django.db import models
+from django.db import models, router, transaction
+from model_utils.fields import AutoLastModifiedField
 from model_utils.models import TimeStampedModel
 from phonenumber_field.modelfields import PhoneNumberField
 
@@ -8,6 +10,9 @@ from . import (
     AddressType,
     Sex
 )
+from .addresses import ADDRESS_FIELDS, content_hash, normalize_address
+from .search import index_users
+from .utils import hash_passwords
 from school_management.subject.models import Subject
 
 
@@ -32,6 +37,97 @@ class UserManager(BaseUserManager):
             email, password, is_superuser=True, is_staff=False, is_active=True, **extra_fields
         )
 
+    def bulk_create_users(self, users_data, batch_size=None):
+        """Create many users and their blank role profiles in one transaction.
+
+        `users_data` is a list of dicts with the same keys `create_user`
+        accepts. Passwords are hashed in parallel before anything is written,
+        then users and profiles are inserted with `bulk_create` and indexed
+        for search.
+        """
+        batch_size = batch_size or settings.BULK_CREATE_BATCH_SIZE
+        hashed_passwords = hash_passwords(
+            [data.get("password") for data in users_data]
+        )
+
+        users = []
+        for data, hashed_password in zip(users_data, hashed_passwords):
+            fields = {
+                key: value for key, value in data.items()
+                if key not in ("password", "username")
+            }
+            fields["email"] = UserManager.normalize_email(fields["email"])
+            users.append(self.model(password=hashed_password, **fields))
+
+        with transaction.atomic(using=self.db):
+            users = self.bulk_create(users, batch_size=batch_size)
+            if any(user.pk is None for user in users):
+                # Backends without RETURNING support leave the pks unset.
+                pks = dict(
+                    self.filter(email__in=[user.email for user in users])
+                    .values_list("email", "pk")
+                )
+                for user in users:
+                    user.pk = pks[user.email]
+
+            StudentProfile.objects.bulk_create(
+                [StudentProfile(user=user) for user in users if user.role == Role.STUDENT],
+                batch_size=batch_size,
+            )
+            TeacherProfile.objects.bulk_create(
+                [TeacherProfile(user=user) for user in users if user.role == Role.TEACHER],
+                batch_size=batch_size,
+            )
+            index_users([user.pk for user in users], using=self.db)
+        return users
+
+
+class AddressManager(models.Manager):
+    def get_or_create_bulk(self, addresses_data, batch_size=None):
+        """Return an `(address, created)` pair for each address dict.
+
+        Addresses are matched on their content hash, so equal addresses,
+        in the input or already stored, resolve to one shared row. Missing
+        ones are inserted with `bulk_create`; a row inserted concurrently
+        is picked up rather than duplicated. `created` is only true for the
+        first occurrence of an inserted address.
+        """
+        batch_size = batch_size or settings.BULK_CREATE_BATCH_SIZE
+        normalized = {}
+        hashes = []
+        for data in addresses_data:
+            fields = normalize_address(data)
+            value = content_hash(fields)
+            normalized.setdefault(value, fields)
+            hashes.append(value)
+
+        addresses = self._by_hash(normalized, batch_size)
+        missing = [value for value in normalized if value not in addresses]
+        if missing:
+            self.bulk_create(
+                [self.model(content_hash=value, **normalized[value]) for value in missing],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+            addresses.update(self._by_hash(missing, batch_size))
+
+        created = set(missing)
+        pairs = []
+        for value in hashes:
+            pairs.append((addresses[value], value in created))
+            created.discard(value)
+        return pairs
+
+    def _by_hash(self, hashes, batch_size):
+        hashes = list(hashes)
+        addresses = {}
+        for start in range(0, len(hashes), batch_size):
+            addresses.update(
+                (address.content_hash, address)
+                for address in self.filter(content_hash__in=hashes[start:start + batch_size])
+            )
+        return addresses
+
 
 class Address(TimeStampedModel):
     street = models.CharField(max_length=100, blank=True)
@@ -40,6 +136,42 @@ class Address(TimeStampedModel):
     province = models.CharField(max_length=70)
     postal_code = models.CharField(max_length=20)
     address_type = models.CharField(max_length=15, choices=AddressType.CHOICES)
+    # Identifies the address so users living there share the row; null
+    # until `dedupe_addresses` runs for rows saved before it existed.
+    content_hash = models.CharField(max_length=64, unique=True, null=True, editable=False)
+
+    objects = AddressManager()
+
+    def save(self, *args, **kwargs):
+        """Save the address, sharing the row of an equal one.
+
+        A new address takes over the stored row with the same content
+        instead of inserting a duplicate. Hashed rows are shared and never
+        change; move a user to other content with `User.replace_address`.
+        """
+        normalized = normalize_address({field: getattr(self, field) for field in ADDRESS_FIELDS})
+        value = content_hash(normalized)
+        if self._state.adding and self.pk is None:
+            manager = type(self).objects.db_manager(kwargs.get("using") or router.db_for_write(type(self)))
+            address = manager.get_or_create_bulk([normalized])[0][0]
+            for field in self._meta.concrete_fields:
+                setattr(self, field.attname, getattr(address, field.attname))
+            self._state.adding = False
+            self._state.db = address._state.db
+            return
+        if self.content_hash is not None and self.content_hash != value:
+            raise ValueError(
+                "Address %s is shared by content and cannot be changed; use User.replace_address." % self.pk
+            )
+
+        # Rows saved before hashing existed get their hash here.
+        for field, field_value in normalized.items():
+            setattr(self, field, field_value)
+        self.content_hash = value
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "content_hash"}
+        super().save(*args, **kwargs)
 
 
 class User(AbstractBaseUser):
@@ -53,10 +185,38 @@ class User(AbstractBaseUser):
     role = models.CharField(choices=Role.CHOICES, blank=True, max_length=70)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
+    modified = AutoLastModifiedField("modified")
     objects = UserManager()
 
     USERNAME_FIELD = "email"
 
+    def replace_address(self, address, data):
+        """Link this user to the address `data` instead of `address`.
+
+        Addresses are shared between users, so the row is not edited: the
+        address with the new content is looked up or created and the link
+        is moved onto it. Returns that address.
+        """
+        new_address = Address.objects.get_or_create_bulk([data])[0][0]
+        if new_address.pk != address.pk:
+            with transaction.atomic(using=router.db_for_write(User.addresses.through)):
+                self.addresses.remove(address)
+                self.addresses.add(new_address)
+        return new_address
+
+    class Meta:
+        indexes = [
+            # Backs the keyset pagination ordered by name.
+            models.Index(fields=["last_name", "first_name", "id"], name="account_user_name_idx"),
+            # Serve the list filters without leaving the pagination order.
+            models.Index(fields=["role", "last_name", "first_name", "id"], name="account_user_role_name_idx"),
+            models.Index(fields=["role", "id"], name="account_user_role_id_idx"),
+            models.Index(fields=["sex", "age"], name="account_user_sex_age_idx"),
+            models.Index(
+                fields=["age"], name="account_user_age_idx", condition=models.Q(age__isnull=False)
+            ),
+        ]
+
 
 class StudentProfile(TimeStampedModel):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, related_name='student_profile')
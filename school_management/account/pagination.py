@@ -0,0 +1,17 @@
+from school_management.core.pagination import KeysetPagination
+
+
+class UserPagination(KeysetPagination):
+  orderings = {
+    'id': ('id',),
+    'name': ('last_name', 'first_name', 'id'),
+  }
+
+
+class RosterPagination(KeysetPagination):
+  # Profiles without a user have null names, which the keyset comparison
+  # would skip; `TeacherRoster` coalesces them into these annotations.
+  orderings = {
+    'id': ('id',),
+    'name': ('sort_last_name', 'sort_first_name', 'id'),
+  }
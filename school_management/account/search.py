@@ -0,0 +1,250 @@
+"""
+Ranked, typo-tolerant search over the user directory.
+
+A user's search document is their first and last name, email and, for
+students, their parents' names. Both backends match on character
+trigrams, so a query still finds names with a letter wrong:
+
+- PostgreSQL: GIN trigram indexes (pg_trgm) on the document expressions
+  of `account_user` and `account_studentprofile`, queried with the
+  word-similarity operator `<%` and ranked by `word_similarity`.
+- SQLite: an FTS5 table using the trigram tokenizer, `account_user_search`,
+  kept in sync by the signals in `account.signals`. Candidates are found
+  through FTS5, matching whole words, then the last word as a prefix, then
+  one word with a letter wrong, and ranked by the share of the query's
+  trigrams they contain.
+
+Both are created by migration 0019. Writes that bypass the model signals
+(`bulk_create`, `QuerySet.update`, raw SQL) have to call `index_users` or
+`rebuild_index` on SQLite; PostgreSQL's expression indexes need nothing.
+"""
+from django.conf import settings
+from django.db import connections, router, transaction
+
+SEARCH_TABLE = "account_user_search"
+
+# The searched text; the surrounding spaces make word boundaries part of
+# the trigrams on SQLite.
+SQLITE_DOCUMENT = (
+    "' ' || u.first_name || ' ' || u.last_name || ' ' || u.email || ' ' "
+    "|| COALESCE(p.mother_name, '') || ' ' || COALESCE(p.father_name, '') || ' '"
+)
+
+# These must match the expressions of the indexes created by migration 0019.
+POSTGRESQL_USER_DOCUMENT = "lower(first_name || ' ' || last_name || ' ' || email)"
+
+POSTGRESQL_PARENT_DOCUMENT = "lower(mother_name || ' ' || father_name)"
+
+
+def trigrams(text, prefix=False):
+    """The lowercase trigrams of `text`'s words, each padded with spaces.
+
+    With `prefix`, the last word is not padded at its end, so it also
+    matches longer words it starts.
+    """
+    grams = set()
+    words = text.lower().split()
+    for index, word in enumerate(words):
+        padded = " %s" % word if prefix and index == len(words) - 1 else " %s " % word
+        grams.update(padded[start:start + 3] for start in range(len(padded) - 2))
+    return grams
+
+
+def search_users(query, limit, using=None):
+    """Return up to `limit` `(user_id, score)` pairs, best match first.
+
+    Scores are between 0 and 1; matches under SEARCH_SIMILARITY_THRESHOLD
+    are left out.
+    """
+    from .models import User
+
+    using = using or router.db_for_read(User)
+    vendor = connections[using].vendor
+    if vendor == "postgresql":
+        return _search_postgresql(query, limit, using)
+    if vendor == "sqlite":
+        return _search_sqlite(query, limit, using)
+    return _search_scan(query, limit, using)
+
+
+def _search_postgresql(query, limit, using):
+    query = query.lower()
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        # Applies to the `<%` operator until the end of the transaction.
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+            [str(settings.SEARCH_SIMILARITY_THRESHOLD)]
+        )
+        cursor.execute(
+            "SELECT user_id, MAX(score) AS score FROM ("
+            "  SELECT id AS user_id, word_similarity(%s, {user}) AS score FROM account_user"
+            "  WHERE %s <%% {user}"
+            "  UNION ALL"
+            "  SELECT user_id, word_similarity(%s, {parent}) FROM account_studentprofile"
+            "  WHERE user_id IS NOT NULL AND %s <%% {parent}"
+            ") AS matches GROUP BY user_id ORDER BY score DESC, user_id LIMIT %s".format(
+                user=POSTGRESQL_USER_DOCUMENT, parent=POSTGRESQL_PARENT_DOCUMENT
+            ),
+            [query, query, query, query, limit]
+        )
+        return [(user_id, float(score)) for user_id, score in cursor.fetchall()]
+
+
+def _phrase(text):
+    # A quoted FTS5 string; with the trigram tokenizer it matches as a substring.
+    return '"%s"' % text.replace('"', '""')
+
+
+def _all(expressions):
+    return "(%s)" % " AND ".join(expressions)
+
+
+def _any(expressions):
+    return "(%s)" % " OR ".join(expressions)
+
+
+def _misspelled(text):
+    """An FTS5 expression matching `text` with up to one letter wrong.
+
+    One typo changes at most one of a few disjoint pieces of the text, so
+    it is enough to match all pieces but one.
+    """
+    if len(text) < 6:
+        return _any([_phrase(text[start:start + 3]) for start in range(len(text) - 2)])
+    if len(text) < 9:
+        middle = len(text) // 2
+        return _any([_phrase(text[:middle]), _phrase(text[middle:])])
+    first, second = len(text) // 3, 2 * len(text) // 3
+    pieces = [_phrase(text[:first]), _phrase(text[first:second]), _phrase(text[second:])]
+    return _any([_all([pieces[0], pieces[1]]), _all([pieces[0], pieces[2]]), _all([pieces[1], pieces[2]])])
+
+
+def _match_expressions(query):
+    """FTS5 queries for `query`, from the most to the least exact.
+
+    Whole words, then the last word as a prefix, then any one word
+    misspelled.
+    """
+    words = query.lower().split()
+    # Strings shorter than a trigram match nothing.
+    words = [word for word in words if len(word) > 1]
+    if not words:
+        return []
+    exact = [" %s " % word for word in words]
+    prefix = exact[:-1] + [" %s" % words[-1]]
+    misspelled = _any([
+        _all([_misspelled(text) if index == wrong else _phrase(text) for index, text in enumerate(prefix)])
+        for wrong in range(len(prefix))
+    ])
+    return [_all([_phrase(text) for text in exact]), _all([_phrase(text) for text in prefix]), misspelled]
+
+
+# Score of a query whose last word only matches as a prefix, relative to
+# an exact match.
+PREFIX_WEIGHT = 0.9
+
+
+def _search_sqlite(query, limit, using):
+    grams = trigrams(query, prefix=True)
+    expressions = _match_expressions(query)
+    if not grams or not expressions:
+        return []
+    exact_grams = trigrams(query)
+    candidates = settings.SEARCH_CANDIDATES
+    rows = {}
+    with connections[using].cursor() as cursor:
+        # The less exact expressions only run while the page is not full.
+        # Whole word and prefix matches all score the same, so `limit` of
+        # them will do; misspelled ones are ranked here rather than by FTS5,
+        # from up to SEARCH_CANDIDATES of them.
+        for expression, size in zip(expressions, (limit, limit, candidates)):
+            cursor.execute(
+                "SELECT rowid, document FROM %s WHERE %s MATCH %%s LIMIT %%s" % (SEARCH_TABLE, SEARCH_TABLE),
+                [expression, size]
+            )
+            rows.update(cursor.fetchall())
+            if len(rows) >= limit:
+                break
+
+    threshold = settings.SEARCH_SIMILARITY_THRESHOLD
+    matches = []
+    for user_id, document in rows.items():
+        document_grams = trigrams(document)
+        score = max(
+            len(exact_grams & document_grams) / len(exact_grams),
+            PREFIX_WEIGHT * len(grams & document_grams) / len(grams)
+        )
+        if score >= threshold:
+            matches.append((user_id, score))
+    matches.sort(key=lambda match: (-match[1], match[0]))
+    return matches[:limit]
+
+
+def _search_scan(query, limit, using):
+    # Unindexed substring match for other databases.
+    from django.db.models import Q
+
+    from .models import User
+
+    words = query.split()
+    condition = Q()
+    for word in words:
+        condition &= (
+            Q(first_name__icontains=word) | Q(last_name__icontains=word) | Q(email__icontains=word)
+            | Q(student_profile__mother_name__icontains=word) | Q(student_profile__father_name__icontains=word)
+        )
+    user_ids = User.objects.using(using).filter(condition).order_by("id").values_list("id", flat=True)[:limit]
+    return [(user_id, 1.0) for user_id in user_ids]
+
+
+def _sqlite_connection(using):
+    connection = connections[using]
+    return connection if connection.vendor == "sqlite" else None
+
+
+def index_users(user_ids, using="default"):
+    """Refresh the SQLite search rows of `user_ids`; a no-op elsewhere."""
+    connection = _sqlite_connection(using)
+    if connection is None or not user_ids:
+        return
+    user_ids = list(user_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(user_ids), settings.BULK_CREATE_BATCH_SIZE):
+            batch = user_ids[start:start + settings.BULK_CREATE_BATCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute("DELETE FROM %s WHERE rowid IN (%s)" % (SEARCH_TABLE, placeholders), batch)
+            cursor.execute(
+                "INSERT INTO %s (rowid, document) SELECT u.id, %s FROM account_user u "
+                "LEFT JOIN account_studentprofile p ON p.user_id = u.id WHERE u.id IN (%s)"
+                % (SEARCH_TABLE, SQLITE_DOCUMENT, placeholders),
+                batch
+            )
+
+
+def remove_users(user_ids, using="default"):
+    connection = _sqlite_connection(using)
+    if connection is None or not user_ids:
+        return
+    user_ids = list(user_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM %s WHERE rowid IN (%s)" % (SEARCH_TABLE, ", ".join(["%s"] * len(user_ids))), user_ids
+        )
+
+
+def rebuild_index(using="default", missing_only=False):
+    """Rebuild the SQLite search table, or only add the users missing from it."""
+    connection = _sqlite_connection(using)
+    if connection is None:
+        return
+    with connection.cursor() as cursor:
+        if missing_only:
+            condition = "WHERE u.id NOT IN (SELECT rowid FROM %s)" % SEARCH_TABLE
+        else:
+            cursor.execute("DELETE FROM %s" % SEARCH_TABLE)
+            condition = ""
+        cursor.execute(
+            "INSERT INTO %s (rowid, document) SELECT u.id, %s FROM account_user u "
+            "LEFT JOIN account_studentprofile p ON p.user_id = u.id %s"
+            % (SEARCH_TABLE, SQLITE_DOCUMENT, condition)
+        )
@@ -1,8 +1,25 @@
+from django.conf import settings
 from rest_framework import serializers
 
+from school_management.core.fields import BulkPrimaryKeyRelatedField
+from school_management.core.serializers import InstrumentedModelSerializer, InstrumentedSerializer
+from school_management.core.values import ValuesSerializer
+from school_management.subject.models import Subject
+from school_management.subject.scheduling import find_conflicts, subject_interval
+from school_management.subject.serializers import SubjectSerializer
 from .models import StudentProfile, TeacherProfile, User
 
-class UserSerializer(serializers.ModelSerializer):
+def validate_timetable(subjects):
+  """Reject a set of subjects containing overlapping schedules."""
+  conflicts = find_conflicts(subject_interval(subject) for subject in set(subjects))
+  if conflicts:
+    raise serializers.ValidationError([
+      'Subject %s overlaps subject %s.' % conflict for conflict in conflicts
+    ])
+  return subjects
+
+
+class UserSerializer(InstrumentedModelSerializer):
   password = serializers.CharField(style={'input_type': 'password'}, write_only=True)
 
   class Meta:
@@ -20,7 +37,21 @@ class UserSerializer(serializers.ModelSerializer):
     ]
 
 
-class TeacherProfileSerializer(serializers.ModelSerializer):
+class BulkUserSerializer(UserSerializer):
+  """
+  Validates one row of a bulk import. Email uniqueness is checked for the
+  whole batch at once by the view instead of with one query per row.
+  """
+  class Meta(UserSerializer.Meta):
+    extra_kwargs = {
+      'email': {'validators': []}
+    }
+
+
+class TeacherProfileSerializer(InstrumentedModelSerializer):
+  students = BulkPrimaryKeyRelatedField(many=True, allow_empty=False, queryset=StudentProfile.objects.all())
+  subjects = BulkPrimaryKeyRelatedField(many=True, allow_empty=False, queryset=Subject.objects.all())
+
   class Meta:
     model = TeacherProfile
     fields = [
@@ -28,12 +59,78 @@ class TeacherProfileSerializer(serializers.ModelSerializer):
       'subjects'
     ]
 
+  def validate_subjects(self, value):
+    return validate_timetable(value)
+
+
+class StudentProfileSerializer(InstrumentedModelSerializer):
+  subjects = BulkPrimaryKeyRelatedField(many=True, allow_empty=False, queryset=Subject.objects.all())
 
-class StudentProfileSerializer(serializers.ModelSerializer):
   class Meta:
     model = StudentProfile
     fields = [
       'father_name',
       'mother_name',
       'subjects'
-    ]
\ No newline at end of file
+    ]
+
+  def validate_subjects(self, value):
+    return validate_timetable(value)
+
+
+class RosterUserSerializer(InstrumentedModelSerializer):
+  class Meta:
+    model = User
+    fields = [
+      'id',
+      'email',
+      'first_name',
+      'last_name',
+      'age',
+      'sex',
+      'contact_number'
+    ]
+
+
+class RosterStudentSerializer(InstrumentedModelSerializer):
+  """
+  A student on a teacher's roster with the subjects they share with that
+  teacher. Expects `user` joined and `shared_subjects` prefetched.
+  """
+  user = RosterUserSerializer(read_only=True)
+  shared_subjects = SubjectSerializer(many=True, read_only=True)
+
+  class Meta:
+    model = StudentProfile
+    fields = [
+      'id',
+      'user',
+      'mother_name',
+      'father_name',
+      'shared_subjects'
+    ]
+
+
+class SubjectEnrollmentSerializer(InstrumentedSerializer):
+  subjects = BulkPrimaryKeyRelatedField(many=True, allow_empty=False, queryset=Subject.objects.all())
+
+
+class StudentAssignmentSerializer(InstrumentedSerializer):
+  students = BulkPrimaryKeyRelatedField(many=True, allow_empty=False, queryset=StudentProfile.objects.all())
+
+
+class EnrollmentSerializer(SubjectEnrollmentSerializer, StudentAssignmentSerializer):
+  pass
+
+
+class UserSearchSerializer(InstrumentedSerializer):
+  q = serializers.CharField(min_length=settings.SEARCH_MIN_LENGTH, max_length=100)
+  limit = serializers.IntegerField(
+    min_value=1, max_value=settings.SEARCH_MAX_LIMIT, default=settings.SEARCH_DEFAULT_LIMIT
+  )
+
+
+# Read-only fast paths of the serializers above for list and profile reads.
+user_values = ValuesSerializer(UserSerializer)
+student_profile_values = ValuesSerializer(StudentProfileSerializer)
+teacher_profile_values = ValuesSerializer(TeacherProfileSerializer)
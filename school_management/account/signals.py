@@ -0,0 +1,140 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from school_management.subject.models import Subject
+from . import Role
+from .cache import profile_cache
+from .models import StudentProfile, TeacherProfile, User
+from .search import index_users, remove_users
+
+STUDENT = Role.STUDENT
+TEACHER = Role.TEACHER
+
+
+_collected_changes = ContextVar("collected_profile_changes", default=None)
+
+
+def profiles_changed(kind, profile_model, profiles):
+    """Mark `profiles`, `(pk, user_id)` pairs, as modified and drop their cached responses.
+
+    Relation changes do not save the profile row, so `modified` is bumped
+    here to keep the profile's ETag and Last-Modified validators honest.
+    Inside `collect_profile_changes` the work is deferred to the end of
+    the block.
+    """
+    profiles = dict(profiles)
+    if not profiles:
+        return
+    collected = _collected_changes.get()
+    if collected is not None:
+        collected[(kind, profile_model)].update(profiles)
+        return
+    profile_model.objects.filter(pk__in=profiles).update(modified=timezone.now())
+    profile_cache.invalidate(kind, profiles.values())
+
+
+@contextmanager
+def collect_profile_changes():
+    """Apply the profile changes signalled inside the block once, at its end.
+
+    `add_links` and `remove_links` send `m2m_changed` once per source;
+    collecting their changes costs one UPDATE per profile model instead
+    of one per source. Nothing is applied if the block raises.
+    """
+    if _collected_changes.get() is not None:
+        yield
+        return
+    collected = defaultdict(dict)
+    token = _collected_changes.set(collected)
+    try:
+        yield
+    finally:
+        _collected_changes.reset(token)
+    for (kind, profile_model), profiles in collected.items():
+        profiles_changed(kind, profile_model, profiles.items())
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+def invalidate_student_profile(sender, instance, **kwargs):
+    profile_cache.invalidate(STUDENT, [instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, using, **kwargs):
+    index_users([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, using, **kwargs):
+    remove_users([instance.pk], using=using)
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+def index_student_parents(sender, instance, using, **kwargs):
+    # Parents' names are part of the student's search document.
+    if instance.user_id is not None:
+        index_users([instance.user_id], using=using)
+
+
+@receiver(pre_delete, sender=StudentProfile)
+def invalidate_student_teachers(sender, instance, **kwargs):
+    # Deleting a student cascades to the teachers' rosters without m2m_changed.
+    profiles_changed(
+        TEACHER, TeacherProfile, TeacherProfile.objects.filter(students=instance).values_list("pk", "user_id")
+    )
+
+
+@receiver(post_save, sender=TeacherProfile)
+@receiver(post_delete, sender=TeacherProfile)
+def invalidate_teacher_profile(sender, instance, **kwargs):
+    profile_cache.invalidate(TEACHER, [instance.user_id])
+
+
+def _related_changed(kind, profile_model, instance, action, reverse, pk_set, through_filter):
+    """Handle an M2M change on the `profile_model` side of a relation."""
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            profiles_changed(kind, profile_model, [(instance.pk, instance.user_id)])
+        return
+
+    # The change was made from the other side; `pk_set` holds profile ids.
+    if action in ("post_add", "post_remove"):
+        profiles = profile_model.objects.filter(pk__in=pk_set)
+    elif action == "pre_clear":
+        profiles = profile_model.objects.filter(**{through_filter: instance.pk})
+    else:
+        return
+    profiles_changed(kind, profile_model, profiles.values_list("pk", "user_id"))
+
+
+@receiver(m2m_changed, sender=StudentProfile.subjects.through)
+def student_subjects_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _related_changed(STUDENT, StudentProfile, instance, action, reverse, pk_set, "subjects")
+
+
+@receiver(m2m_changed, sender=TeacherProfile.subjects.through)
+def teacher_subjects_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _related_changed(TEACHER, TeacherProfile, instance, action, reverse, pk_set, "subjects")
+
+
+@receiver(m2m_changed, sender=TeacherProfile.students.through)
+def teacher_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _related_changed(TEACHER, TeacherProfile, instance, action, reverse, pk_set, "students")
+
+
+@receiver(pre_delete, sender=Subject)
+def subject_deleted(sender, instance, **kwargs):
+    # Deleting a subject cascades to the through rows without m2m_changed.
+    profiles_changed(
+        STUDENT, StudentProfile, StudentProfile.objects.filter(subjects=instance).values_list("pk", "user_id")
+    )
+    profiles_changed(
+        TEACHER, TeacherProfile, TeacherProfile.objects.filter(subjects=instance).values_list("pk", "user_id")
+    )
@@ -0,0 +1,199 @@
+"""
+A generated school for benchmarks.
+
+Users are created with one precomputed password hash and everything is
+inserted with `bulk_create`, so a school of 100k users builds in about a
+minute. Subjects are spread over a week of hourly slots and students only
+take subjects from distinct slots, leaving the last slot free so the
+subjects in it can be enrolled in without schedule conflicts.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from school_management.core import GradeLevel
+from school_management.subject.models import Subject
+from school_management.subject.timetable import build_slots, next_monday
+from . import Role, Sex
+from .models import StudentProfile, TeacherProfile, User
+from .search import rebuild_index
+
+DOMAIN = "synthetic.school"
+
+PASSWORD = "synthetic-password"
+
+SUBJECT_PREFIX = "Synthetic subject "
+
+DAYS = 5
+
+PERIODS_PER_DAY = 8
+
+# Names are made of these, two syllables for first names and three for last
+# names, so that names are about as selective as in a real directory.
+SYLLABLES = [
+    "al", "an", "ber", "ca", "da", "el", "fe", "gi", "ho", "in", "ja", "ka", "li", "ma", "no",
+    "or", "pe", "qui", "ra", "so", "ta", "ul", "vi", "xa", "yo", "za", "mon", "ric", "sel", "tor",
+]
+
+
+class SyntheticSchool:
+    """The ids of a generated school, in creation order."""
+
+    def __init__(self, student_user_ids, teacher_user_ids, subject_ids, free_subject_ids):
+        self.student_user_ids = student_user_ids
+        self.teacher_user_ids = teacher_user_ids
+        self.subject_ids = subject_ids
+        self.free_subject_ids = free_subject_ids
+        self.password = PASSWORD
+
+    def summary(self):
+        return {
+            "students": len(self.student_user_ids),
+            "teachers": len(self.teacher_user_ids),
+            "subjects": len(self.subject_ids),
+        }
+
+
+def _user_ids(role):
+    return list(
+        User.objects.filter(email__endswith="@" + DOMAIN, role=role)
+        .order_by("id").values_list("id", flat=True)
+    )
+
+
+def get_admin():
+    """The synthetic school's staff user, created on first use."""
+    admin, _ = User.objects.get_or_create(
+        email="admin@" + DOMAIN, defaults={"first_name": "Admin", "last_name": "Synthetic", "is_staff": True}
+    )
+    return admin
+
+
+def load_school():
+    """The synthetic school in the database, or None if none was built."""
+    subjects = list(
+        Subject.objects.filter(name__startswith=SUBJECT_PREFIX)
+        .order_by("id").values_list("id", "schedule")
+    )
+    if not subjects:
+        return None
+    last_slot = max(schedule for _, schedule in subjects)
+    return SyntheticSchool(
+        _user_ids(Role.STUDENT),
+        _user_ids(Role.TEACHER),
+        [subject_id for subject_id, _ in subjects],
+        [subject_id for subject_id, schedule in subjects if schedule == last_slot],
+    )
+
+
+def _name(rng, syllables):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+
+def _users(role, count, password, rng):
+    for index in range(count):
+        yield User(
+            email="%s%d@%s" % (role, index, DOMAIN),
+            password=password,
+            first_name=_name(rng, 2),
+            last_name=_name(rng, 3),
+            age=rng.randint(6, 18) if role == Role.STUDENT else rng.randint(24, 65),
+            sex=rng.choice([Sex.MALE, Sex.FEMALE]),
+            role=role,
+        )
+
+
+def build_school(students, teachers, subjects, subjects_per_student=6, subjects_per_teacher=5,
+                 students_per_teacher=30, seed=None, batch_size=None, progress=None):
+    """Insert a synthetic school and return its `SyntheticSchool`.
+
+    `progress` is called with a short message after each step.
+    """
+    slot_count = DAYS * PERIODS_PER_DAY
+    if subjects < slot_count:
+        raise ValueError("At least %d subjects are needed, one per weekly slot." % slot_count)
+    if subjects_per_student >= slot_count:
+        raise ValueError("Students can take at most %d subjects." % (slot_count - 1))
+    if load_school() is not None:
+        raise ValueError("A synthetic school already exists in this database.")
+
+    rng = random.Random(seed)
+    batch_size = batch_size or settings.BULK_CREATE_BATCH_SIZE
+    report = progress or (lambda message: None)
+    password = make_password(PASSWORD)
+    slots = build_slots(next_monday(), DAYS, PERIODS_PER_DAY, timedelta(hours=1))
+    levels = [level for level, _ in GradeLevel.CHOICES]
+
+    with transaction.atomic():
+        Subject.objects.bulk_create((
+            Subject(
+                name="%s%d" % (SUBJECT_PREFIX, index),
+                schedule=slots[index % slot_count],
+                grade_level=levels[index % len(levels)],
+            )
+            for index in range(subjects)
+        ), batch_size=batch_size)
+        subject_ids = list(
+            Subject.objects.filter(name__startswith=SUBJECT_PREFIX).order_by("id").values_list("id", flat=True)
+        )
+        report("Created %d subjects." % len(subject_ids))
+
+        for role, count in ((Role.STUDENT, students), (Role.TEACHER, teachers)):
+            User.objects.bulk_create(_users(role, count, password, rng), batch_size=batch_size)
+        student_user_ids = _user_ids(Role.STUDENT)
+        teacher_user_ids = _user_ids(Role.TEACHER)
+        report("Created %d users." % (len(student_user_ids) + len(teacher_user_ids)))
+
+        StudentProfile.objects.bulk_create((
+            StudentProfile(
+                user_id=user_id,
+                mother_name="%s %s" % (_name(rng, 2), _name(rng, 3)),
+                father_name="%s %s" % (_name(rng, 2), _name(rng, 3)),
+            )
+            for user_id in student_user_ids
+        ), batch_size=batch_size)
+        TeacherProfile.objects.bulk_create(
+            (TeacherProfile(user_id=user_id) for user_id in teacher_user_ids), batch_size=batch_size
+        )
+        # Filtered through the users rather than by their ids, which can be
+        # more than SQLite accepts as query parameters.
+        student_ids = list(
+            StudentProfile.objects.filter(user__email__endswith="@" + DOMAIN, user__role=Role.STUDENT)
+            .order_by("id").values_list("id", flat=True)
+        )
+        teacher_ids = list(
+            TeacherProfile.objects.filter(user__email__endswith="@" + DOMAIN, user__role=Role.TEACHER)
+            .order_by("id").values_list("id", flat=True)
+        )
+        report("Created %d profiles." % (len(student_ids) + len(teacher_ids)))
+
+        rebuild_index(missing_only=True)
+        report("Indexed users for search.")
+
+        by_slot = [subject_ids[slot::slot_count] for slot in range(slot_count)]
+        StudentSubject = StudentProfile.subjects.through
+        StudentSubject.objects.bulk_create((
+            StudentSubject(studentprofile_id=student_id, subject_id=rng.choice(by_slot[slot]))
+            for student_id in student_ids
+            for slot in rng.sample(range(slot_count - 1), subjects_per_student)
+        ), batch_size=batch_size)
+
+        TeacherSubject = TeacherProfile.subjects.through
+        TeacherSubject.objects.bulk_create((
+            TeacherSubject(teacherprofile_id=teacher_id, subject_id=subject_id)
+            for teacher_id in teacher_ids
+            for subject_id in rng.sample(subject_ids, min(subjects_per_teacher, len(subject_ids)))
+        ), batch_size=batch_size)
+
+        TeacherStudent = TeacherProfile.students.through
+        TeacherStudent.objects.bulk_create((
+            TeacherStudent(teacherprofile_id=teacher_id, studentprofile_id=student_id)
+            for teacher_id in teacher_ids
+            for student_id in rng.sample(student_ids, min(students_per_teacher, len(student_ids)))
+        ), batch_size=batch_size)
+        report("Created enrollments.")
+
+    return SyntheticSchool(student_user_ids, teacher_user_ids, subject_ids, by_slot[-1])
@@ -1,3 +1,374 @@
+import csv
+import json
+import os
+import tempfile
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from school_management.core import GradeLevel
+from school_management.subject.models import Subject
+from . import AddressType, Role, Sex
+from .cache import profile_cache
+from .enrollment import add_links
+from .filters import UserFilter
+from .importer import STAGING_PREFIX, SchoolImporter
+from .models import Address, StudentProfile, TeacherProfile, User
+from .pagination import UserPagination
+from .serializers import user_values
+
+
+class UserFilterIndexTests(TestCase):
+    """The user list's queries, built like the view builds them, are served by indexes."""
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # The test tables are too small for the planner to prefer an index.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def get_plan(self, params):
+        request = Request(APIRequestFactory().get("/api/v1/account/users/", params))
+        queryset = UserFilter(request.query_params, queryset=User.objects.all()).qs
+        page = UserPagination().get_page_queryset(user_values.values(queryset, "id", "modified"), request)
+        return page.explain()
+
+    def assertUsesIndex(self, params, index_name):
+        self.assertIn(index_name, self.get_plan(params))
+
+    def test_role_by_name(self):
+        self.assertUsesIndex({"role": Role.STUDENT, "ordering": "name"}, "account_user_role_name_idx")
+
+    def test_role_by_id(self):
+        self.assertUsesIndex({"role": Role.STUDENT}, "account_user_role_id_idx")
+
+    def test_sex_and_age(self):
+        self.assertUsesIndex({"sex": Sex.FEMALE, "age_min": 10, "age_max": 12}, "account_user_sex_age_idx")
+
+    def test_age(self):
+        self.assertUsesIndex({"age_min": 10, "age_max": 12}, "account_user_age_idx")
+
+    def test_grade_level(self):
+        # Users are walked in page order and each one's enrollments are
+        # probed through indexes; no other table may be scanned.
+        plan = self.get_plan({"grade_level": GradeLevel.CHOICES[0][0]})
+        self.assertNotRegex(plan, r"\bSCAN (?!account_user\b)|Seq Scan on (?!account_user\b)")
+
+
+class TeacherRosterTests(TestCase):
+    def setUp(self):
+        self.subjects = [Subject.objects.create(name="Subject %d" % index, schedule=timezone.now()) for index in range(3)]
+        self.teacher = TeacherProfile.objects.create(user=self.create_user("teacher", Role.TEACHER))
+        self.teacher.subjects.add(*self.subjects[:2])
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher.user)
+
+    def create_user(self, name, role):
+        return User.objects.create(
+            email="%s@example.com" % name, first_name=name, last_name="Roster", sex=Sex.FEMALE, role=role
+        )
+
+    def add_students(self, count):
+        start = self.teacher.students.count()
+        for index in range(start, start + count):
+            student = StudentProfile.objects.create(user=self.create_user("student%d" % index, Role.STUDENT))
+            student.subjects.add(*self.subjects)
+            self.teacher.students.add(student)
+
+    def get_roster(self):
+        response = self.client.get(reverse("teacher-roster"), {"page_size": 50})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_students_without_a_user_are_paged_by_name(self):
+        self.add_students(3)
+        orphan = StudentProfile.objects.create(user=None)
+        self.teacher.students.add(orphan)
+        seen = []
+        url, params = reverse("teacher-roster"), {"ordering": "name", "page_size": 1}
+        while url:
+            body = self.client.get(url, params).json()
+            seen.extend(student["id"] for student in body["results"])
+            url, params = body["next"], None
+        self.assertEqual(len(seen), 4)
+        self.assertEqual(seen[0], orphan.pk)
+
+    def test_query_count_does_not_grow_with_students(self):
+        self.add_students(2)
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.get_roster()), 2)
+
+        self.add_students(18)
+        with self.assertNumQueries(3):
+            results = self.get_roster()
+        self.assertEqual(len(results), 20)
+        # Only the subjects shared with the teacher are listed.
+        self.assertEqual(
+            {subject["id"] for subject in results[0]["shared_subjects"]}, {subject.pk for subject in self.subjects[:2]}
+        )
+
+
+def encode_cursor(data):
+    return urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+class KeysetCursorTests(TestCase):
+    def setUp(self):
+        for index in range(3):
+            User.objects.create(
+                email="user%d@example.com" % index, first_name="User", last_name="Number %d" % index, sex=Sex.MALE
+            )
+
+    def test_tampered_cursors_are_not_found(self):
+        for ordering, position in [
+            ("id", ["abc"]), ("id", [{}]), ("id", [None]), ("id", [1, 2]), ("name", ["Doe", "Jane", "x"]),
+            ("name", [None, "Jane", 1]),
+        ]:
+            cursor = encode_cursor({"o": ordering, "p": position})
+            for path in ("/api/v1/account/users/", "/api/v1/async/account/users/"):
+                with self.subTest(path=path, ordering=ordering, position=position):
+                    response = self.client.get(path, {"ordering": ordering, "cursor": cursor})
+                    self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/account/users/", {"cursor": "not base64!"}).status_code, 404)
+        self.assertEqual(
+            self.client.get("/api/v1/account/users/", {"cursor": encode_cursor(["o", "p"])}).status_code, 404
+        )
+
+    def test_cursors_of_both_orderings_page_through_every_user(self):
+        for ordering in ("id", "name"):
+            seen = []
+            url, params = "/api/v1/account/users/", {"ordering": ordering, "page_size": 2}
+            while url:
+                body = self.client.get(url, params).json()
+                seen.extend(user["id"] for user in body["results"])
+                url, params = body["next"], None
+            self.assertEqual(sorted(seen), sorted(User.objects.values_list("id", flat=True)))
+
+
+class ScheduleConflictTests(TestCase):
+    def setUp(self):
+        start = timezone.now().replace(microsecond=0)
+        self.first = Subject.objects.create(name="First", schedule=start, duration=timedelta(hours=1))
+        self.overlapping = Subject.objects.create(
+            name="Overlapping", schedule=start + timedelta(minutes=30), duration=timedelta(hours=1)
+        )
+        self.after = Subject.objects.create(name="After", schedule=start + timedelta(hours=1))
+        user = User.objects.create(
+            email="student@example.com", first_name="Stu", last_name="Dent", sex=Sex.MALE, role=Role.STUDENT
+        )
+        self.student = StudentProfile.objects.create(user=user)
+        self.student.subjects.add(self.first)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_overlapping_subject_is_rejected(self):
+        response = self.client.post(
+            reverse("student-subjects"), {"subjects": [self.overlapping.pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("subjects", response.json())
+        self.assertEqual(list(self.student.subjects.all()), [self.first])
+
+    def test_subjects_submitted_together_are_checked_against_each_other(self):
+        self.student.subjects.clear()
+        response = self.client.post(
+            reverse("student-subjects"), {"subjects": [self.first.pk, self.overlapping.pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.student.subjects.exists())
+
+    def test_adjacent_subject_is_added(self):
+        response = self.client.post(reverse("student-subjects"), {"subjects": [self.after.pk]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"added": 1})
+
+    def test_bulk_enrollment_rejects_overlaps(self):
+        staff = User.objects.create(
+            email="staff@example.com", first_name="Staff", last_name="Member", sex=Sex.FEMALE, is_staff=True
+        )
+        self.client.force_authenticate(staff)
+        response = self.client.post(
+            reverse("enrollments"),
+            {"students": [self.student.pk], "subjects": [self.overlapping.pk, self.after.pk]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(self.student.subjects.all()), [self.first])
+
+
+class ProfileCacheTests(TestCase):
+    """Every kind of write turns the next profile GET back into a miss."""
+
+    def setUp(self):
+        profile_cache.cache.clear()
+        self.subjects = [
+            Subject.objects.create(name="Subject %d" % index, schedule=timezone.now()) for index in range(2)
+        ]
+        user = User.objects.create(
+            email="cached@example.com", first_name="Cache", last_name="Student", sex=Sex.FEMALE, role=Role.STUDENT
+        )
+        self.student = StudentProfile.objects.create(user=user, father_name="Father")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def get_cache_status(self):
+        response = self.client.get(reverse("student-profile"))
+        self.assertEqual(response.status_code, 200)
+        return response["X-Cache"]
+
+    def assertInvalidatedBy(self, write):
+        self.get_cache_status()
+        self.assertEqual(self.get_cache_status(), "HIT")
+        # Invalidations are applied when the writing transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertEqual(self.get_cache_status(), "MISS")
+        self.assertEqual(self.get_cache_status(), "HIT")
+
+    def test_profile_update(self):
+        def update():
+            response = self.client.patch(reverse("student-profile"), {"mother_name": "Mother"}, format="json")
+            self.assertEqual(response.status_code, 200)
+        self.assertInvalidatedBy(update)
+        self.assertEqual(self.client.get(reverse("student-profile")).json()["mother_name"], "Mother")
+
+    def test_subject_added_and_removed(self):
+        self.assertInvalidatedBy(lambda: self.student.subjects.add(self.subjects[0]))
+        self.assertInvalidatedBy(lambda: self.student.subjects.remove(self.subjects[0]))
+
+    def test_subject_added_from_the_subject_side(self):
+        self.assertInvalidatedBy(lambda: self.subjects[0].studentprofile_set.add(self.student))
+
+    def test_bulk_enrollment(self):
+        self.assertInvalidatedBy(lambda: add_links(StudentProfile.subjects, [self.student], self.subjects))
+
+
+class SchoolImporterTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.checkpoint = os.path.join(self.directory, "checkpoint.json")
+
+    def write(self, name, header, rows):
+        path = os.path.join(self.directory, name + ".csv")
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return path
+
+    def write_users(self, rows):
+        return self.write("users", ["email", "first_name", "last_name", "sex", "role", "password"], rows)
+
+    def staging_tables(self):
+        return [table for table in connection.introspection.table_names() if table.startswith(STAGING_PREFIX)]
+
+    def test_overlapping_enrollments_are_rejected(self):
+        existing = User.objects.create(
+            email="old@example.com", first_name="Old", last_name="Student", sex=Sex.MALE, role=Role.STUDENT
+        )
+        morning = Subject.objects.create(name="Morning", schedule="2026-09-01T08:00:00Z")
+        StudentProfile.objects.create(user=existing).subjects.add(morning)
+        sources = {
+            "users": self.write_users([["new@example.com", "New", "Student", Sex.FEMALE, Role.STUDENT, ""]]),
+            "subjects": self.write("subjects", ["key", "name", "schedule", "duration"], [
+                ["math", "Math", "2026-09-01 08:30:00", "60"],
+                ["art", "Art", "2026-09-01 09:00:00", "60"],
+                ["music", "Music", "2026-09-01 09:30:00", "60"],
+                ["morning", "Morning", "2026-09-01 08:00:00", "60"],
+            ]),
+            "enrollments": self.write("enrollments", ["email", "subject"], [
+                ["old@example.com", "math"],
+                ["old@example.com", "morning"],
+                ["old@example.com", "art"],
+                ["new@example.com", "math"],
+                ["new@example.com", "art"],
+                ["new@example.com", "music"],
+            ]),
+        }
+        state = SchoolImporter(sources, self.checkpoint, unusable_passwords=True).run()
+        self.assertEqual(state["errors"]["enrollments"]["examples"], [
+            "line 2: schedule conflict with subject Morning",
+            "line 6: schedule conflict with subject math",
+        ])
+        self.assertEqual(
+            sorted(existing.student_profile.subjects.values_list("name", flat=True)), ["Art", "Morning"]
+        )
+        new = StudentProfile.objects.get(user__email="new@example.com")
+        self.assertEqual(sorted(new.subjects.values_list("name", flat=True)), ["Math", "Music"])
+
+    def test_values_longer_than_their_columns_are_rejected(self):
+        long_name = "x" * (User._meta.get_field("first_name").max_length + 1)
+        sources = {"users": self.write_users([
+            ["long@example.com", long_name, "Name", Sex.MALE, "", ""],
+            ["short@example.com", "Short", "Name", Sex.MALE, "", ""],
+        ])}
+        state = SchoolImporter(sources, self.checkpoint, unusable_passwords=True).run()
+        self.assertEqual(
+            state["errors"]["users"]["examples"], ["line 2: first_name longer than %d characters" % len(long_name[1:])]
+        )
+        self.assertEqual(list(User.objects.values_list("email", flat=True)), ["short@example.com"])
+
+    def test_plaintext_passwords_do_not_outlive_the_run(self):
+        sources = {"users": self.write_users([["user@example.com", "Pass", "Word", Sex.MALE, "", "secret"]])}
+        importer = SchoolImporter(sources, self.checkpoint, unusable_passwords=True)
+        importer.run(until="validate")
+        self.assertEqual(self.staging_tables(), [])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+        importer.run(until="hash")
+        self.assertEqual(
+            importer._fetch("SELECT COUNT(*) FROM {stage_users} WHERE password IS NOT NULL"), [(0,)]
+        )
+        importer.run()
+        self.assertEqual(self.staging_tables(), [])
+
+
+class SharedAddressTests(TestCase):
+    def setUp(self):
+        self.data = {
+            "street": "1 Main  Street", "city_area": "Center", "city": "Springfield", "province": "North",
+            "postal_code": "ab1 2cd", "address_type": AddressType.CHOICES[0][0],
+        }
+        self.users = [
+            User.objects.create(email="u%d@example.com" % index, first_name="U", last_name="%d" % index, sex=Sex.MALE)
+            for index in range(2)
+        ]
+
+    def test_equal_addresses_share_a_row(self):
+        first = Address.objects.create(**self.data)
+        second = Address.objects.create(**dict(self.data, street="1 main street"))
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(second.postal_code, "AB12CD")
+        self.assertEqual(Address.objects.count(), 1)
+
+    def test_replacing_one_users_address_leaves_the_others(self):
+        shared = Address.objects.create(**self.data)
+        for user in self.users:
+            user.addresses.add(shared)
+
+        moved = self.users[0].replace_address(shared, dict(self.data, street="2 Main Street"))
+        self.assertNotEqual(moved.pk, shared.pk)
+        self.assertEqual(list(self.users[0].addresses.all()), [moved])
+        self.assertEqual(list(self.users[1].addresses.all()), [shared])
+        shared.refresh_from_db()
+        self.assertEqual(shared.street, "1 Main Street")
+
+        # Moving back to existing content reuses its row.
+        self.assertEqual(self.users[0].replace_address(moved, self.data).pk, shared.pk)
+        self.assertEqual(Address.objects.filter(user=self.users[0]).get().pk, shared.pk)
 
-# Create your tests here.
+    def test_shared_rows_are_not_edited_in_place(self):
+        shared = Address.objects.create(**self.data)
+        shared.street = "3 Main Street"
+        with self.assertRaises(ValueError):
+            shared.save()
+        shared.refresh_from_db()
+        self.assertEqual(shared.street, "1 Main Street")
@@ -7,7 +7,13 @@ router = routers.DefaultRouter()
 router.register(r'users', views.UserViewSet)
 
 urlpatterns = [
+  path('users/export.<str:export_format>', views.UserExport.as_view(), name='user-export'),
+  path('users/search', views.UserSearch.as_view(), name='user-search'),
   path('', include(router.urls)),
   path('student_profile', views.StudentProfile.as_view(), name='student-profile'),
-  path('teacher_profile', views.TeacherProfile.as_view(), name='teacher-profile')
+  path('teacher_profile', views.TeacherProfile.as_view(), name='teacher-profile'),
+  path('teacher_profile/roster', views.TeacherRoster.as_view(), name='teacher-roster'),
+  path('student_profile/subjects', views.StudentSubjects.as_view(), name='student-subjects'),
+  path('teacher_profile/students', views.TeacherStudents.as_view(), name='teacher-students'),
+  path('enrollments', views.Enrollments.as_view(), name='enrollments')
 ]
\ No newline at end of file
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hash_password(raw_password):
+    return make_password(raw_password) if raw_password else ""
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash raw passwords in parallel, keeping the input order.
+
+    hashlib's PBKDF2 releases the GIL, so a thread pool scales across cores
+    without the start-up cost of worker processes. Empty passwords are
+    returned as "" to match `UserManager.create_user`.
+    """
+    workers = workers or settings.PASSWORD_HASHING_WORKERS
+
+    if workers <= 1 or len(passwords) <= 1:
+        return [hash_password(password) for password in passwords]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_password, passwords))
+
+
+def get_hashing_executor():
+    """The process-wide pool async views hash passwords on."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                thread_name_prefix="password-hashing",
+            )
+        return _executor
+
+
+async def ahash_password(raw_password):
+    """Hash off the event loop, on a pool separate from `sync_to_async`'s."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hashing_executor(), hash_password, raw_password)
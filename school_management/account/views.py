@@ -1,15 +1,89 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, router, transaction
+from django.db.models import Prefetch, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, status, viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
-from .models import StudentProfile, TeacherProfile, User
-from .serializers import StudentProfileSerializer, TeacherProfileSerializer, UserSerializer
+from school_management.core.conditional import make_etag, not_modified_response, set_validators
+from school_management.core.parsers import FastJSONParser, NDJSONParser
+from school_management.subject.models import Subject
+from . import Role
+from .cache import profile_cache
+from .enrollment import add_links, find_schedule_conflicts, remove_links
+from .export import export_records, get_export_queryset, stream_csv, stream_ndjson
+from .filters import UserFilter
+from .pagination import RosterPagination, UserPagination
+from .search import search_users
+from .models import StudentProfile as StudentProfileModel, TeacherProfile as TeacherProfileModel, User
+from .serializers import (
+  BulkUserSerializer,
+  EnrollmentSerializer,
+  RosterStudentSerializer,
+  StudentAssignmentSerializer,
+  StudentProfileSerializer,
+  SubjectEnrollmentSerializer,
+  TeacherProfileSerializer,
+  UserSearchSerializer,
+  UserSerializer,
+  student_profile_values,
+  teacher_profile_values,
+  user_values
+)
+
+
+def get_page_validators(request, paginator, page):
+  """
+  ETag and Last-Modified of a keyset page of user rows, from their `modified`
+  timestamps and the cursors around the page.
+  """
+  etag = make_etag(
+    request.get_full_path(),
+    [(row['id'], row['modified']) for row in page],
+    paginator.next_position,
+    paginator.previous_position
+  )
+  return etag, max((row['modified'] for row in page), default=None)
 
 
 class UserViewSet(viewsets.ModelViewSet):
   queryset = User.objects.all()
   serializer_class = UserSerializer
+  pagination_class = UserPagination
+  filter_backends = [DjangoFilterBackend]
+  filterset_class = UserFilter
+
+  def list(self, request, *args, **kwargs):
+    """
+    Paginated list that answers conditional requests from the `modified`
+    timestamps of the page before serializing it. The page is fetched as
+    `values()` rows and serialized through `user_values`.
+    """
+    queryset = user_values.values(self.filter_queryset(self.get_queryset()), 'id', 'modified')
+    page = self.paginate_queryset(queryset)
+    etag, last_modified = get_page_validators(request, self.paginator, page)
+    not_modified = not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+      return not_modified
+
+    response = self.get_paginated_response(user_values.to_representation(page))
+    return set_validators(response, etag, last_modified)
+
+  def retrieve(self, request, *args, **kwargs):
+    user = self.get_object()
+    etag = make_etag(user.pk, user.modified)
+    not_modified = not_modified_response(request, etag, user.modified)
+    if not_modified is not None:
+      return not_modified
+
+    response = Response(self.get_serializer(user).data)
+    return set_validators(response, etag, user.modified)
 
   def create(self, request, *args, **kwargs):
     serializer = self.get_serializer(data=request.data)
@@ -22,26 +96,319 @@ class UserViewSet(viewsets.ModelViewSet):
     )
 
     # Create blank role profiles
-    if data['role'] == 'student':
-      StudentProfile.objects.create(user=user)
-    elif data['role'] == 'teacher':
-      TeacherProfile.objects.create(user=user)
+    if data.get('role') == Role.STUDENT:
+      StudentProfileModel.objects.create(user=user)
+    elif data.get('role') == Role.TEACHER:
+      TeacherProfileModel.objects.create(user=user)
 
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+  @action(
+    detail=False,
+    methods=['post'],
+    url_path='bulk',
+    parser_classes=[FastJSONParser, NDJSONParser],
+    permission_classes=[IsAuthenticated, IsAdminUser]
+  )
+  def bulk_create(self, request, *args, **kwargs):
+    """
+    Create many users from a JSON list or an NDJSON body. Valid rows are
+    written in one transaction; invalid rows are reported by index.
+    """
+    rows = request.data
+    if not isinstance(rows, list):
+      return Response({'detail': 'Expected a list of users.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > settings.BULK_USER_IMPORT_MAX_ROWS:
+      return Response(
+        {'detail': 'At most %d users can be imported per request.' % settings.BULK_USER_IMPORT_MAX_ROWS},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+
+    errors = {}
+    valid = {}
+    for index, row in enumerate(rows):
+      serializer = BulkUserSerializer(data=row)
+      if serializer.is_valid():
+        valid[index] = serializer.validated_data
+      else:
+        errors[index] = serializer.errors
+
+    self.reject_taken_emails(valid, errors)
+    while True:
+      try:
+        users = User.objects.bulk_create_users(list(valid.values())) if valid else []
+        break
+      except IntegrityError:
+        # Another request took some of the emails since they were checked.
+        if not self.reject_taken_emails(valid, errors):
+          raise
+
+    if not errors:
+      response_status = status.HTTP_201_CREATED
+    elif users:
+      response_status = status.HTTP_207_MULTI_STATUS
+    else:
+      response_status = status.HTTP_400_BAD_REQUEST
+
+    return Response({
+      'created': UserSerializer(users, many=True).data,
+      'errors': [
+        {'index': index, 'errors': errors[index]} for index in sorted(errors)
+      ]
+    }, status=response_status)
+
+  def reject_taken_emails(self, valid, errors):
+    """
+    Move the rows of `valid` whose email is taken, or repeated in the batch,
+    to `errors`, checking the whole batch with a single query. Returns
+    whether any row was rejected.
+    """
+    emails = {
+      index: User.objects.normalize_email(data['email'])
+      for index, data in valid.items()
+    }
+    # Read from the primary, which has the rows of concurrent requests.
+    users = User.objects.using(router.db_for_write(User))
+    taken = set(
+      users.filter(email__in=emails.values()).values_list('email', flat=True)
+    ) if emails else set()
+    seen = set()
+    rejected = False
+    for index, email in emails.items():
+      if email in taken or email in seen:
+        errors[index] = {'email': ['user with this email already exists.']}
+        del valid[index]
+        rejected = True
+      seen.add(email)
+    return rejected
+
+
+class UserExport(generics.GenericAPIView):
+  """
+  Streams every user with profile data and enrollments as CSV or NDJSON.
+  Rows are read in chunks, so memory stays flat and the first bytes are
+  sent before the whole table has been read.
+  """
+  queryset = User.objects.all()
+  permission_classes = [IsAuthenticated, IsAdminUser]
+  filter_backends = [DjangoFilterBackend]
+  filterset_class = UserFilter
+
+  streams = {
+    'csv': (stream_csv, 'text/csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+  }
+
+  def get(self, request, export_format, *args, **kwargs):
+    if export_format not in self.streams:
+      raise Http404
+    stream, content_type = self.streams[export_format]
+
+    queryset = get_export_queryset(self.filter_queryset(self.get_queryset()))
+    records = export_records(queryset, chunk_size=settings.EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(stream(records), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="users.%s"' % export_format
+    return response
+
+
+class UserSearch(generics.GenericAPIView):
+  """
+  Users ranked by how well their names, email or parents' names match `q`,
+  tolerating typos; each result carries its `score`. See `account.search`.
+  """
+  queryset = User.objects.all()
+  serializer_class = UserSearchSerializer
+  permission_classes = [IsAuthenticated, IsAdminUser]
+
+  def get(self, request, *args, **kwargs):
+    serializer = self.get_serializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    matches = search_users(serializer.validated_data['q'], serializer.validated_data['limit'])
+
+    queryset = self.get_queryset().filter(pk__in=[user_id for user_id, _ in matches])
+    rows = {row['id']: row for row in user_values.values(queryset, 'id')}
+    # Users deleted since they were matched are left out.
+    matches = [(user_id, score) for user_id, score in matches if user_id in rows]
+    results = user_values.to_representation([rows[user_id] for user_id, _ in matches])
+    for item, (_, score) in zip(results, matches):
+      item['score'] = round(score, 3)
+    return Response({'results': results})
+
+
+class CachedProfileMixin:
+  """
+  Serves the profile GET from the per-user response cache, answering
+  conditional requests from the cached validators. Writes are picked up
+  through the invalidation signals in `account.signals`. Cache misses are
+  read as a `values()` row and serialized through `values_serializer`.
+
+  Misses are read from the primary, not a replica: a row read from a
+  lagging replica would be cached under the new version and outlive the
+  lag by PROFILE_CACHE_TIMEOUT.
+  """
+  profile_model = None
+  profile_kind = None
+  values_serializer = None
+  vary_headers = ['Authorization']
+
+  def get_object(self):
+    return get_object_or_404(self.profile_model, user_id=self.request.user.pk)
+
+  def get_profile_row(self):
+    queryset = self.profile_model.objects.using(DEFAULT_DB_ALIAS).filter(user_id=self.request.user.pk)
+    row = self.values_serializer.values(queryset, 'id', 'modified').first()
+    if row is None:
+      raise Http404
+    return row
+
+  def retrieve(self, request, *args, **kwargs):
+    version, entry = profile_cache.get(self.profile_kind, request.user.pk)
+    cache_status = 'HIT'
+    if entry is None:
+      cache_status = 'MISS'
+      profile = self.get_profile_row()
+      etag = make_etag(self.profile_kind, profile['id'], profile['modified'])
+      not_modified = not_modified_response(request, etag, profile['modified'], self.vary_headers)
+      if not_modified is not None:
+        return not_modified
+
+      entry = {
+        'data': self.values_serializer.to_representation([profile], using=DEFAULT_DB_ALIAS)[0],
+        'etag': etag,
+        'last_modified': profile['modified'],
+      }
+      profile_cache.set(self.profile_kind, request.user.pk, version, entry)
+    else:
+      not_modified = not_modified_response(request, entry['etag'], entry['last_modified'], self.vary_headers)
+      if not_modified is not None:
+        not_modified['X-Cache'] = cache_status
+        return not_modified
+
+    response = Response(entry['data'])
+    response['X-Cache'] = cache_status
+    return set_validators(response, entry['etag'], entry['last_modified'], self.vary_headers)
 
-class TeacherProfile(generics.RetrieveUpdateAPIView):
+
+class TeacherProfile(CachedProfileMixin, generics.RetrieveUpdateAPIView):
   serializer_class = TeacherProfileSerializer
   permission_classes = [IsAuthenticated]
+  profile_model = TeacherProfileModel
+  profile_kind = Role.TEACHER
+  values_serializer = teacher_profile_values
 
-  def get_object(self):
-    return self.request.user.teacher_profile
+
+class TeacherRoster(generics.ListAPIView):
+  """
+  The authenticated teacher's students with their user fields and the
+  subjects they share with the teacher, in a fixed number of queries.
+  """
+  serializer_class = RosterStudentSerializer
+  permission_classes = [IsAuthenticated]
+  pagination_class = RosterPagination
+
+  def get_queryset(self):
+    teacher = get_object_or_404(TeacherProfileModel.objects.only('id'), user_id=self.request.user.pk)
+    shared_subjects = Subject.objects.filter(teacherprofile=teacher)
+    return teacher.students.select_related('user').prefetch_related(
+      Prefetch('subjects', queryset=shared_subjects, to_attr='shared_subjects')
+    ).annotate(
+      sort_last_name=Coalesce('user__last_name', Value('')),
+      sort_first_name=Coalesce('user__first_name', Value(''))
+    )
 
 
-class StudentProfile(generics.RetrieveUpdateAPIView):
+class StudentProfile(CachedProfileMixin, generics.RetrieveUpdateAPIView):
   serializer_class = StudentProfileSerializer
   permission_classes = [IsAuthenticated]
+  profile_model = StudentProfileModel
+  profile_kind = Role.STUDENT
+  values_serializer = student_profile_values
 
-  def get_object(self):
-    return self.request.user.student_profile
-  
\ No newline at end of file
+
+class EnrollmentDeltaMixin:
+  """
+  POST adds and DELETE removes only the submitted links, instead of
+  replacing the whole relation like a PATCH on the profile does.
+
+  Views set `profile_model` and `relation_name`, a many-to-many field of
+  it such as `subjects`, which is also the serializer field holding the
+  objects to link. The links are made from the authenticated user's own
+  profile unless `get_sources` is overridden.
+  """
+  profile_model = None
+  relation_name = None
+
+  def get_sources(self, validated_data):
+    return [get_object_or_404(self.profile_model, user_id=self.request.user.pk)]
+
+  def get_links(self, validated_data):
+    """Return `(relation, sources, targets)` for the submitted delta."""
+    assert self.profile_model is not None and self.relation_name is not None, (
+      "'%s' should include `profile_model` and `relation_name` attributes." % self.__class__.__name__
+    )
+    relation = getattr(self.profile_model, self.relation_name)
+    return relation, self.get_sources(validated_data), validated_data[self.relation_name]
+
+  def validate_links(self, relation, sources, targets):
+    """Called in the transaction that adds the links, before adding them."""
+    pass
+
+  def post(self, request, *args, **kwargs):
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    links = self.get_links(serializer.validated_data)
+    with transaction.atomic(using=router.db_for_write(links[0].through)):
+      self.validate_links(*links)
+      added = add_links(*links)
+    return Response({'added': added})
+
+  def delete(self, request, *args, **kwargs):
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    removed = remove_links(*self.get_links(serializer.validated_data))
+    return Response({'removed': removed})
+
+
+class ScheduleConflictMixin:
+  """Rejects subject enrollments that overlap the student's timetable."""
+
+  def validate_links(self, relation, sources, targets):
+    # Lock the profiles so concurrent enrollments of the same students are
+    # checked one after the other, each against the other's subjects.
+    list(
+      relation.field.model.objects.select_for_update()
+      .filter(pk__in=[source.pk for source in sources]).order_by('pk').values_list('pk', flat=True)
+    )
+    conflicts = find_schedule_conflicts(relation, sources, targets)
+    if conflicts:
+      raise ValidationError({'subjects': [
+        'Subject %s overlaps subject %s for student %s.' % (subject_id, other_subject_id, profile.pk)
+        for profile, subject_id, other_subject_id in conflicts
+      ]})
+
+
+class StudentSubjects(ScheduleConflictMixin, EnrollmentDeltaMixin, generics.GenericAPIView):
+  serializer_class = SubjectEnrollmentSerializer
+  permission_classes = [IsAuthenticated]
+  profile_model = StudentProfileModel
+  relation_name = 'subjects'
+
+
+class TeacherStudents(EnrollmentDeltaMixin, generics.GenericAPIView):
+  serializer_class = StudentAssignmentSerializer
+  permission_classes = [IsAuthenticated]
+  profile_model = TeacherProfileModel
+  relation_name = 'students'
+
+
+class Enrollments(ScheduleConflictMixin, EnrollmentDeltaMixin, generics.GenericAPIView):
+  """
+  Enrolls (or unenrolls) every submitted student in every submitted subject.
+  """
+  serializer_class = EnrollmentSerializer
+  permission_classes = [IsAuthenticated, IsAdminUser]
+  profile_model = StudentProfileModel
+  relation_name = 'subjects'
+
+  def get_sources(self, validated_data):
+    return validated_data['students']
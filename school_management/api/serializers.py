@@ -0,0 +1,56 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as BaseTokenObtainPairSerializer, \
+  TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from school_management.account.models import User
+
+
+def add_claims(token, user):
+  """The claims `ClaimsJWTAuthentication` builds a user from."""
+  token['role'] = user.role
+  token['is_staff'] = user.is_staff
+  token['is_superuser'] = user.is_superuser
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+  """
+  Adds the claims `ClaimsJWTAuthentication` needs to build a user without
+  querying the database on every request.
+  """
+
+  @classmethod
+  def get_token(cls, user):
+    token = super().get_token(user)
+    add_claims(token, user)
+    return token
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+  """
+  Re-reads the claims from the user row for every refreshed access token,
+  instead of copying the ones the refresh token was issued with, so a
+  demoted user loses staff access when their access token expires.
+  """
+
+  def validate(self, attrs):
+    refresh = self.token_class(attrs['refresh'])
+    user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}).first()
+    if user is None or not user.is_active:
+      raise AuthenticationFailed(_('User not found or inactive.'), code='user_inactive')
+    add_claims(refresh, user)
+
+    data = {'access': str(refresh.access_token)}
+    if api_settings.ROTATE_REFRESH_TOKENS:
+      if api_settings.BLACKLIST_AFTER_ROTATION:
+        try:
+          refresh.blacklist()
+        except AttributeError:
+          # The blacklist app is not installed.
+          pass
+      refresh.set_jti()
+      refresh.set_exp()
+      refresh.set_iat()
+      data['refresh'] = str(refresh)
+    return data
@@ -1,3 +1,34 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from school_management.account import Role, Sex
+from school_management.account.models import User
+
+
+class TokenRefreshTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "staff@example.com", "correct horse", is_staff=True, first_name="Ada", last_name="Staff",
+            sex=Sex.FEMALE, role=Role.TEACHER,
+        )
+        response = self.client.post(
+            reverse("token_obtain"), {"email": "staff@example.com", "password": "correct horse"}
+        )
+        self.refresh = response.json()["refresh"]
+        self.assertTrue(AccessToken(response.json()["access"])["is_staff"])
+
+    def refresh_access(self):
+        return self.client.post(reverse("token_refresh"), {"refresh": self.refresh})
+
+    def test_refreshed_claims_are_read_from_the_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=False, role=Role.STUDENT)
+        response = self.refresh_access()
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.json()["access"])
+        self.assertFalse(access["is_staff"])
+        self.assertEqual(access["role"], Role.STUDENT)
+
+    def test_deleted_user_cannot_refresh(self):
+        self.user.delete()
+        self.assertEqual(self.refresh_access().status_code, 401)
@@ -1,7 +1,14 @@
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from school_management.core.views import QueryLog
 
 urlpatterns = [
   path('account/', include('school_management.account.urls')),
-  path('token/', TokenObtainPairView.as_view(), name='token_obtain')
+  path('async/account/', include('school_management.account.async_urls')),
+  path('subject/', include('school_management.subject.urls')),
+  path('attendance/', include('school_management.attendance.urls')),
+  path('token/', TokenObtainPairView.as_view(), name='token_obtain'),
+  path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+  path('diagnostics/queries', QueryLog.as_view(), name='query-log')
 ]
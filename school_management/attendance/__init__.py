@@ -0,0 +1,21 @@
+class AttendanceStatus:
+    # Stored as small integers to keep attendance rows compact; the API
+    # uses the names.
+    PRESENT = 1
+    LATE = 2
+    ABSENT = 3
+    EXCUSED = 4
+
+    CHOICES = [
+        (PRESENT, "Present"),
+        (LATE, "Late"),
+        (ABSENT, "Absent"),
+        (EXCUSED, "Excused")
+    ]
+
+    NAMES = {
+        PRESENT: "present",
+        LATE: "late",
+        ABSENT: "absent",
+        EXCUSED: "excused"
+    }
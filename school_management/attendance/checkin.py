@@ -0,0 +1,49 @@
+"""
+Bulk check-in of a class session.
+
+A whole class is recorded with one multi-row `INSERT ... ON CONFLICT DO
+NOTHING RETURNING`, so records already taken for the session are skipped
+without a lookup, and the rows actually inserted are folded into the
+attendance rates in the same transaction.
+"""
+from django.conf import settings
+from django.db import NotSupportedError, connections, router, transaction
+
+from .models import Attendance
+from .rates import add_counts
+
+
+def check_in(subject_id, session_date, records, using=None):
+    """Record `(student_id, status)` pairs for a session of a subject.
+
+    Returns the number of records inserted; records of students already
+    checked in for the session are ignored.
+    """
+    using = using or router.db_for_write(Attendance)
+    connection = connections[using]
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise NotSupportedError("Check-in needs INSERT ... RETURNING.")
+
+    quote = connection.ops.quote_name
+    columns = ("student_id", "subject_id", "session_date", "status")
+    statement = "INSERT INTO %s (%s) VALUES %%s ON CONFLICT DO NOTHING RETURNING student_id, status" % (
+        quote(Attendance._meta.db_table), ", ".join(quote(column) for column in columns)
+    )
+    placeholder = "(%s)" % ", ".join(["%s"] * len(columns))
+    day = connection.ops.adapt_datefield_value(session_date)
+
+    records = list(records)
+    inserted = []
+    batch_size = settings.BULK_CREATE_BATCH_SIZE
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            cursor.execute(
+                statement % ", ".join([placeholder] * len(batch)),
+                [value for student_id, status in batch for value in (student_id, subject_id, day, status)]
+            )
+            inserted.extend(cursor.fetchall())
+        add_counts(
+            [(student_id, session_date, status) for student_id, status in inserted], using=using
+        )
+    return len(inserted)
@@ -0,0 +1,33 @@
+"""
+Command to create the attendance partitions of the upcoming terms.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from school_management.attendance.terms import ensure_partitions
+
+
+class Command(BaseCommand):
+  help = (
+    'Create the PostgreSQL partitions of the attendance table for the current and upcoming terms. '
+    'Run it ahead of every term, e.g. from cron.'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--ahead',
+      type=int,
+      default=None,
+      help='Number of terms after the current one to create; defaults to ATTENDANCE_PARTITIONS_AHEAD.'
+    )
+
+  def handle(self, *args, **options):
+    if connection.vendor != 'postgresql':
+      self.stdout.write('Only PostgreSQL partitions the attendance table, nothing to do.')
+      return
+
+    created = ensure_partitions(ahead=options['ahead'])
+    for name in created:
+      self.stdout.write('Created %s' % name)
+    self.stdout.write(self.style.SUCCESS('%d attendance partitions created.' % len(created)))
@@ -0,0 +1,31 @@
+"""
+Command to rebuild the attendance rates from the attendance records.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from school_management.attendance.rates import find_mismatches, rebuild_rates
+
+
+class Command(BaseCommand):
+  help = 'Recompute every attendance rate from scratch, or check the stored ones with --check.'
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--check',
+      action='store_true',
+      help='Only compare the rates maintained by check-ins with a full recomputation.'
+    )
+
+  def handle(self, *args, **options):
+    if options['check']:
+      mismatches = find_mismatches()
+      if mismatches:
+        for student_id, term in mismatches:
+          self.stdout.write('Mismatch for student %s in the term starting %s' % (student_id, term))
+        raise CommandError('%d attendance rates are out of date.' % len(mismatches))
+      self.stdout.write(self.style.SUCCESS('Attendance rates match the attendance records.'))
+      return
+
+    count = rebuild_rates()
+    self.stdout.write(self.style.SUCCESS('Rebuilt %d attendance rates.' % count))
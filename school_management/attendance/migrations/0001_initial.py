@@ -0,0 +1,96 @@
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from school_management.attendance.terms import partition_sql, terms
+
+# Range partitioned by session date, one partition per term plus a
+# default one; the columns are ordered widest first to avoid padding. The
+# primary key has to include the partition key.
+POSTGRESQL_ATTENDANCE = [
+    'CREATE TABLE "attendance_attendance" ('
+    '"id" bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY, '
+    '"student_id" bigint NOT NULL, '
+    '"subject_id" bigint NOT NULL, '
+    '"session_date" date NOT NULL, '
+    '"status" smallint NOT NULL CHECK ("status" >= 0), '
+    'PRIMARY KEY ("id", "session_date"), '
+    'CONSTRAINT "attendance_session_student_uniq" UNIQUE ("subject_id", "session_date", "student_id"), '
+    'CONSTRAINT "attendance_attendance_student_id_fk" FOREIGN KEY ("student_id") '
+    'REFERENCES "account_studentprofile" ("id") DEFERRABLE INITIALLY DEFERRED, '
+    'CONSTRAINT "attendance_attendance_subject_id_fk" FOREIGN KEY ("subject_id") '
+    'REFERENCES "subject_subject" ("id") DEFERRABLE INITIALLY DEFERRED'
+    ') PARTITION BY RANGE ("session_date")',
+    'CREATE INDEX "attendance_student_date_idx" ON "attendance_attendance" ("student_id", "session_date")',
+    'CREATE TABLE "attendance_attendance_default" PARTITION OF "attendance_attendance" DEFAULT',
+]
+
+
+def create_attendance(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(apps.get_model('attendance', 'Attendance'))
+        return
+    for statement in POSTGRESQL_ATTENDANCE:
+        schema_editor.execute(statement)
+    for start in terms(date.today(), settings.ATTENDANCE_PARTITIONS_AHEAD + 1):
+        for statement in partition_sql(start, schema_editor.connection):
+            schema_editor.execute(statement)
+
+
+def drop_attendance(apps, schema_editor):
+    # Drops the partitions with the table on PostgreSQL.
+    schema_editor.delete_model(apps.get_model('attendance', 'Attendance'))
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('subject', '0005_subject_duration'),
+        ('account', '0020_address_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('excused', models.PositiveIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rates', to='account.studentprofile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerate',
+            constraint=models.UniqueConstraint(fields=('term', 'student'), name='attendance_rate_term_student_uniq'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Attendance',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('session_date', models.DateField()),
+                        ('status', models.PositiveSmallIntegerField(choices=[(1, 'Present'), (2, 'Late'), (3, 'Absent'), (4, 'Excused')])),
+                        ('student', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='account.studentprofile')),
+                        ('subject', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='subject.subject')),
+                    ],
+                ),
+                migrations.AddIndex(
+                    model_name='attendance',
+                    index=models.Index(fields=['student', 'session_date'], name='attendance_student_date_idx'),
+                ),
+                migrations.AddConstraint(
+                    model_name='attendance',
+                    constraint=models.UniqueConstraint(fields=('subject', 'session_date', 'student'), name='attendance_session_student_uniq'),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_attendance, drop_attendance),
+    ]
@@ -0,0 +1,62 @@
+from django.db import models
+
+from school_management.account.models import StudentProfile
+from school_management.subject.models import Subject
+from . import AttendanceStatus
+
+
+class Attendance(models.Model):
+    """One student's attendance at one session of a subject.
+
+    Rows are only ever inserted, one per student, subject and session
+    date; the first record of a session wins. The status is a small
+    integer, and on PostgreSQL the columns are laid out widest first so
+    rows carry no alignment padding and the table is partitioned by term,
+    see `attendance.terms`.
+    """
+    # Both lead an index below, so the default foreign key indexes would
+    # only slow the inserts down.
+    student = models.ForeignKey(
+        StudentProfile, on_delete=models.CASCADE, related_name="attendance", db_index=False
+    )
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name="attendance", db_index=False)
+    session_date = models.DateField()
+    status = models.PositiveSmallIntegerField(choices=AttendanceStatus.CHOICES)
+
+    class Meta:
+        constraints = [
+            # Also serves the attendance of one class session.
+            models.UniqueConstraint(
+                fields=["subject", "session_date", "student"], name="attendance_session_student_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["student", "session_date"], name="attendance_student_date_idx"),
+        ]
+
+
+class AttendanceRate(models.Model):
+    """Attendance counts of one student over one term.
+
+    Kept current by `attendance.checkin.check_in` in the transaction that
+    records the attendance; see `attendance.rates`. Excused absences do
+    not count against the rate.
+    """
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="attendance_rates")
+    term = models.DateField()
+    present = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    excused = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["term", "student"], name="attendance_rate_term_student_uniq"),
+        ]
+
+    @property
+    def rate(self):
+        counted = self.present + self.late + self.absent
+        if not counted:
+            return None
+        return (self.present + self.late) / counted
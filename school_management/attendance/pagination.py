@@ -0,0 +1,8 @@
+from school_management.core.pagination import KeysetPagination
+
+
+class AttendanceRatePagination(KeysetPagination):
+  orderings = {
+    'student': ('student_id',),
+  }
+  default_ordering = 'student'
@@ -0,0 +1,106 @@
+"""
+Per-student, per-term attendance rates.
+
+Every check-in adds the counts of the rows it inserted to the students'
+`AttendanceRate` rows with one upsert, so dashboards read the rates
+without scanning attendance. `rebuild_rates` and `find_mismatches`
+recompute them from the attendance rows, one pass over a per-month
+aggregate.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+from . import AttendanceStatus
+from .models import Attendance, AttendanceRate
+from .terms import term_start
+
+COUNT_FIELDS = {
+    AttendanceStatus.PRESENT: "present",
+    AttendanceStatus.LATE: "late",
+    AttendanceStatus.ABSENT: "absent",
+    AttendanceStatus.EXCUSED: "excused",
+}
+
+
+def add_counts(rows, using="default"):
+    """Add `(student_id, session_date, status)` rows to the stored rates."""
+    counts = defaultdict(lambda: dict.fromkeys(COUNT_FIELDS.values(), 0))
+    for student_id, session_date, status in rows:
+        counts[(student_id, term_start(session_date))][COUNT_FIELDS[status]] += 1
+    if not counts:
+        return
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(AttendanceRate._meta.db_table)
+    fields = list(COUNT_FIELDS.values())
+    columns = ["student_id", "term", *fields]
+    values = [
+        [student_id, connection.ops.adapt_datefield_value(term), *[row[field] for field in fields]]
+        for (student_id, term), row in counts.items()
+    ]
+    batch_size = settings.BULK_CREATE_BATCH_SIZE
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+            cursor.execute(
+                "INSERT INTO %s (%s) VALUES %s ON CONFLICT (term, student_id) DO UPDATE SET %s" % (
+                    table,
+                    ", ".join(quote(column) for column in columns),
+                    ", ".join(["(%s)" % ", ".join(["%s"] * len(columns))] * len(batch)),
+                    ", ".join(
+                        "%s = %s.%s + EXCLUDED.%s" % (quote(field), table, quote(field), quote(field))
+                        for field in fields
+                    ),
+                ),
+                [value for row in batch for value in row]
+            )
+
+
+def compute_rates():
+    """Compute every rate from the attendance rows, keyed by `(student_id, term)`."""
+    rates = {}
+    months = (
+        Attendance.objects.annotate(month=TruncMonth("session_date"))
+        .values_list("student_id", "month", "status").annotate(count=Count("*")).order_by()
+    )
+    for student_id, month, status, count in months.iterator():
+        key = (student_id, term_start(month))
+        rate = rates.get(key)
+        if rate is None:
+            rate = rates[key] = AttendanceRate(student_id=student_id, term=key[1])
+        setattr(rate, COUNT_FIELDS[status], getattr(rate, COUNT_FIELDS[status]) + count)
+    return rates
+
+
+def rate_values(rate):
+    return tuple(getattr(rate, field) for field in COUNT_FIELDS.values())
+
+
+def rebuild_rates():
+    """Replace every stored rate with a full recomputation."""
+    rates = compute_rates()
+    with transaction.atomic():
+        AttendanceRate.objects.all().delete()
+        AttendanceRate.objects.bulk_create(rates.values(), batch_size=settings.BULK_CREATE_BATCH_SIZE)
+    return len(rates)
+
+
+def find_mismatches():
+    """The `(student_id, term)` keys whose stored rate differs from a recomputation."""
+    expected = compute_rates()
+    mismatches = []
+    for rate in AttendanceRate.objects.iterator():
+        key = (rate.student_id, rate.term)
+        computed = expected.pop(key, None)
+        if computed is None:
+            if any(rate_values(rate)):
+                mismatches.append(key)
+        elif rate_values(rate) != rate_values(computed):
+            mismatches.append(key)
+    mismatches.extend(expected)
+    return mismatches
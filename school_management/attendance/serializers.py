@@ -0,0 +1,50 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from school_management.core.serializers import InstrumentedModelSerializer, InstrumentedSerializer
+from . import AttendanceStatus
+from .models import AttendanceRate
+
+
+class CheckInSerializer(InstrumentedSerializer):
+  """
+  The students of one class session grouped by status, which keeps the
+  body of a class check-in small and cheap to validate.
+  """
+  session_date = serializers.DateField()
+  present = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+  late = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+  absent = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+  excused = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+
+  def validate(self, data):
+    records = [
+      (student_id, status)
+      for status, name in AttendanceStatus.NAMES.items()
+      for student_id in data[name]
+    ]
+    if not records:
+      raise serializers.ValidationError('No students submitted.')
+    if len(records) > settings.ATTENDANCE_CHECK_IN_MAX_RECORDS:
+      raise serializers.ValidationError(
+        'At most %d students can be checked in per request.' % settings.ATTENDANCE_CHECK_IN_MAX_RECORDS
+      )
+    if len({student_id for student_id, _ in records}) != len(records):
+      raise serializers.ValidationError('A student can only have one status per session.')
+    return {'session_date': data['session_date'], 'records': records}
+
+
+class AttendanceRateSerializer(InstrumentedModelSerializer):
+  rate = serializers.FloatField(read_only=True)
+
+  class Meta:
+    model = AttendanceRate
+    fields = [
+      'student',
+      'term',
+      'present',
+      'late',
+      'absent',
+      'excused',
+      'rate'
+    ]
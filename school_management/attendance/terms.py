@@ -0,0 +1,100 @@
+"""
+Terms and the PostgreSQL partitions of the attendance table.
+
+The year is split into terms of ATTENDANCE_TERM_MONTHS months starting in
+January. On PostgreSQL `attendance_attendance` is range partitioned by
+`session_date` with one partition per term, so queries on the current
+term never touch the indexes of old ones, and a default partition
+catches dates no partition covers yet. `ensure_partitions` creates the
+partitions of upcoming terms and moves any of their rows out of the
+default partition; `manage.py create_attendance_partitions` runs it.
+Other databases keep a single table.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db import connections, transaction
+
+TABLE = "attendance_attendance"
+
+DEFAULT_PARTITION = TABLE + "_default"
+
+
+def term_start(day):
+    """The first day of the term `day` falls in."""
+    months = settings.ATTENDANCE_TERM_MONTHS
+    return date(day.year, (day.month - 1) // months * months + 1, 1)
+
+
+def next_term(start):
+    month = start.month - 1 + settings.ATTENDANCE_TERM_MONTHS
+    return date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def terms(first, count):
+    """The starts of `count` terms from the one `first` falls in."""
+    start = term_start(first)
+    starts = []
+    for _ in range(count):
+        starts.append(start)
+        start = next_term(start)
+    return starts
+
+
+def partition_name(start):
+    return "%s_%s" % (TABLE, start.strftime("%Y%m%d"))
+
+
+def partition_sql(start, connection):
+    """Statements creating the partition of the term starting at `start`.
+
+    Rows of the term that went to the default partition are moved into
+    the new table before it is attached. The default partition stays
+    locked until the transaction ends, so no row of the term can be
+    inserted into it after the move.
+    """
+    quote = connection.ops.quote_name
+    end = next_term(start)
+    table, partition, default = quote(TABLE), quote(partition_name(start)), quote(DEFAULT_PARTITION)
+    return [
+        "CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)" % (partition, table),
+        "LOCK TABLE %s IN ACCESS EXCLUSIVE MODE" % default,
+        "WITH moved AS (DELETE FROM %s WHERE session_date >= '%s' AND session_date < '%s' RETURNING *) "
+        "INSERT INTO %s SELECT * FROM moved" % (default, start.isoformat(), end.isoformat(), partition),
+        "ALTER TABLE %s ATTACH PARTITION %s FOR VALUES FROM ('%s') TO ('%s')"
+        % (table, partition, start.isoformat(), end.isoformat()),
+    ]
+
+
+def existing_partitions(using="default"):
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [TABLE]
+        )
+        return {name for name, in cursor.fetchall()}
+
+
+def ensure_partitions(ahead=None, first=None, using="default"):
+    """Create the partitions of the current term and the `ahead` next ones.
+
+    Returns the names of the partitions created; a no-op on databases
+    other than PostgreSQL.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return []
+    ahead = settings.ATTENDANCE_PARTITIONS_AHEAD if ahead is None else ahead
+    existing = existing_partitions(using)
+    created = []
+    for start in terms(first or date.today(), ahead + 1):
+        if partition_name(start) in existing:
+            continue
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            for statement in partition_sql(start, connection):
+                cursor.execute(statement)
+        created.append(partition_name(start))
+    return created
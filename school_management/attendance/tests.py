@@ -0,0 +1,96 @@
+from datetime import date
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from school_management.account import Role, Sex
+from school_management.account.models import StudentProfile, TeacherProfile, User
+from school_management.subject.models import Subject
+from .models import Attendance, AttendanceRate
+from .rates import find_mismatches
+from .terms import DEFAULT_PARTITION, partition_sql, term_start
+
+
+class CheckInTests(TestCase):
+    def setUp(self):
+        self.subject = Subject.objects.create(name="Math", schedule=timezone.now())
+        self.students = []
+        for index in range(6):
+            student = StudentProfile.objects.create(user=self.create_user("student%d" % index, Role.STUDENT))
+            student.subjects.add(self.subject)
+            self.students.append(student)
+        teacher = TeacherProfile.objects.create(user=self.create_user("teacher", Role.TEACHER))
+        teacher.subjects.add(self.subject)
+        self.client = APIClient()
+        self.client.force_authenticate(teacher.user)
+        self.url = reverse("subject-check-in", args=[self.subject.pk])
+
+    def create_user(self, name, role):
+        return User.objects.create(
+            email="%s@example.com" % name, first_name=name, last_name="Attendance", sex=Sex.MALE, role=role
+        )
+
+    def check_in(self, **body):
+        return self.client.post(self.url, body, format="json")
+
+    def session(self, session_date="2026-02-03"):
+        ids = [student.pk for student in self.students]
+        return {
+            "session_date": session_date, "present": ids[:3], "late": ids[3:4], "absent": ids[4:5],
+            "excused": ids[5:],
+        }
+
+    def test_check_in(self):
+        response = self.check_in(**self.session())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"recorded": 6, "skipped": 0})
+        self.assertEqual(Attendance.objects.filter(subject=self.subject, session_date=date(2026, 2, 3)).count(), 6)
+        rate = AttendanceRate.objects.get(student=self.students[3], term=term_start(date(2026, 2, 3)))
+        self.assertEqual((rate.present, rate.late, rate.absent, rate.excused), (0, 1, 0, 0))
+
+    def test_repeated_check_in_skips_recorded_students(self):
+        self.check_in(**self.session())
+        # The first record of a session wins.
+        response = self.check_in(session_date="2026-02-03", absent=[student.pk for student in self.students])
+        self.assertEqual(response.json(), {"recorded": 0, "skipped": 6})
+        self.assertEqual(Attendance.objects.count(), 6)
+        self.assertEqual(AttendanceRate.objects.get(student=self.students[0]).absent, 0)
+
+    def test_students_not_enrolled_are_rejected(self):
+        outsider = StudentProfile.objects.create(user=self.create_user("outsider", Role.STUDENT))
+        response = self.check_in(session_date="2026-02-03", present=[self.students[0].pk, outsider.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["students"], ["Student %s is not enrolled in this subject." % outsider.pk])
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_only_the_subjects_teachers_check_in(self):
+        self.client.force_authenticate(self.students[0].user)
+        self.assertEqual(self.check_in(**self.session()).status_code, 403)
+
+    def test_rates_match_a_recomputation(self):
+        ids = [student.pk for student in self.students]
+        self.check_in(**self.session("2026-02-03"))
+        self.check_in(session_date="2026-02-05", absent=ids[:4], late=ids[4:])
+        self.check_in(**self.session("2026-02-05"))
+        self.check_in(session_date="2026-09-01", present=ids)
+        self.assertEqual(find_mismatches(), [])
+
+        self.client.force_authenticate(self.students[0].user)
+        response = self.client.get(reverse("student-attendance-rates", args=[ids[0]]))
+        self.assertEqual([rate["rate"] for rate in response.json()], [0.5, 1.0])
+
+        AttendanceRate.objects.filter(student_id=ids[0]).update(present=9)
+        self.assertEqual(len(find_mismatches()), 2)
+
+
+class PartitionTests(SimpleTestCase):
+    def test_default_partition_is_locked_before_rows_are_moved(self):
+        statements = partition_sql(date(2026, 1, 1), connection)
+        lock = "LOCK TABLE %s IN ACCESS EXCLUSIVE MODE" % connection.ops.quote_name(DEFAULT_PARTITION)
+        self.assertIn(lock, statements)
+        moves = [index for index, statement in enumerate(statements) if "DELETE FROM" in statement]
+        self.assertEqual(len(moves), 1)
+        self.assertLess(statements.index(lock), moves[0])
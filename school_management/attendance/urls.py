@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+  path('subjects/<int:subject_id>/check_in', views.SubjectCheckIn.as_view(), name='subject-check-in'),
+  path('students/<int:student_id>/rates', views.StudentAttendanceRates.as_view(), name='student-attendance-rates'),
+  path('rates', views.AttendanceRates.as_view(), name='attendance-rates')
+]
@@ -0,0 +1,91 @@
+from django.db.models import F, FloatField, Value
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import generics, status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from school_management.account.models import StudentProfile, TeacherProfile
+from school_management.subject.models import Subject
+from .checkin import check_in
+from .models import AttendanceRate
+from .pagination import AttendanceRatePagination
+from .serializers import AttendanceRateSerializer, CheckInSerializer
+from .terms import term_start
+
+
+class SubjectCheckIn(generics.GenericAPIView):
+  """
+  Records the attendance of a whole class session at once. Staff and the
+  subject's teachers can check in the students enrolled in the subject;
+  students already checked in for the session keep their first record.
+  """
+  serializer_class = CheckInSerializer
+  permission_classes = [IsAuthenticated]
+
+  def post(self, request, subject_id, *args, **kwargs):
+    subject = get_object_or_404(Subject.objects.only('id'), pk=subject_id)
+    if not request.user.is_staff and not TeacherProfile.subjects.through.objects.filter(
+      subject_id=subject.pk, teacherprofile__user_id=request.user.pk
+    ).exists():
+      raise PermissionDenied('Only the teachers of this subject can check students in.')
+
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    records = serializer.validated_data['records']
+
+    student_ids = [student_id for student_id, _ in records]
+    enrolled = set(StudentProfile.subjects.through.objects.filter(
+      subject_id=subject.pk, studentprofile_id__in=student_ids
+    ).values_list('studentprofile_id', flat=True))
+    if len(enrolled) != len(student_ids):
+      raise ValidationError({'students': [
+        'Student %s is not enrolled in this subject.' % student_id
+        for student_id in student_ids if student_id not in enrolled
+      ]})
+
+    recorded = check_in(subject.pk, serializer.validated_data['session_date'], records)
+    return Response({'recorded': recorded, 'skipped': len(records) - recorded}, status=status.HTTP_201_CREATED)
+
+
+class StudentAttendanceRates(generics.ListAPIView):
+  """A student's attendance rate in every term, for staff and the student."""
+  serializer_class = AttendanceRateSerializer
+  permission_classes = [IsAuthenticated]
+  pagination_class = None
+
+  def get_queryset(self):
+    student = get_object_or_404(StudentProfile.objects.only('id', 'user_id'), pk=self.kwargs['student_id'])
+    if not self.request.user.is_staff and student.user_id != self.request.user.pk:
+      raise PermissionDenied
+    return AttendanceRate.objects.filter(student_id=student.pk).order_by('term')
+
+
+class AttendanceRates(generics.ListAPIView):
+  """
+  Every student's attendance rate in a term (`term`, any date in it,
+  defaults to the current one). `max_rate` keeps the students at or below
+  that rate, to find the ones missing classes.
+  """
+  serializer_class = AttendanceRateSerializer
+  permission_classes = [IsAuthenticated, IsAdminUser]
+  pagination_class = AttendanceRatePagination
+
+  def get_queryset(self):
+    params = self.request.query_params
+    day = parse_date(params['term']) if params.get('term') else timezone.localdate()
+    if day is None:
+      raise ValidationError({'term': ['Expected a date, YYYY-MM-DD.']})
+    queryset = AttendanceRate.objects.filter(term=term_start(day))
+
+    if params.get('max_rate'):
+      try:
+        max_rate = float(params['max_rate'])
+      except ValueError:
+        raise ValidationError({'max_rate': ['Expected a number.']})
+      queryset = queryset.alias(
+        attended=F('present') + F('late'), counted=F('present') + F('late') + F('absent')
+      ).filter(counted__gt=0, attended__lte=F('counted') * Value(max_rate, output_field=FloatField()))
+    return queryset
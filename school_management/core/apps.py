@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    from .metrics import record_query
+
+    # Installed on the connection rather than per request so queries run
+    # from async views' worker threads are counted too.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
 
 
 class CoreConfig(AppConfig):
     name = 'school_management.core'
+
+    def ready(self):
+        connection_created.connect(install_query_recorder, dispatch_uid='core.install_query_recorder')
@@ -0,0 +1,145 @@
+"""
+Helpers for measuring the API under load.
+"""
+import http.client
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+SERVER_TIMING_QUERIES = re.compile(r'db;desc="(\d+) queries"')
+
+
+def percentile(values, fraction):
+  """Nearest-rank percentile of already sorted `values`."""
+  if not values:
+    return None
+  rank = max(math.ceil(fraction * len(values)) - 1, 0)
+  return values[rank]
+
+
+def queries_from_server_timing(header):
+  """The query count `PerformanceMiddleware` reported, or None."""
+  match = SERVER_TIMING_QUERIES.search(header or '')
+  return int(match.group(1)) if match else None
+
+
+def summarize(latencies, errors, elapsed, queries=()):
+  latencies = sorted(latencies)
+  milliseconds = lambda value: None if value is None else round(value * 1000, 2)
+  return {
+    'requests': len(latencies) + errors,
+    'errors': errors,
+    'seconds': round(elapsed, 3),
+    'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    'p50_ms': milliseconds(percentile(latencies, 0.50)),
+    'p95_ms': milliseconds(percentile(latencies, 0.95)),
+    'p99_ms': milliseconds(percentile(latencies, 0.99)),
+    'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+  }
+
+
+def run_requests(base_url, request_factory, requests, concurrency, timeout=30):
+  """
+  Send `requests` requests to the server at `base_url` from `concurrency`
+  keep-alive clients and return the throughput and latency percentiles.
+
+  `request_factory(index)` returns the `(method, path, body, headers)` of
+  the index-th request. Responses of 400 and above and connection failures
+  count as errors.
+  """
+  parts = urlsplit(base_url)
+  remaining = iter(range(requests))
+  lock = threading.Lock()
+  latencies = []
+  queries = []
+  errors = [0]
+
+  def client():
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+      while True:
+        with lock:
+          index = next(remaining, None)
+        if index is None:
+          return
+        method, path, body, headers = request_factory(index)
+        started = time.perf_counter()
+        query_count = None
+        try:
+          connection.request(method, path, body=body, headers=headers or {})
+          response = connection.getresponse()
+          response.read()
+          ok = response.status < 400
+          query_count = queries_from_server_timing(response.getheader('Server-Timing'))
+        except (OSError, http.client.HTTPException):
+          connection.close()
+          ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+          if ok:
+            latencies.append(elapsed)
+            if query_count is not None:
+              queries.append(query_count)
+          else:
+            errors[0] += 1
+    finally:
+      connection.close()
+
+  started = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as executor:
+    for future in [executor.submit(client) for _ in range(concurrency)]:
+      future.result()
+  return summarize(latencies, errors[0], time.perf_counter() - started, queries)
+
+
+def run_load(url, requests, concurrency, headers=None, timeout=30):
+  """Send `requests` GETs to `url`; see `run_requests`."""
+  parts = urlsplit(url)
+  path = parts.path or '/'
+  if parts.query:
+    path += '?' + parts.query
+  request = ('GET', path, None, headers)
+  return run_requests(url, lambda index: request, requests, concurrency, timeout)
+
+
+def compare_results(results, baseline, tolerance):
+  """
+  List the scenarios that regressed against `baseline`: latency percentiles
+  or throughput worse by more than `tolerance` (a fraction), more queries
+  per request or more errors.
+  """
+  regressions = []
+  for name, base in baseline.items():
+    current = results.get(name)
+    if current is None:
+      continue
+    for key in ('p50_ms', 'p95_ms'):
+      if base.get(key) and current.get(key) and current[key] > base[key] * (1 + tolerance):
+        regressions.append('%s: %s %.2f > baseline %.2f' % (name, key, current[key], base[key]))
+    if base.get('throughput') and current['throughput'] < base['throughput'] * (1 - tolerance):
+      regressions.append('%s: throughput %.1f < baseline %.1f' % (name, current['throughput'], base['throughput']))
+    if base.get('queries_per_request') is not None and current.get('queries_per_request') is not None \
+        and current['queries_per_request'] > base['queries_per_request']:
+      regressions.append('%s: %.2f queries per request > baseline %.2f' % (
+        name, current['queries_per_request'], base['queries_per_request']
+      ))
+    if current['errors'] > base.get('errors', 0):
+      regressions.append('%s: %d errors > baseline %d' % (name, current['errors'], base.get('errors', 0)))
+  return regressions
+
+
+def wait_for_port(host, port, timeout):
+  """Block until something accepts connections on `host:port`."""
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    try:
+      connection = http.client.HTTPConnection(host, port, timeout=1)
+      connection.connect()
+      connection.close()
+      return True
+    except OSError:
+      time.sleep(0.2)
+  return False
@@ -0,0 +1,39 @@
+"""
+Helpers for conditional GETs (ETag / Last-Modified / 304 Not Modified).
+
+Validators are built from `modified` timestamps that are already loaded,
+so a matching request is answered before anything is serialized.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """A strong ETag over the `repr` of `parts`."""
+    digest = hashlib.md5(repr(parts).encode("utf-8"))
+    return quote_etag(digest.hexdigest())
+
+
+def not_modified_response(request, etag, last_modified, vary=None):
+    """Return a 304 (or 412) response when the request's validators match.
+
+    `last_modified` is a datetime or None. Returns None when the full
+    response should be sent.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified, vary)
+    return response
+
+
+def set_validators(response, etag, last_modified, vary=None):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    if vary:
+        patch_vary_headers(response, vary)
+    return response
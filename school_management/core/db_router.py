@@ -0,0 +1,157 @@
+"""
+Read-replica routing.
+
+`ReplicaRoutingMiddleware` marks safe requests (GET, HEAD, OPTIONS) as
+allowed to read from a replica, and `ReplicaRouter` then sends reads of
+the models in `REPLICA_ROUTED_APPS` to one of the healthy
+`DATABASE_REPLICAS`. Everything else reads from the primary: writes,
+reads inside a transaction, code outside of a request, and requests made
+within `REPLICA_PIN_SECONDS` of the same client's last write, which are
+pinned to the primary through a cookie so users read their own writes
+while the replicas catch up.
+"""
+import asyncio
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, Error, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaHealth:
+  """Remembers whether each replica answered a probe in the last interval."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._checked = {}
+
+  def is_healthy(self, alias):
+    now = time.monotonic()
+    with self._lock:
+      checked = self._checked.get(alias)
+      if checked is not None and checked[0] > now:
+        return checked[1]
+
+    healthy = self.probe(alias)
+    with self._lock:
+      self._checked[alias] = (now + settings.REPLICA_HEALTH_CHECK_INTERVAL, healthy)
+    return healthy
+
+  def probe(self, alias):
+    # Replica aliases set a connect timeout in their OPTIONS, so a host
+    # that is down fails here quickly instead of holding up the request.
+    try:
+      with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+      return True
+    except Error:
+      # Reconnect on the next probe rather than reuse a broken connection.
+      connections[alias].close()
+      return False
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+  def db_for_read(self, model, **hints):
+    instance = hints.get('instance')
+    if instance is not None and instance._state.db:
+      # Follow relations on the database the instance came from.
+      return instance._state.db
+    if not _replica_reads.get() or model._meta.app_label not in settings.REPLICA_ROUTED_APPS:
+      return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+      return DEFAULT_DB_ALIAS
+    return choose_replica()
+
+  def db_for_write(self, model, **hints):
+    # Later reads in the same request must see this write.
+    _replica_reads.set(False)
+    return DEFAULT_DB_ALIAS
+
+  def allow_migrate(self, db, app_label, **hints):
+    # Replicas get their schema from the primary.
+    if settings.DATABASES[db].get('TEST', {}).get('MIRROR'):
+      return False
+    return None
+
+  def allow_relation(self, obj1, obj2, **hints):
+    databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+    if obj1._state.db in databases and obj2._state.db in databases:
+      return True
+    return None
+
+
+def choose_replica():
+  """A random healthy replica, or the primary when none is."""
+  replicas = list(settings.DATABASE_REPLICAS)
+  random.shuffle(replicas)
+  for alias in replicas:
+    if replica_health.is_healthy(alias):
+      return alias
+  return DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+  """
+  Lets safe requests read from the replicas unless the client wrote
+  recently, and pins clients to the primary for a short window after an
+  unsafe request.
+  """
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self._async_check()
+
+  def _async_check(self):
+    # Mark the instance as a coroutine function when in an async chain.
+    if asyncio.iscoroutinefunction(self.get_response):
+      self._is_coroutine = asyncio.coroutines._is_coroutine
+
+  def __call__(self, request):
+    if asyncio.iscoroutinefunction(self.get_response):
+      return self.__acall__(request)
+    token = _replica_reads.set(self.allows_replica_reads(request))
+    try:
+      response = self.get_response(request)
+    finally:
+      _replica_reads.reset(token)
+    return self.process_response(request, response)
+
+  async def __acall__(self, request):
+    token = _replica_reads.set(self.allows_replica_reads(request))
+    try:
+      response = await self.get_response(request)
+    finally:
+      _replica_reads.reset(token)
+    return self.process_response(request, response)
+
+  def allows_replica_reads(self, request):
+    if request.method not in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+      return False
+    try:
+      pinned_until = float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0))
+    except ValueError:
+      pinned_until = 0
+    return pinned_until <= time.time()
+
+  def process_response(self, request, response):
+    if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS:
+      pin_seconds = settings.REPLICA_PIN_SECONDS
+      response.set_cookie(
+        settings.REPLICA_PIN_COOKIE,
+        str(int(time.time() + pin_seconds)),
+        max_age=pin_seconds,
+        httponly=True,
+        samesite='Lax'
+      )
+    return response
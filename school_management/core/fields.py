@@ -0,0 +1,58 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+  """
+  Resolves the whole submitted list with the child's `to_internal_value_many`
+  instead of validating the items one by one.
+  """
+
+  def to_internal_value(self, data):
+    if isinstance(data, str) or not hasattr(data, '__iter__'):
+      self.fail('not_a_list', input_type=type(data).__name__)
+    if not self.allow_empty and len(data) == 0:
+      self.fail('empty')
+
+    return self.child_relation.to_internal_value_many(list(data))
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+  """
+  A primary key related field that, with `many=True`, fetches all submitted
+  objects with a single `filter(pk__in=...)` and reports every missing id at
+  once. The fetched instances are what the serializer hands to `save()`.
+  """
+  default_error_messages = {
+    'does_not_exist_many': 'Invalid pk(s) {pk_values} - object does not exist.',
+  }
+
+  @classmethod
+  def many_init(cls, *args, **kwargs):
+    list_kwargs = {'child_relation': cls(*args, **kwargs)}
+    for key in kwargs:
+      if key in MANY_RELATION_KWARGS:
+        list_kwargs[key] = kwargs[key]
+    return BulkManyRelatedField(**list_kwargs)
+
+  def to_internal_value_many(self, data):
+    queryset = self.get_queryset()
+    pk_model_field = queryset.model._meta.pk
+
+    pks = []
+    for item in data:
+      if self.pk_field is not None:
+        item = self.pk_field.to_internal_value(item)
+      try:
+        if isinstance(item, (bool, dict, list)):
+          raise TypeError
+        pks.append(pk_model_field.to_python(item))
+      except (TypeError, ValueError, DjangoValidationError):
+        self.fail('incorrect_type', data_type=type(item).__name__)
+
+    instances = queryset.in_bulk(set(pks))
+    missing = [pk for pk in dict.fromkeys(pks) if pk not in instances]
+    if missing:
+      self.fail('does_not_exist_many', pk_values=', '.join('"%s"' % pk for pk in missing))
+    return [instances[pk] for pk in pks]
@@ -0,0 +1,97 @@
+"""
+Command to compare the throughput of the gunicorn serving profiles.
+"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+from importlib.util import find_spec
+
+from django.core.management.base import BaseCommand, CommandError
+
+from school_management.core.benchmark import run_load, wait_for_port
+
+PROFILES = ['sync', 'gthread', 'uvicorn']
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 4))
+GUNICORN_CONFIG = os.path.join(PROJECT_ROOT, 'gunicorn.conf.py')
+
+
+class Command(BaseCommand):
+  help = 'Start gunicorn with each serving profile in turn and load test the same endpoint.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=PROFILES)
+    parser.add_argument('--path', default='/api/v1/account/users/', help='Endpoint to request.')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=int, default=50, help='Untimed requests sent first.')
+    parser.add_argument('--workers', type=int, help='Override the profile worker count.')
+    parser.add_argument('--token', help='Access token sent as a Bearer Authorization header.')
+    parser.add_argument('--config', default=GUNICORN_CONFIG)
+    parser.add_argument('--startup-timeout', type=float, default=30.0)
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+  def handle(self, *args, **options):
+    if not os.path.exists(options['config']):
+      raise CommandError('Gunicorn config %s does not exist.' % options['config'])
+    headers = {'Authorization': 'Bearer %s' % options['token']} if options['token'] else {}
+
+    results = {}
+    for profile in options['profiles']:
+      if profile == 'uvicorn' and find_spec('uvicorn') is None:
+        self.stderr.write(self.style.WARNING('Skipping uvicorn: the package is not installed.'))
+        continue
+      self.stderr.write('Benchmarking %s...' % profile)
+      results[profile] = self.benchmark(profile, headers, options)
+
+    if options['json']:
+      self.stdout.write(json.dumps(results, indent=2))
+      return
+
+    columns = ['throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'errors']
+    self.stdout.write('%-10s' % 'profile' + ''.join('%12s' % column for column in columns))
+    for profile, result in results.items():
+      self.stdout.write('%-10s' % profile + ''.join('%12s' % result[column] for column in columns))
+
+  def benchmark(self, profile, headers, options):
+    port = self.free_port()
+    env = dict(
+      os.environ,
+      GUNICORN_PROFILE=profile,
+      GUNICORN_BIND='127.0.0.1:%d' % port,
+      GUNICORN_ACCESS_LOG='',
+      GUNICORN_RELOAD='false',
+    )
+    if options['workers']:
+      env['GUNICORN_WORKERS'] = str(options['workers'])
+
+    server = subprocess.Popen(
+      [sys.executable, '-m', 'gunicorn', '--config', options['config']],
+      cwd=os.path.dirname(options['config']),
+      env=env,
+      stdout=subprocess.DEVNULL,
+      stderr=subprocess.DEVNULL,
+    )
+    try:
+      if not wait_for_port('127.0.0.1', port, options['startup_timeout']):
+        raise CommandError('Gunicorn did not start the %s profile in time.' % profile)
+      url = 'http://127.0.0.1:%d%s' % (port, options['path'])
+      if options['warmup']:
+        run_load(url, options['warmup'], options['concurrency'], headers)
+      result = run_load(url, options['requests'], options['concurrency'], headers)
+    finally:
+      server.send_signal(signal.SIGTERM)
+      try:
+        server.wait(timeout=30)
+      except subprocess.TimeoutExpired:
+        server.kill()
+    return result
+
+  def free_port(self):
+    with socket.socket() as sock:
+      sock.bind(('127.0.0.1', 0))
+      return sock.getsockname()[1]
@@ -0,0 +1,188 @@
+"""
+Per-request performance metrics.
+
+`PerformanceMiddleware` attaches a `RequestMetrics` to the sampled
+requests. Database queries, serializers and renderers add their time to
+it through `record_query`, `serializer_timer` and `add_render_time`, and
+`CompressionMiddleware` its savings through `record_compression`. The per-request totals are then
+aggregated per view name and method into the histograms of `registry`,
+which `/metrics` exposes in the Prometheus text format, summed over all
+worker processes. The same requests feed the slow query and N+1 log of
+`core.querylog`.
+"""
+import os
+from contextvars import ContextVar
+from time import perf_counter
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+from .querylog import observe_query
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+  __slots__ = ('query_count', 'query_time', 'serializer_time', 'serializer_stack', 'shapes', 'slow_queries',
+               'explaining', 'render_time', 'compression')
+
+  def __init__(self):
+    self.query_count = 0
+    self.query_time = 0.0
+    self.serializer_time = 0.0
+    # Class names of the serializers running, outermost first.
+    self.serializer_stack = []
+    # Query shape -> [count, total time, first serializer running it].
+    self.shapes = {}
+    self.slow_queries = []
+    self.explaining = False
+    self.render_time = 0.0
+    # (encoding, original bytes, compressed bytes, seconds) of the response.
+    self.compression = None
+
+
+def start_request():
+  """Start collecting for the current request; returns a reset token."""
+  return _current.set(RequestMetrics())
+
+
+def current_request():
+  """The metrics of the request being measured, or None."""
+  return _current.get()
+
+
+def finish_request(token):
+  metrics = _current.get()
+  _current.reset(token)
+  return metrics
+
+
+def record_query(execute, sql, params, many, context):
+  """`connection.execute_wrapper` callback counting the request's queries."""
+  metrics = _current.get()
+  if metrics is None or metrics.explaining:
+    return execute(sql, params, many, context)
+  started = perf_counter()
+  try:
+    result = execute(sql, params, many, context)
+  finally:
+    duration = perf_counter() - started
+    metrics.query_count += 1
+    metrics.query_time += duration
+  observe_query(metrics, sql, params, many, duration, context['connection'])
+  return result
+
+
+def add_render_time(duration):
+  metrics = _current.get()
+  if metrics is not None:
+    metrics.render_time += duration
+
+
+def record_compression(encoding, original_size, compressed_size, duration):
+  metrics = _current.get()
+  if metrics is not None:
+    metrics.compression = (encoding, original_size, compressed_size, duration)
+
+
+class serializer_timer:
+  """
+  Adds the time of the outermost nested serializer call to the request and
+  tracks which serializer is running. Takes the serializer or its name.
+  """
+  __slots__ = ('name', 'metrics', 'started')
+
+  def __init__(self, serializer):
+    self.name = serializer if isinstance(serializer, str) else type(serializer).__name__
+
+  def __enter__(self):
+    self.metrics = metrics = _current.get()
+    if metrics is not None:
+      if not metrics.serializer_stack:
+        self.started = perf_counter()
+      metrics.serializer_stack.append(self.name)
+
+  def __exit__(self, *exc_info):
+    metrics = self.metrics
+    if metrics is not None:
+      metrics.serializer_stack.pop()
+      if not metrics.serializer_stack:
+        metrics.serializer_time += perf_counter() - self.started
+
+
+class MetricsRegistry:
+  """
+  Labelled histograms and counters backed by `prometheus_client`.
+
+  A single process keeps them in memory. When PROMETHEUS_MULTIPROC_DIR is
+  set, as gunicorn.conf.py does for more than one worker, every process
+  writes its values to files in that directory and `render` merges the
+  files of all processes, so a scrape covers every worker whichever one
+  serves it.
+  """
+
+  def __init__(self):
+    self._definitions = {}
+    self._metrics = {}
+    self._registry = CollectorRegistry(auto_describe=True)
+
+  @property
+  def multiprocess(self):
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+  def histogram(self, name, documentation, buckets=DURATION_BUCKETS, labelnames=('view', 'method')):
+    self._define(name, Histogram, documentation, labelnames, buckets=buckets)
+
+  def counter(self, name, documentation, labelnames=()):
+    """Declare a counter; its samples are exposed as `<name>_total`."""
+    self._define(name, Counter, documentation, labelnames)
+
+  def _define(self, name, metric_class, documentation, labelnames, **kwargs):
+    self._definitions[name] = (metric_class, documentation, tuple(labelnames), kwargs)
+    self._metrics[name] = self._create(name)
+
+  def _create(self, name):
+    metric_class, documentation, labelnames, kwargs = self._definitions[name]
+    # In multiprocess mode the values are collected from the files instead.
+    registry = None if self.multiprocess else self._registry
+    return metric_class(name, documentation, labelnames, registry=registry, **kwargs)
+
+  def _child(self, name, labels):
+    metric = self._metrics[name]
+    return metric.labels(**labels) if labels else metric
+
+  def observe(self, name, labels, value):
+    self._child(name, labels).observe(value)
+
+  def inc(self, name, amount=1, labels=None):
+    self._child(name, labels).inc(amount)
+
+  def reset(self):
+    """Start every metric over; only meaningful in a single process."""
+    self._registry = CollectorRegistry(auto_describe=True)
+    for name in self._definitions:
+      self._metrics[name] = self._create(name)
+
+  def render(self):
+    if self.multiprocess:
+      registry = CollectorRegistry()
+      multiprocess.MultiProcessCollector(registry)
+    else:
+      registry = self._registry
+    return generate_latest(registry).decode('utf-8')
+
+
+registry = MetricsRegistry()
+registry.histogram('http_request_duration_seconds', 'Time spent handling the request.')
+registry.histogram('http_request_db_duration_seconds', 'Time spent in database queries per request.')
+registry.histogram('http_request_serializer_duration_seconds', 'Time spent in serializers per request.')
+registry.histogram('http_request_db_queries', 'Database queries per request.', QUERY_COUNT_BUCKETS)
+registry.histogram('http_request_render_duration_seconds', 'Time spent rendering the response body.')
+registry.histogram(
+  'http_response_compression_saved_bytes', 'Bytes saved by compressing the response body.', BYTES_BUCKETS
+)
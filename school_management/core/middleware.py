@@ -0,0 +1,259 @@
+import asyncio
+import random
+import zlib
+from time import perf_counter
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .metrics import current_request, finish_request, record_compression, registry, start_request
+from .querylog import flush_request
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+
+# Any other method is labelled OTHER, so clients cannot create label values.
+LABELLED_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+
+def request_labels(request):
+  match = request.resolver_match
+  return {
+    'view': match.view_name if match is not None else '<unmatched>',
+    'method': request.method if request.method in LABELLED_METHODS else 'OTHER',
+  }
+
+
+class PerformanceMiddleware:
+  """
+  Measures a sample of the requests: total time, database queries and
+  serializer time. The measurements are reported in a Server-Timing header
+  and aggregated into the metrics registry, and the request's slow and
+  repeated queries go to the query log. Requests outside the sample pass
+  straight through.
+  """
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self._async_check()
+
+  def _async_check(self):
+    # Mark the instance as a coroutine function when in an async chain.
+    if asyncio.iscoroutinefunction(self.get_response):
+      self._is_coroutine = asyncio.coroutines._is_coroutine
+
+  def __call__(self, request):
+    if asyncio.iscoroutinefunction(self.get_response):
+      return self.__acall__(request)
+    if not self.sampled():
+      return self.get_response(request)
+
+    token = start_request()
+    started = perf_counter()
+    try:
+      response = self.get_response(request)
+    finally:
+      metrics = finish_request(token)
+    return self.process_response(request, response, metrics, perf_counter() - started)
+
+  async def __acall__(self, request):
+    if not self.sampled():
+      return await self.get_response(request)
+
+    token = start_request()
+    started = perf_counter()
+    try:
+      response = await self.get_response(request)
+    finally:
+      metrics = finish_request(token)
+    return self.process_response(request, response, metrics, perf_counter() - started)
+
+  def sampled(self):
+    rate = settings.METRICS_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+  def process_response(self, request, response, metrics, duration):
+    labels = request_labels(request)
+    registry.observe('http_request_duration_seconds', labels, duration)
+    registry.observe('http_request_db_duration_seconds', labels, metrics.query_time)
+    registry.observe('http_request_serializer_duration_seconds', labels, metrics.serializer_time)
+    registry.observe('http_request_db_queries', labels, metrics.query_count)
+    registry.observe('http_request_render_duration_seconds', labels, metrics.render_time)
+    if metrics.compression is not None:
+      _, original_size, compressed_size, _ = metrics.compression
+      registry.observe('http_response_compression_saved_bytes', labels, original_size - compressed_size)
+    flush_request(request, metrics)
+
+    if settings.SERVER_TIMING_HEADER:
+      timings = [
+        'db;desc="%d queries";dur=%.2f' % (metrics.query_count, metrics.query_time * 1000),
+        'serializer;dur=%.2f' % (metrics.serializer_time * 1000),
+        'render;dur=%.2f' % (metrics.render_time * 1000),
+      ]
+      if metrics.compression is not None:
+        encoding, original_size, compressed_size, compression_time = metrics.compression
+        timings.append('compress;desc="%s %d to %d bytes";dur=%.2f' % (
+          encoding, original_size, compressed_size, compression_time * 1000
+        ))
+      timings.append('total;dur=%.2f' % (duration * 1000))
+      response['Server-Timing'] = ', '.join(timings)
+    return response
+
+
+def parse_accept_encoding(header):
+  """Map the content codings of an Accept-Encoding header to their quality."""
+  qualities = {}
+  for item in header.split(','):
+    coding, _, parameters = item.partition(';')
+    coding = coding.strip().lower()
+    if not coding:
+      continue
+    quality = 1.0
+    for parameter in parameters.split(';'):
+      name, _, value = parameter.partition('=')
+      if name.strip().lower() == 'q':
+        try:
+          quality = float(value)
+        except ValueError:
+          quality = 0.0
+    qualities[coding] = quality
+  return qualities
+
+
+def compress_brotli(content):
+  return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+def compress_brotli_sequence(sequence):
+  compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+  for item in sequence:
+    data = compressor.process(item) + compressor.flush()
+    if data:
+      yield data
+  yield compressor.finish()
+
+
+def compress_gzip_sequence(sequence):
+  # Django's compress_sequence only yields once the gzip buffer fills up;
+  # a sync flush per chunk hands every chunk to the client right away.
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+  for item in sequence:
+    data = compressor.compress(item) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    if data:
+      yield data
+  yield compressor.flush()
+
+
+class CompressionMiddleware:
+  """
+  Compresses response bodies with brotli or gzip, whichever the client
+  ranks higher in Accept-Encoding; brotli wins ties and is only offered
+  when the `brotli` package is installed. Bodies smaller than
+  COMPRESSION_MIN_SIZE or with a content type outside
+  COMPRESSION_CONTENT_TYPES are sent as they are.
+
+  Streaming responses are compressed chunk by chunk, flushing after each
+  one so clients keep receiving rows while the export runs. The bytes saved
+  are reported to the request metrics.
+  """
+  sync_capable = True
+  async_capable = True
+
+  compressors = {
+    'br': (compress_brotli, compress_brotli_sequence),
+    'gzip': (compress_string, compress_gzip_sequence),
+  }
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    self._async_check()
+
+  def _async_check(self):
+    if asyncio.iscoroutinefunction(self.get_response):
+      self._is_coroutine = asyncio.coroutines._is_coroutine
+
+  def __call__(self, request):
+    if asyncio.iscoroutinefunction(self.get_response):
+      return self.__acall__(request)
+    return self.process_response(request, self.get_response(request))
+
+  async def __acall__(self, request):
+    return self.process_response(request, await self.get_response(request))
+
+  def get_encoding(self, request):
+    qualities = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    encoding, best = None, 0.0
+    for candidate in self.encodings:
+      quality = qualities.get(candidate, qualities.get('*', 0.0))
+      if quality > best:
+        encoding, best = candidate, quality
+    return encoding
+
+  def is_compressible(self, response):
+    if response.has_header('Content-Encoding') or response.status_code in (204, 206, 304) \
+        or response.status_code < 200:
+      return False
+    content_type = response.get('Content-Type', '').partition(';')[0].strip().lower()
+    return any(
+      content_type.startswith(allowed) if allowed.endswith('/') else content_type == allowed
+      for allowed in settings.COMPRESSION_CONTENT_TYPES
+    )
+
+  def process_response(self, request, response):
+    if not self.is_compressible(response):
+      return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = self.get_encoding(request)
+    if encoding is None:
+      return response
+    compress, compress_stream = self.compressors[encoding]
+
+    if response.streaming:
+      labels = request_labels(request) if current_request() is not None else None
+      response.streaming_content = self.compress_stream(compress_stream, response.streaming_content, labels)
+      del response['Content-Length']
+    else:
+      content = response.content
+      if len(content) < settings.COMPRESSION_MIN_SIZE:
+        return response
+      started = perf_counter()
+      compressed = compress(content)
+      duration = perf_counter() - started
+      if len(compressed) >= len(content):
+        return response
+      record_compression(encoding, len(content), len(compressed), duration)
+      response.content = compressed
+      response['Content-Length'] = str(len(compressed))
+
+    # The compressed body is no longer byte-identical to the strong ETag.
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+      response['ETag'] = 'W/' + etag
+    response['Content-Encoding'] = encoding
+    return response
+
+  def compress_stream(self, compress_stream, chunks, labels):
+    """
+    Compress `chunks`, reporting the bytes saved once the stream ends when
+    `labels` is given; the request's metrics are gone by then.
+    """
+    original_size = [0]
+
+    def counted():
+      for chunk in chunks:
+        original_size[0] += len(chunk)
+        yield chunk
+
+    compressed_size = 0
+    for data in compress_stream(counted()):
+      compressed_size += len(data)
+      yield data
+    if labels is not None:
+      registry.observe('http_response_compression_saved_bytes', labels, original_size[0] - compressed_size)
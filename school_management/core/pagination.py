@@ -0,0 +1,197 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+  """
+  Cursor pagination that seeks on every ordering column, so fetching a deep
+  page costs the same as fetching the first one.
+
+  DRF's CursorPagination only seeks on the first ordering column and falls
+  back to an OFFSET for ties; here the cursor carries the full position and
+  each page is a single `WHERE (a, b, c) > (...) ORDER BY a, b, c LIMIT n`.
+  The last column of every ordering must be unique and none may be null;
+  coalesce nullable columns into an annotation and order on that.
+  """
+  cursor_query_param = 'cursor'
+  page_size_query_param = 'page_size'
+  ordering_query_param = 'ordering'
+  invalid_cursor_message = 'Invalid cursor'
+
+  # Maps the public ordering name to the model fields it sorts on.
+  orderings = {
+    'id': ('id',),
+  }
+  default_ordering = 'id'
+
+  def __init__(self):
+    self.page_size = settings.API_PAGE_SIZE
+    self.max_page_size = settings.API_MAX_PAGE_SIZE
+
+  def paginate_queryset(self, queryset, request, view=None):
+    page_queryset = self.get_page_queryset(queryset, request)
+    return self.paginate_rows(list(page_queryset))
+
+  def get_page_queryset(self, queryset, request):
+    """
+    Return the unevaluated queryset for the requested page, including one
+    extra row to tell whether another page follows.
+    """
+    self.request = request
+    self.base_url = request.build_absolute_uri()
+    self.page_size = self.get_page_size(request)
+    self.ordering = self.get_ordering(request)
+    self.cursor = self.decode_cursor(request, queryset)
+
+    fields = self.orderings[self.ordering]
+    reverse = bool(self.cursor and self.cursor['reverse'])
+    if self.cursor:
+      queryset = queryset.filter(self.get_keyset_filter(fields, self.cursor['position'], reverse))
+    if reverse:
+      queryset = queryset.order_by(*['-' + field for field in fields])
+    else:
+      queryset = queryset.order_by(*fields)
+    return queryset[:self.page_size + 1]
+
+  def paginate_rows(self, rows):
+    """Split the fetched rows into the page and its neighbouring cursors."""
+    has_more = len(rows) > self.page_size
+    page = rows[:self.page_size]
+    reverse = bool(self.cursor and self.cursor['reverse'])
+    if reverse:
+      page.reverse()
+
+    self.next_position = None
+    self.previous_position = None
+    if page:
+      if has_more or reverse:
+        self.next_position = self.get_position(page[-1])
+      if self.cursor and (has_more or not reverse):
+        self.previous_position = self.get_position(page[0])
+    self.page = page
+    return page
+
+  def get_paginated_response(self, data):
+    return Response(self.get_paginated_data(data))
+
+  def get_paginated_data(self, data):
+    return OrderedDict([
+      ('next', self.get_next_link()),
+      ('previous', self.get_previous_link()),
+      ('results', data),
+    ])
+
+  def get_paginated_response_schema(self, schema):
+    return {
+      'type': 'object',
+      'properties': {
+        'next': {'type': 'string', 'nullable': True},
+        'previous': {'type': 'string', 'nullable': True},
+        'results': schema,
+      },
+    }
+
+  def get_page_size(self, request):
+    if self.page_size_query_param:
+      try:
+        return _positive_int(
+          request.query_params[self.page_size_query_param],
+          strict=True,
+          cutoff=self.max_page_size
+        )
+      except (KeyError, ValueError):
+        pass
+    return min(self.page_size, self.max_page_size)
+
+  def get_ordering(self, request):
+    ordering = request.query_params.get(self.ordering_query_param, self.default_ordering)
+    if ordering not in self.orderings:
+      return self.default_ordering
+    return ordering
+
+  def get_keyset_filter(self, fields, position, reverse):
+    """
+    Expand `(f1, f2, ..., fn) > (v1, v2, ..., vn)` into an OR of prefix
+    equalities. The leading `f1 >= v1` term lets the database start an
+    index range scan at the cursor instead of filtering the whole index.
+    """
+    lookup = 'lt' if reverse else 'gt'
+    keyset = Q()
+    for index, field in enumerate(fields):
+      clause = Q(**{'%s__%s' % (field, lookup): position[index]})
+      for prefix_field, prefix_value in zip(fields[:index], position[:index]):
+        clause &= Q(**{prefix_field: prefix_value})
+      keyset |= clause
+    return Q(**{'%s__%se' % (fields[0], lookup): position[0]}) & keyset
+
+  def get_position(self, row):
+    fields = self.orderings[self.ordering]
+    if isinstance(row, dict):
+      return [row[field] for field in fields]
+    return [self._get_attribute(row, field) for field in fields]
+
+  def _get_attribute(self, row, field):
+    for attribute in field.split('__'):
+      row = getattr(row, attribute)
+    return row
+
+  def get_next_link(self):
+    if self.next_position is None:
+      return None
+    return self.encode_cursor(self.next_position, reverse=False)
+
+  def get_previous_link(self):
+    if self.previous_position is None:
+      return None
+    return self.encode_cursor(self.previous_position, reverse=True)
+
+  def decode_cursor(self, request, queryset):
+    encoded = request.query_params.get(self.cursor_query_param)
+    if encoded is None:
+      return None
+
+    fields = self.orderings[self.ordering]
+    try:
+      padded = encoded + '=' * (-len(encoded) % 4)
+      data = json.loads(urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+      position = data['p']
+      reverse = bool(data.get('r', False))
+      if data.get('o') != self.ordering or not isinstance(position, list) or len(position) != len(fields):
+        raise ValueError
+      # Tampered values must not reach the query.
+      position = [
+        self.get_ordering_field(queryset, field).to_python(value) for field, value in zip(fields, position)
+      ]
+      if None in position:
+        raise ValueError
+    except (TypeError, ValueError, KeyError, AttributeError, ValidationError):
+      raise NotFound(self.invalid_cursor_message)
+    return {'position': position, 'reverse': reverse}
+
+  def get_ordering_field(self, queryset, name):
+    """The model field, or the annotation's output field, an ordering sorts on."""
+    if name in queryset.query.annotations:
+      return queryset.query.annotations[name].output_field
+    model = queryset.model
+    *relations, name = name.split('__')
+    for relation in relations:
+      model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+  def encode_cursor(self, position, reverse):
+    data = {'o': self.ordering, 'p': position}
+    if reverse:
+      data['r'] = True
+    encoded = urlsafe_b64encode(
+      json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+    ).decode('ascii').rstrip('=')
+    return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -0,0 +1,58 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+
+def loads(data):
+  """Parse a JSON document with orjson when it is installed."""
+  if orjson is None:
+    return json.loads(data)
+  return orjson.loads(data)
+
+
+class FastJSONParser(JSONParser):
+  """
+  JSONParser that reads UTF-8 bodies with orjson when it is installed.
+  orjson rejects NaN and Infinity like DRF's strict mode; other encodings,
+  non-strict mode and installs without orjson use the standard library.
+  """
+
+  def parse(self, stream, media_type=None, parser_context=None):
+    encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+    if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+      return super().parse(stream, media_type, parser_context)
+    try:
+      return orjson.loads(stream.read())
+    except ValueError as exc:
+      raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class NDJSONParser(BaseParser):
+  """
+  Parses newline-delimited JSON into a list with one item per non-blank line.
+  """
+  media_type = 'application/x-ndjson'
+
+  def parse(self, stream, media_type=None, parser_context=None):
+    parser_context = parser_context or {}
+    encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+    decoded_stream = codecs.getreader(encoding)(stream)
+
+    items = []
+    for line_number, line in enumerate(decoded_stream, start=1):
+      line = line.strip()
+      if not line:
+        continue
+      try:
+        items.append(loads(line))
+      except ValueError as exc:
+        raise ParseError('NDJSON parse error on line %d - %s' % (line_number, str(exc)))
+    return items
@@ -0,0 +1,132 @@
+"""
+Slow query and N+1 detection for the requests sampled by
+`PerformanceMiddleware`.
+
+Queries slower than SLOW_QUERY_THRESHOLD_MS are kept with their EXPLAIN
+plan, and query shapes (the SQL with its parameters left out) repeated at
+least N_PLUS_ONE_THRESHOLD times in one request are flagged as N+1
+patterns. Both are attributed to the view and the innermost serializer
+running at the time and kept in a bounded in-process ring buffer.
+"""
+import re
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# `IN (%s, %s, ...)` lists of any length share one shape.
+PLACEHOLDER_LIST = re.compile(r'\((?:%s, )*%s\)')
+
+
+def query_shape(sql):
+  return PLACEHOLDER_LIST.sub('(%s...)', sql)
+
+
+class QueryLog:
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._entries = None
+
+  @property
+  def entries(self):
+    if self._entries is None:
+      self._entries = deque(maxlen=settings.QUERY_LOG_SIZE)
+    return self._entries
+
+  def add(self, entry):
+    with self._lock:
+      self.entries.append(entry)
+
+  def snapshot(self, kind=None):
+    """The logged entries, newest first."""
+    with self._lock:
+      entries = list(self.entries)
+    entries.reverse()
+    return [entry for entry in entries if kind is None or entry['kind'] == kind]
+
+  def clear(self):
+    with self._lock:
+      self.entries.clear()
+
+
+query_log = QueryLog()
+
+
+def observe_query(metrics, sql, params, many, duration, connection):
+  """Called for every query of a sampled request, after it succeeded."""
+  serializer = metrics.serializer_stack[-1] if metrics.serializer_stack else None
+  shape = query_shape(sql)
+  seen = metrics.shapes.get(shape)
+  if seen is None:
+    metrics.shapes[shape] = [1, duration, serializer]
+  else:
+    seen[0] += 1
+    seen[1] += duration
+    if seen[2] is None:
+      seen[2] = serializer
+
+  if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+    plan = None
+    if not many and len(metrics.slow_queries) < settings.SLOW_QUERY_MAX_EXPLAINS:
+      plan = explain(metrics, connection, sql, params)
+    metrics.slow_queries.append({
+      'sql': sql,
+      'duration_ms': round(duration * 1000, 2),
+      'serializer': serializer,
+      'database': connection.alias,
+      'plan': plan,
+    })
+
+
+def explain(metrics, connection, sql, params):
+  """The plan of a read query, without re-running it with ANALYZE."""
+  if not sql.lstrip()[:6].upper() == 'SELECT':
+    return None
+  metrics.explaining = True
+  try:
+    # A savepoint keeps a failing EXPLAIN from breaking the request's transaction.
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+      cursor.execute('%s %s' % (connection.ops.explain_query_prefix(), sql), params)
+      return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+  except Exception as exc:
+    return 'EXPLAIN failed: %s' % exc
+  finally:
+    metrics.explaining = False
+
+
+def handler_name(match):
+  func = match.func
+  # Django's views set `view_class`, DRF's viewsets `cls`.
+  handler = getattr(func, 'view_class', None) or getattr(func, 'cls', None) or func
+  return '%s.%s' % (handler.__module__, handler.__qualname__)
+
+
+def flush_request(request, metrics):
+  """Log the request's slow queries and repeated query shapes."""
+  if not metrics.slow_queries and not metrics.shapes:
+    return
+  match = request.resolver_match
+  context = {
+    'time': timezone.now().isoformat(),
+    'view': match.view_name if match is not None else None,
+    'handler': handler_name(match) if match is not None else None,
+    'method': request.method,
+    # Without the query string, which can carry search terms and emails.
+    'path': request.path,
+  }
+  for query in metrics.slow_queries:
+    query_log.add(dict(context, kind='slow', **query))
+
+  threshold = settings.N_PLUS_ONE_THRESHOLD
+  for shape, (count, duration, serializer) in metrics.shapes.items():
+    if count >= threshold:
+      query_log.add(dict(
+        context,
+        kind='n_plus_one',
+        sql=shape,
+        count=count,
+        duration_ms=round(duration * 1000, 2),
+        serializer=serializer,
+      ))
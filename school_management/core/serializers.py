@@ -0,0 +1,24 @@
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+from .metrics import serializer_timer
+
+
+class InstrumentedSerializerMixin:
+  """Reports the time spent serializing and validating to the request metrics."""
+
+  def to_representation(self, instance):
+    with serializer_timer(self):
+      return super().to_representation(instance)
+
+  def run_validation(self, data=empty):
+    with serializer_timer(self):
+      return super().run_validation(data)
+
+
+class InstrumentedSerializer(InstrumentedSerializerMixin, serializers.Serializer):
+  pass
+
+
+class InstrumentedModelSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
+  pass
@@ -1,3 +1,174 @@
-from django.test import TestCase
+import gzip
+import uuid
+import zlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, router, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from school_management.account import Sex
+from school_management.account.models import User
+from school_management.subject.models import Grade, Subject
+from .db_router import ReplicaRoutingMiddleware, replica_health
+from .metrics import registry
+from .middleware import CompressionMiddleware, request_labels
+from .renderers import FastJSONRenderer
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Routing between the primary and the dev settings' `replica` alias.
+
+    The replica is mirrored onto the test database. A TestCase would wrap
+    every read in a transaction, which the router keeps on the primary.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        replica_health._checked.clear()
+        self.addCleanup(replica_health._checked.clear)
+        self.user = User.objects.create(email="routed@example.com", first_name="Routed", sex=Sex.MALE)
+        self.factory = RequestFactory()
+
+    def handle(self, request, view):
+        """Run `view` behind the middleware; returns its result and the response."""
+        result = {}
+
+        def get_response(request):
+            result["value"] = view()
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return result["value"], response
+
+    def read(self):
+        return User.objects.get(pk=self.user.pk)._state.db
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self.handle(self.factory.get("/"), self.read)[0], "replica")
+        self.assertEqual(self.handle(self.factory.head("/"), self.read)[0], "replica")
+
+    def test_reads_outside_a_request_use_the_primary(self):
+        self.assertEqual(self.read(), DEFAULT_DB_ALIAS)
+
+    def test_unsafe_requests_and_writes_use_the_primary(self):
+        self.assertEqual(self.handle(self.factory.post("/"), self.read)[0], DEFAULT_DB_ALIAS)
+
+        def write_then_read():
+            User.objects.filter(pk=self.user.pk).update(first_name="Written")
+            return self.read()
+
+        self.assertEqual(self.handle(self.factory.get("/"), write_then_read)[0], DEFAULT_DB_ALIAS)
+
+    def test_clients_read_their_writes_from_the_primary(self):
+        _, response = self.handle(self.factory.post("/"), lambda: None)
+        cookie = response.cookies["primary_pin"]
+        self.assertTrue(cookie["httponly"])
+
+        request = self.factory.get("/")
+        request.COOKIES["primary_pin"] = cookie.value
+        self.assertEqual(self.handle(request, self.read)[0], DEFAULT_DB_ALIAS)
+
+        request = self.factory.get("/")
+        request.COOKIES["primary_pin"] = "0"
+        self.assertEqual(self.handle(request, self.read)[0], "replica")
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(connections["replica"], "cursor", side_effect=DatabaseError):
+            self.assertEqual(self.handle(self.factory.get("/"), self.read)[0], DEFAULT_DB_ALIAS)
+        # The failed check is remembered for REPLICA_HEALTH_CHECK_INTERVAL.
+        self.assertEqual(self.handle(self.factory.get("/"), self.read)[0], DEFAULT_DB_ALIAS)
+
+        replica_health._checked.clear()
+        self.assertEqual(self.handle(self.factory.get("/"), self.read)[0], "replica")
+
+    def test_transactions_read_from_the_primary(self):
+        def read_in_transaction():
+            with transaction.atomic():
+                return self.read()
+
+        self.assertEqual(self.handle(self.factory.get("/"), read_in_transaction)[0], DEFAULT_DB_ALIAS)
+
+    def test_related_reads_follow_the_instance(self):
+        def read_related():
+            user = User.objects.get(pk=self.user.pk)
+            return router.db_for_read(User, instance=user), user._state.db
+
+        self.assertEqual(self.handle(self.factory.get("/"), read_related)[0], ("replica", "replica"))
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_unknown_methods_share_one_label(self):
+        factory = RequestFactory()
+        self.assertEqual(request_labels(factory.get("/"))["method"], "GET")
+        self.assertEqual(request_labels(factory.generic("PROPFIND", "/"))["method"], "OTHER")
+        self.assertEqual(request_labels(factory.generic("X" * 1000, "/"))["method"], "OTHER")
+
+    def test_render(self):
+        registry.observe("http_request_db_queries", {"view": "user-list", "method": "GET"}, 3)
+        registry.inc("profile_cache_hits", 2)
+        rendered = registry.render()
+        self.assertIn('http_request_db_queries_count{method="GET",view="user-list"} 1.0', rendered)
+        self.assertIn('http_request_db_queries_bucket{le="5.0",method="GET",view="user-list"} 1.0', rendered)
+        self.assertIn("profile_cache_hits_total 2.0", rendered)
+
+
+class GradeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Grade
+        fields = ["id", "subject", "value", "created", "modified"]
+
+
+class RendererParityTests(TestCase):
+    def assertSameAsDRF(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_timestamped_model(self):
+        subject = Subject.objects.create(name="Parity", schedule=timezone.now())
+        grade = Grade.objects.create(subject=subject, value=Decimal("91.25"))
+        self.assertSameAsDRF(GradeSerializer(grade).data)
+        self.assertSameAsDRF([GradeSerializer(grade).data] * 2)
+
+    def test_raw_values(self):
+        # Rows of the values() fast paths reach the renderer unconverted.
+        self.assertSameAsDRF({
+            "created": datetime(2026, 10, 18, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            "modified": datetime(2026, 10, 18, 8, 30, tzinfo=dt_timezone(timedelta(hours=2))),
+            "naive": datetime(2026, 10, 18, 8, 30, 15),
+            "day": date(2026, 10, 18),
+            "value": Decimal("1.50"),
+            "uuid": uuid.UUID(int=1),
+            "text": "line\u2028separator",
+        })
+
+
+class CompressionTests(SimpleTestCase):
+    def test_gzip_stream_flushes_every_chunk(self):
+        chunks = [("row %d," % index).encode() * 10 for index in range(3)]
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks), content_type="text/csv")
+        )
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        response = middleware(request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        stream = iter(response.streaming_content)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parts = []
+        for chunk in chunks:
+            # Each chunk decodes completely before the next one is produced.
+            parts.append(next(stream))
+            self.assertEqual(decompressor.decompress(parts[-1]), chunk)
+        parts.extend(stream)
+        self.assertEqual(gzip.decompress(b"".join(parts)), b"".join(chunks))
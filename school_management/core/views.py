@@ -1,3 +1,41 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .metrics import registry
+from .querylog import query_log
+
+
+def metrics(request):
+  """
+  The request metrics in the Prometheus text exposition format, for
+  scrapers sending METRICS_TOKEN as a bearer token. Without a token
+  configured only staff signed in to the admin can read them.
+  """
+  if settings.METRICS_TOKEN:
+    expected = 'Bearer %s' % settings.METRICS_TOKEN
+    if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), expected):
+      return HttpResponseForbidden()
+  elif not request.user.is_staff:
+    return HttpResponseForbidden()
+  return HttpResponse(registry.render(), content_type=CONTENT_TYPE_LATEST)
+
+
+class QueryLog(APIView):
+  """
+  The slow queries and N+1 patterns seen in sampled requests, newest first.
+  `?kind=slow` or `?kind=n_plus_one` narrows the list; DELETE clears it.
+  """
+  permission_classes = [IsAuthenticated, IsAdminUser]
+
+  def get(self, request, *args, **kwargs):
+    return Response({'results': query_log.snapshot(request.query_params.get('kind'))})
+
+  def delete(self, request, *args, **kwargs):
+    query_log.clear()
+    return Response(status=status.HTTP_204_NO_CONTENT)
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'school_management.api',
     'school_management.subject',
     'school_management.core',
+    'school_management.attendance',
 
 
     # External apps
@@ -50,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'school_management.core.middleware.PerformanceMiddleware',
+    'school_management.core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'school_management.core.db_router.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'school_management.urls'
@@ -80,6 +84,106 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'school_management.wsgi.application'
 
+# Request metrics
+# Fraction of requests measured by PerformanceMiddleware; 0 turns it off.
+# Servers running several processes set PROMETHEUS_MULTIPROC_DIR so that
+# /metrics sums all of them (see gunicorn.conf.py).
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 1.0))
+
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() == 'true'
+
+# Bearer token required by /metrics; when unset only staff signed in to the
+# admin can read it.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Queries of sampled requests slower than this are logged with their plan,
+# at most SLOW_QUERY_MAX_EXPLAINS plans per request.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+
+SLOW_QUERY_MAX_EXPLAINS = 3
+
+# Query shapes repeated this many times in one request are logged as N+1.
+N_PLUS_ONE_THRESHOLD = 5
+
+# Entries kept by the query log.
+QUERY_LOG_SIZE = 500
+
+# Response compression
+# Smaller bodies are sent uncompressed; streaming responses are always
+# compressed.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+# Content types compressed by CompressionMiddleware; entries ending in "/"
+# match every subtype.
+COMPRESSION_CONTENT_TYPES = [
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'text/',
+]
+
+# 0-11; low qualities compress dynamic responses nearly as well as gzip
+# at a fraction of the time of the higher ones.
+COMPRESSION_BROTLI_QUALITY = 4
+
+# User search
+# Share of a query's trigrams a user has to match to be returned; lower
+# values tolerate more typos and return more noise.
+SEARCH_SIMILARITY_THRESHOLD = float(os.getenv('SEARCH_SIMILARITY_THRESHOLD', 0.5))
+
+# Misspelled matches ranked per query on SQLite; more find the right user
+# more often among common names, at about 1ms per 100.
+SEARCH_CANDIDATES = 1000
+
+SEARCH_MIN_LENGTH = 2
+
+SEARCH_DEFAULT_LIMIT = 20
+
+SEARCH_MAX_LIMIT = 100
+
+# Read replicas
+# The environment settings add replica aliases to DATABASES and list them
+# in DATABASE_REPLICAS; safe requests then read these apps' models from a
+# healthy replica.
+
+DATABASE_ROUTERS = ['school_management.core.db_router.ReplicaRouter']
+
+DATABASE_REPLICAS = []
+
+REPLICA_ROUTED_APPS = ['account', 'subject', 'attendance']
+
+# Seconds a client reads from the primary after a write, which should
+# cover the replication lag.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+REPLICA_PIN_COOKIE = 'primary_pin'
+
+# Seconds a replica health check result is reused.
+REPLICA_HEALTH_CHECK_INTERVAL = 10
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Share cached responses between workers and hosts by pointing REDIS_URL
+# at a Redis server; the profile cache then uses it by default. Gunicorn
+# turns the profile cache off when several workers would each keep their
+# own local copy (see gunicorn.conf.py).
+if os.getenv('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+PROFILE_CACHE_ALIAS = os.getenv('PROFILE_CACHE_ALIAS', 'shared' if 'shared' in CACHES else 'default')
+
+PROFILE_CACHE_TIMEOUT = 300
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -132,8 +236,63 @@ AUTHENTICATION_BACKENDS = [
     "django.contrib.auth.backends.ModelBackend",
 ]
 
+# Stateless mode builds request.user from the token claims instead of
+# loading the User row on every request. The claims are re-read on every
+# token refresh, so a role or staff change applies within one access token
+# lifetime.
+JWT_STATELESS_AUTH = os.getenv('JWT_STATELESS_AUTH', 'false').lower() == 'true'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'school_management.account.authentication.ClaimsJWTAuthentication'
+        if JWT_STATELESS_AUTH else
         'rest_framework_simplejwt.authentication.JWTAuthentication'
-    ]
-}
\ No newline at end of file
+    ],
+    # orjson backed when it is installed, DRF's renderer and parser otherwise.
+    'DEFAULT_RENDERER_CLASSES': [
+        'school_management.core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'school_management.core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Default page size of paginated endpoints and the hard cap for their
+# `page_size` query parameter.
+API_PAGE_SIZE = 50
+
+API_MAX_PAGE_SIZE = 500
+
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'school_management.api.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'school_management.api.serializers.TokenRefreshSerializer',
+}
+
+# Bulk user import
+
+BULK_USER_IMPORT_MAX_ROWS = int(os.getenv('BULK_USER_IMPORT_MAX_ROWS', 10000))
+
+BULK_CREATE_BATCH_SIZE = 1000
+
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
+
+# Number of users read per query (and per prefetch batch) by the exports.
+EXPORT_CHUNK_SIZE = 2000
+
+# Lower edges of the grade histogram buckets; the last bucket is open-ended.
+GRADE_HISTOGRAM_EDGES = list(range(0, 101, 5))
+
+# Attendance
+# Length of a term in months; it must divide 12. Attendance rates are
+# counted per term and, on PostgreSQL, attendance rows are partitioned by
+# term, so changing it needs a rates rebuild and new partitions.
+ATTENDANCE_TERM_MONTHS = 3
+
+# Terms after the current one whose partitions create_attendance_partitions
+# creates in advance.
+ATTENDANCE_PARTITIONS_AHEAD = 2
+
+ATTENDANCE_CHECK_IN_MAX_RECORDS = 1000
@@ -16,6 +16,21 @@ DATABASES = {
     }
 }
 
+# A second SQLite file standing in for a read replica, routed to when
+# SQLITE_REPLICA is set. Create it by copying db.sqlite3; it is not kept
+# in sync, which makes reads that were routed to it easy to spot. The
+# tests mirror it onto the test database.
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+    'TEST': {'MIRROR': 'default'},
+}
+
+DATABASE_REPLICAS = []
+
+if os.getenv('SQLITE_REPLICA', 'false').lower() == 'true':
+    DATABASE_REPLICAS = ['replica']
+
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'), os.path.join(BASE_DIR, 'static'),)
@@ -20,6 +20,23 @@ DATABASES = {
     }
 }
 
+# Comma separated hosts of streaming replicas of the database above.
+DATABASE_REPLICAS = []
+
+# Seconds to wait for a replica connection, so an unreachable replica
+# fails its health check quickly instead of stalling the request.
+REPLICA_CONNECT_TIMEOUT = int(os.getenv('REPLICA_CONNECT_TIMEOUT', 2))
+
+for index, host in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(','))):
+    alias = 'replica_%d' % index
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host.strip(),
+        OPTIONS={'connect_timeout': REPLICA_CONNECT_TIMEOUT},
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'), os.path.join(BASE_DIR, 'static'),)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SubjectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'school_management.subject'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,94 @@
+"""
+Command to generate a conflict-free timetable for all subjects.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from school_management.subject.models import Subject
+from school_management.subject.timetable import (
+  TimetableSolver,
+  apply_timetable,
+  build_slots,
+  load_problem,
+  next_monday,
+  synthetic_problem
+)
+
+
+class Command(BaseCommand):
+  help = 'Assign every subject a schedule slot so no teacher or student has two subjects at once.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--start', help='First day as YYYY-MM-DD (default: next Monday).')
+    parser.add_argument('--day-start', default='08:00', help='Time of the first period as HH:MM.')
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--periods', type=int, default=8, help='Periods per day.')
+    parser.add_argument('--period-minutes', type=int, default=60)
+    parser.add_argument('--time-budget', type=float, default=10.0, help='Seconds the search may run.')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--apply', action='store_true', help='Write the schedules to the subjects.')
+    parser.add_argument(
+      '--synthetic',
+      type=int,
+      metavar='SECTIONS',
+      help='Solve a generated school with this many sections instead of the database.'
+    )
+
+  def handle(self, *args, **options):
+    slot_times = self.get_slot_times(options)
+    if options['synthetic']:
+      if options['apply']:
+        raise CommandError('--apply cannot be used with --synthetic.')
+      problem = synthetic_problem(options['synthetic'], len(slot_times), seed=options['seed'])
+    else:
+      problem = load_problem(len(slot_times))
+      period_length = timedelta(minutes=options['period_minutes'])
+      if Subject.objects.filter(duration__gt=period_length).exists():
+        self.stdout.write(self.style.WARNING(
+          'Some subjects last longer than a period and may overlap the next slot.'
+        ))
+    self.stdout.write('Loaded %d sections, %d groups, %d conflict edges.' % (
+      len(problem), problem.group_count, problem.edge_count
+    ))
+
+    solver = TimetableSolver(
+      problem,
+      time_budget=options['time_budget'],
+      progress=self.report_progress,
+      seed=options['seed']
+    )
+    result = solver.solve()
+    self.stdout.write(json.dumps(result.metrics, indent=2))
+
+    if result.metrics['conflicts']:
+      self.stdout.write(self.style.WARNING(
+        '%d conflicts remain; add slots or raise --time-budget.' % result.metrics['conflicts']
+      ))
+    if options['apply']:
+      if result.metrics['conflicts']:
+        raise CommandError('Refusing to apply a timetable with conflicts.')
+      with transaction.atomic():
+        count = apply_timetable(result, slot_times)
+      self.stdout.write(self.style.SUCCESS('Scheduled %d subjects.' % count))
+
+  def get_slot_times(self, options):
+    try:
+      hour, minute = (int(part) for part in options['day_start'].split(':'))
+      if options['start']:
+        day = datetime.strptime(options['start'], '%Y-%m-%d')
+        start = timezone.make_aware(day.replace(hour=hour, minute=minute))
+      else:
+        start = next_monday(hour).replace(minute=minute)
+    except ValueError as exc:
+      raise CommandError(str(exc))
+    return build_slots(start, options['days'], options['periods'], timedelta(minutes=options['period_minutes']))
+
+  def report_progress(self, phase, iteration, conflicts, spread_cost):
+    self.stdout.write('  %s: iteration %d, %d conflicts, spread cost %d' % (
+      phase, iteration, conflicts, spread_cost
+    ))
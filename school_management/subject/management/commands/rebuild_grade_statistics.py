@@ -0,0 +1,31 @@
+"""
+Command to rebuild the grade statistics from the grades.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from school_management.subject.statistics import find_mismatches, rebuild_summaries
+
+
+class Command(BaseCommand):
+  help = 'Recompute every grade summary from scratch, or check the stored ones with --check.'
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--check',
+      action='store_true',
+      help='Only compare the incrementally maintained summaries with a full recomputation.'
+    )
+
+  def handle(self, *args, **options):
+    if options['check']:
+      mismatches = find_mismatches()
+      if mismatches:
+        for scope, key in mismatches:
+          self.stdout.write('Mismatch for %s %s' % (scope, key))
+        raise CommandError('%d grade summaries are out of date.' % len(mismatches))
+      self.stdout.write(self.style.SUCCESS('Grade summaries match the grades.'))
+      return
+
+    count = rebuild_summaries()
+    self.stdout.write(self.style.SUCCESS('Rebuilt %d grade summaries.' % count))
@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subject', '0002_grade'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(fields=['grade_level'], name='subject_grade_level_idx'),
+        ),
+    ]
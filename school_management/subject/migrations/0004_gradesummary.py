@@ -0,0 +1,31 @@
+# Generated by Django 4.1 on 2026-10-18 20:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subject', '0003_subject_grade_level_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade_level', models.CharField(blank=True, choices=[('elementary_grade_1', 'Elementary Grade 1'), ('elementary_grade_2', 'Elementary Grade 2'), ('junior_high_school_grade_7', 'Junior High School Grade 7'), ('senior_high_school_grade_11', 'Senior High School Grade 11')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('minimum', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('maximum', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('histogram', models.JSONField(default=list)),
+                ('subject', models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='grade_summary', to='subject.subject')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='gradesummary',
+            constraint=models.UniqueConstraint(condition=models.Q(('subject__isnull', True)), fields=('grade_level',), name='subject_gradesummary_grade_level_uniq'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1 on 2026-10-18 20:19
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subject', '0004_gradesummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subject',
+            name='duration',
+            field=models.DurationField(default=datetime.timedelta(seconds=3600)),
+        ),
+    ]
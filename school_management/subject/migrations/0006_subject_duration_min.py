@@ -0,0 +1,24 @@
+# Generated by Django 4.1 on 2026-10-18 21:37
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subject', '0005_subject_duration'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subject',
+            name='duration',
+            field=models.DurationField(default=datetime.timedelta(seconds=3600), validators=[django.core.validators.MinValueValidator(datetime.timedelta(seconds=60))]),
+        ),
+        migrations.AddConstraint(
+            model_name='subject',
+            constraint=models.CheckConstraint(check=models.Q(('duration__gte', datetime.timedelta(seconds=60))), name='subject_duration_min'),
+        ),
+    ]
@@ -1,3 +1,6 @@
+from datetime import timedelta
+
+from django.core.validators import MinValueValidator
 from django.db import models
 from model_utils.models import TimeStampedModel
 
@@ -7,10 +10,51 @@ from school_management.core import GradeLevel
 class Subject(models.Model):
     name = models.CharField(max_length=200, blank=False)
     schedule = models.DateTimeField()
+    duration = models.DurationField(default=timedelta(hours=1), validators=[MinValueValidator(timedelta(minutes=1))])
     course = models.CharField(max_length=100, blank=True)
     grade_level = models.CharField(choices=GradeLevel.CHOICES, max_length=50, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["grade_level"], name="subject_grade_level_idx"),
+        ]
+        constraints = [
+            # An empty or negative interval never overlaps anything.
+            models.CheckConstraint(check=models.Q(duration__gte=timedelta(minutes=1)), name="subject_duration_min"),
+        ]
+
+    @property
+    def ends(self):
+        return self.schedule + self.duration
+
 
 class Grade(TimeStampedModel):
     subject = models.OneToOneField(Subject, on_delete=models.PROTECT)
     value = models.DecimalField(max_digits=5, decimal_places=2)
+
+
+class GradeSummary(models.Model):
+    """Running statistics of the grades of one subject.
+
+    Rows with a null `subject` hold the totals of a whole grade level. The
+    rows are kept current by the `Grade` signals in `subject.signals`; see
+    `subject.statistics` for how they are updated and rebuilt.
+    """
+    subject = models.OneToOneField(
+        Subject, null=True, on_delete=models.CASCADE, related_name="grade_summary"
+    )
+    grade_level = models.CharField(choices=GradeLevel.CHOICES, max_length=50, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    minimum = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    maximum = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    histogram = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["grade_level"],
+                condition=models.Q(subject__isnull=True),
+                name="subject_gradesummary_grade_level_uniq",
+            ),
+        ]
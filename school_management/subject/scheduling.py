@@ -0,0 +1,65 @@
+"""
+Schedule conflict detection.
+
+A person's timetable is a set of half-open `[start, end)` intervals, one
+per subject. `IntervalIndex` answers "does this new subject overlap any of
+them?" in O(log n), and `find_conflicts` lists every overlapping pair of a
+set of subjects with a sweep line in O(n log n + k) for k conflicts.
+"""
+import heapq
+from bisect import bisect_left
+
+
+class IntervalIndex:
+    """Intervals sorted by start with the running maximum of their ends.
+
+    The prefix maximum lets a lookup check only one position, even if the
+    stored intervals already overlap each other.
+    """
+
+    def __init__(self, intervals=()):
+        self._entries = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self._starts = [entry[0] for entry in self._entries]
+        self._max_end = []
+        self._rebuild_prefix(0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _rebuild_prefix(self, position):
+        del self._max_end[position:]
+        for index in range(position, len(self._entries)):
+            if index and self._entries[self._max_end[index - 1]][1] >= self._entries[index][1]:
+                self._max_end.append(self._max_end[index - 1])
+            else:
+                self._max_end.append(index)
+
+    def find_overlap(self, start, end):
+        """Return a stored interval overlapping `[start, end)`, or None."""
+        position = bisect_left(self._starts, end)
+        if not position:
+            return None
+        candidate = self._entries[self._max_end[position - 1]]
+        return candidate if candidate[1] > start else None
+
+    def add(self, start, end, key=None):
+        position = bisect_left(self._starts, start)
+        self._entries.insert(position, (start, end, key))
+        self._starts.insert(position, start)
+        self._rebuild_prefix(position)
+
+
+def find_conflicts(intervals):
+    """Return every pair of keys whose `(start, end, key)` intervals overlap."""
+    conflicts = []
+    active = []
+    for start, end, key in sorted(intervals, key=lambda interval: (interval[0], interval[1])):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        conflicts.extend((other_key, key) for _, other_key in active)
+        heapq.heappush(active, (end, key))
+    return conflicts
+
+
+def subject_interval(subject):
+    return (subject.schedule, subject.ends, subject.pk)
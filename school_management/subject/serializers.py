@@ -0,0 +1,54 @@
+from rest_framework import serializers
+
+from school_management.core.serializers import InstrumentedModelSerializer
+from .models import GradeSummary, Subject
+from .statistics import mean, percentiles
+
+
+class SubjectSerializer(InstrumentedModelSerializer):
+  class Meta:
+    model = Subject
+    fields = [
+      'id',
+      'name',
+      'schedule',
+      'duration',
+      'course',
+      'grade_level'
+    ]
+
+
+class GradeSummarySerializer(InstrumentedModelSerializer):
+  mean = serializers.SerializerMethodField()
+  percentiles = serializers.SerializerMethodField()
+  histogram = serializers.SerializerMethodField()
+
+  class Meta:
+    model = GradeSummary
+    fields = [
+      'subject',
+      'grade_level',
+      'count',
+      'mean',
+      'minimum',
+      'maximum',
+      'percentiles',
+      'histogram'
+    ]
+
+  def get_mean(self, summary):
+    value = mean(summary)
+    return None if value is None else str(value)
+
+  def get_percentiles(self, summary):
+    return {
+      name: None if value is None else str(value)
+      for name, value in percentiles(summary).items()
+    }
+
+  def get_histogram(self, summary):
+    edges = self.context['bucket_edges']
+    return [
+      {'from': edge, 'count': count}
+      for edge, count in zip(edges, summary.histogram)
+    ]
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Grade, Subject
+from .statistics import apply_grade_change, move_subject_grades
+
+
+@receiver(pre_save, sender=Grade)
+def remember_previous_grade(sender, instance, raw=False, **kwargs):
+    instance._previous_grade = None
+    if instance.pk and not raw:
+        instance._previous_grade = Grade.objects.filter(pk=instance.pk).values_list(
+            "subject_id", "value"
+        ).first()
+
+
+@receiver(post_save, sender=Grade)
+def update_grade_statistics(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    value = sender._meta.get_field("value").to_python(instance.value)
+    previous = getattr(instance, "_previous_grade", None)
+    if previous is None:
+        apply_grade_change(instance.subject_id, added=value)
+    elif previous[0] != instance.subject_id:
+        apply_grade_change(previous[0], removed=previous[1])
+        apply_grade_change(instance.subject_id, added=value)
+    else:
+        apply_grade_change(instance.subject_id, added=value, removed=previous[1])
+
+
+@receiver(post_delete, sender=Grade)
+def remove_grade_statistics(sender, instance, **kwargs):
+    value = sender._meta.get_field("value").to_python(instance.value)
+    apply_grade_change(instance.subject_id, removed=value)
+
+
+@receiver(pre_save, sender=Subject)
+def remember_previous_grade_level(sender, instance, raw=False, **kwargs):
+    instance._previous_grade_level = None
+    if instance.pk and not raw:
+        instance._previous_grade_level = Subject.objects.filter(pk=instance.pk).values_list(
+            "grade_level", flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Subject)
+def move_grade_statistics(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, "_previous_grade_level", None)
+    if raw or created or previous is None or previous == instance.grade_level:
+        return
+    move_subject_grades(instance.pk, previous, instance.grade_level)
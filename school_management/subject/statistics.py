@@ -0,0 +1,252 @@
+"""
+Per-subject and per-grade-level grade statistics.
+
+Every `Grade` write adjusts the matching `GradeSummary` rows by the delta
+of that one grade, so reading a class average or distribution never scans
+the grades. Counts, totals and histogram buckets are exact; the minimum
+and maximum are recomputed from the grades only when the current extreme
+is removed, and percentiles are interpolated from the histogram.
+"""
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Min
+
+from .models import Grade, GradeSummary, Subject
+
+PERCENTILES = [25, 50, 75, 90]
+
+
+def get_bucket_edges():
+    return settings.GRADE_HISTOGRAM_EDGES
+
+
+def bucket_index(value, edges=None):
+    """Index of the histogram bucket `[edges[i], edges[i + 1])` holding `value`."""
+    edges = edges or get_bucket_edges()
+    return max(bisect_right(edges, value) - 1, 0)
+
+
+def _scopes(subject_id, grade_level):
+    return [
+        {"subject_id": subject_id},
+        {"subject__isnull": True, "grade_level": grade_level},
+    ]
+
+
+def _grades_in_scope(scope):
+    if "subject_id" in scope:
+        return Grade.objects.filter(subject_id=scope["subject_id"])
+    return Grade.objects.filter(subject__grade_level=scope["grade_level"])
+
+
+def _lock_summary(scope, grade_level):
+    summary = GradeSummary.objects.select_for_update().filter(**scope).first()
+    if summary is not None:
+        return summary
+    try:
+        with transaction.atomic():
+            return GradeSummary.objects.create(
+                subject_id=scope.get("subject_id"),
+                grade_level=grade_level,
+                histogram=[0] * len(get_bucket_edges()),
+            )
+    except IntegrityError:
+        # Another transaction created the row since the lookup.
+        return GradeSummary.objects.select_for_update().get(**scope)
+
+
+def _refresh_extremes(summary, scope):
+    extremes = _grades_in_scope(scope).aggregate(minimum=Min("value"), maximum=Max("value"))
+    summary.minimum = extremes["minimum"]
+    summary.maximum = extremes["maximum"]
+
+
+def apply_grade_change(subject_id, added=None, removed=None):
+    """Fold one grade change into the subject and grade level summaries.
+
+    `added` is the new value of a created or updated grade and `removed`
+    the previous value of an updated or deleted grade.
+    """
+    grade_level = Subject.objects.filter(pk=subject_id).values_list("grade_level", flat=True).first()
+    if grade_level is None:
+        return
+
+    edges = get_bucket_edges()
+    with transaction.atomic():
+        for scope in _scopes(subject_id, grade_level):
+            summary = _lock_summary(scope, grade_level)
+            if len(summary.histogram) != len(edges):
+                # The bucket layout changed; this row needs a full rebuild.
+                _rebuild_summary(summary, scope)
+                summary.save()
+                continue
+
+            if removed is not None:
+                summary.count -= 1
+                summary.total -= removed
+                summary.histogram[bucket_index(removed, edges)] -= 1
+                if summary.count == 0:
+                    summary.minimum = summary.maximum = None
+                elif removed in (summary.minimum, summary.maximum):
+                    _refresh_extremes(summary, scope)
+
+            if added is not None:
+                summary.count += 1
+                summary.total += added
+                summary.histogram[bucket_index(added, edges)] += 1
+                if summary.minimum is None or added < summary.minimum:
+                    summary.minimum = added
+                if summary.maximum is None or added > summary.maximum:
+                    summary.maximum = added
+
+            summary.save()
+
+
+def move_subject_grades(subject_id, old_level, new_level):
+    """Move the totals of a subject's grades between grade level summaries.
+
+    Called once the subject's `grade_level` has been saved as `new_level`.
+    The extremes of both levels are recomputed from their grades.
+    """
+    edges = get_bucket_edges()
+    with transaction.atomic():
+        subject_summary = GradeSummary.objects.select_for_update().filter(subject_id=subject_id).first()
+        if subject_summary is None:
+            return
+        subject_summary.grade_level = new_level
+        subject_summary.save(update_fields=["grade_level"])
+        if not subject_summary.count:
+            return
+
+        # Lock the level rows in a fixed order so opposite moves cannot deadlock.
+        for level in sorted({old_level, new_level}):
+            scope = {"subject__isnull": True, "grade_level": level}
+            summary = _lock_summary(scope, level)
+            if len(summary.histogram) != len(edges) or len(subject_summary.histogram) != len(edges):
+                _rebuild_summary(summary, scope)
+            else:
+                sign = 1 if level == new_level else -1
+                summary.count += sign * subject_summary.count
+                summary.total += sign * Decimal(subject_summary.total)
+                for index, bucket_count in enumerate(subject_summary.histogram):
+                    summary.histogram[index] += sign * bucket_count
+                _refresh_extremes(summary, scope)
+            summary.save()
+
+
+def _rebuild_summary(summary, scope):
+    edges = get_bucket_edges()
+    summary.count = 0
+    summary.total = Decimal(0)
+    summary.histogram = [0] * len(edges)
+    for value in _grades_in_scope(scope).values_list("value", flat=True).iterator():
+        summary.count += 1
+        summary.total += value
+        summary.histogram[bucket_index(value, edges)] += 1
+    _refresh_extremes(summary, scope)
+
+
+def compute_summaries():
+    """Compute every summary from scratch in one pass over the grades.
+
+    Returns a dict keyed by `("subject", subject_id)` and
+    `("grade_level", grade_level)`.
+    """
+    edges = get_bucket_edges()
+    summaries = {}
+    grades = Grade.objects.values_list("subject_id", "subject__grade_level", "value")
+    for subject_id, grade_level, value in grades.iterator():
+        for key, defaults in (
+            (("subject", subject_id), {"subject_id": subject_id}),
+            (("grade_level", grade_level), {"subject_id": None}),
+        ):
+            summary = summaries.get(key)
+            if summary is None:
+                summary = summaries[key] = GradeSummary(
+                    grade_level=grade_level, total=Decimal(0), histogram=[0] * len(edges), **defaults
+                )
+            summary.count += 1
+            summary.total += value
+            summary.histogram[bucket_index(value, edges)] += 1
+            if summary.minimum is None or value < summary.minimum:
+                summary.minimum = value
+            if summary.maximum is None or value > summary.maximum:
+                summary.maximum = value
+    return summaries
+
+
+def summary_key(summary):
+    if summary.subject_id is not None:
+        return ("subject", summary.subject_id)
+    return ("grade_level", summary.grade_level)
+
+
+def summary_values(summary):
+    return (
+        summary.grade_level,
+        summary.count,
+        Decimal(summary.total),
+        summary.minimum,
+        summary.maximum,
+        list(summary.histogram),
+    )
+
+
+def rebuild_summaries():
+    """Replace every stored summary with a full recomputation."""
+    summaries = compute_summaries()
+    with transaction.atomic():
+        GradeSummary.objects.all().delete()
+        GradeSummary.objects.bulk_create(summaries.values(), batch_size=settings.BULK_CREATE_BATCH_SIZE)
+    return len(summaries)
+
+
+def find_mismatches():
+    """Compare the stored summaries with a full recomputation.
+
+    Returns the keys whose stored values differ from the recomputed ones.
+    Empty summaries left behind by deletions count as matching.
+    """
+    expected = compute_summaries()
+    mismatches = []
+    for summary in GradeSummary.objects.iterator():
+        key = summary_key(summary)
+        computed = expected.pop(key, None)
+        if computed is None:
+            if summary.count:
+                mismatches.append(key)
+        elif summary_values(summary) != summary_values(computed):
+            mismatches.append(key)
+    mismatches.extend(expected)
+    return mismatches
+
+
+def mean(summary):
+    if not summary.count:
+        return None
+    return (Decimal(summary.total) / summary.count).quantize(Decimal("0.01"))
+
+
+def percentile(summary, rank):
+    """Approximate the `rank`-th percentile by interpolating within its bucket."""
+    if not summary.count:
+        return None
+    edges = get_bucket_edges()
+    target = summary.count * rank / 100
+    seen = 0
+    for index, bucket_count in enumerate(summary.histogram):
+        if bucket_count and seen + bucket_count >= target:
+            low = max(Decimal(edges[index]), summary.minimum)
+            high = Decimal(edges[index + 1]) if index + 1 < len(edges) else summary.maximum
+            high = min(high, summary.maximum)
+            fraction = Decimal(target - seen) / bucket_count
+            return (low + (high - low) * fraction).quantize(Decimal("0.01"))
+        seen += bucket_count
+    return summary.maximum
+
+
+def percentiles(summary):
+    return {"p%d" % rank: percentile(summary, rank) for rank in PERCENTILES}
@@ -1,3 +1,124 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
 from django.test import TestCase
+from django.utils import timezone
+
+from school_management.core import GradeLevel
+from .models import Grade, GradeSummary, Subject
+from .scheduling import IntervalIndex, find_conflicts
+from .statistics import find_mismatches, summary_key, summary_values
+
+
+class GradeStatisticsTests(TestCase):
+    """The incrementally maintained summaries always equal a full rebuild."""
+
+    def setUp(self):
+        self.subjects = [
+            Subject.objects.create(name="Subject %d" % index, schedule=timezone.now(), grade_level=level)
+            for index, level in enumerate([GradeLevel.ELEMENTARY_GRADE_1] * 2 + [GradeLevel.ELEMENTARY_GRADE_2] * 2)
+        ]
+
+    def assertSummariesMatchRebuild(self):
+        self.assertEqual(find_mismatches(), [])
+        call_command("rebuild_grade_statistics", "--check", stdout=StringIO())
+        stored = self.get_summaries(GradeSummary.objects.filter(count__gt=0))
+        call_command("rebuild_grade_statistics", stdout=StringIO())
+        self.assertEqual(stored, self.get_summaries(GradeSummary.objects.all()))
+
+    def get_summaries(self, queryset):
+        return {summary_key(summary): summary_values(summary) for summary in queryset}
+
+    def test_create(self):
+        for subject, value in zip(self.subjects, ["71.50", "88", "64.25", "100"]):
+            Grade.objects.create(subject=subject, value=Decimal(value))
+        self.assertSummariesMatchRebuild()
+        level = GradeSummary.objects.get(subject__isnull=True, grade_level=GradeLevel.ELEMENTARY_GRADE_1)
+        self.assertEqual((level.count, level.minimum, level.maximum), (2, Decimal("71.50"), Decimal("88")))
+
+    def test_update(self):
+        grades = [
+            Grade.objects.create(subject=subject, value=Decimal(60 + index))
+            for index, subject in enumerate(self.subjects)
+        ]
+        # Lowering the minimum, raising it again and replacing the maximum.
+        for grade, value in [(grades[0], "20"), (grades[0], "95"), (grades[1], "10")]:
+            grade.value = Decimal(value)
+            grade.save()
+        self.assertSummariesMatchRebuild()
+
+    def test_delete(self):
+        grades = [
+            Grade.objects.create(subject=subject, value=Decimal(50 + index * 10))
+            for index, subject in enumerate(self.subjects)
+        ]
+        grades[0].delete()
+        grades[3].delete()
+        self.assertSummariesMatchRebuild()
+        grades[1].delete()
+        self.assertSummariesMatchRebuild()
+
+    def test_move_grade_to_another_subject(self):
+        grade = Grade.objects.create(subject=self.subjects[0], value=Decimal("42"))
+        Grade.objects.create(subject=self.subjects[2], value=Decimal("77"))
+        grade.subject = self.subjects[3]
+        grade.save()
+        self.assertSummariesMatchRebuild()
+
+    def test_move_subject_between_grade_levels(self):
+        for subject, value in zip(self.subjects, ["55", "65", "75", "85"]):
+            Grade.objects.create(subject=subject, value=Decimal(value))
+        subject = self.subjects[0]
+        subject.grade_level = GradeLevel.ELEMENTARY_GRADE_2
+        subject.save()
+        self.assertSummariesMatchRebuild()
+        # Into a level that has no summary yet.
+        subject.grade_level = GradeLevel.SENIOR_HIGH_SCHOOL_GRADE_11
+        subject.save()
+        self.assertSummariesMatchRebuild()
+
+    def test_check_reports_mismatches(self):
+        Grade.objects.create(subject=self.subjects[0], value=Decimal("80"))
+        GradeSummary.objects.filter(subject=self.subjects[0]).update(count=5)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_grade_statistics", "--check", stdout=StringIO())
+
+
+class SchedulingTests(TestCase):
+    def interval(self, start, end, key):
+        day = datetime(2026, 9, 1)
+        return (day + timedelta(hours=start), day + timedelta(hours=end), key)
+
+    def test_find_conflicts(self):
+        intervals = [
+            self.interval(8, 10, "a"),
+            self.interval(9, 11, "b"),
+            # Touching intervals do not overlap.
+            self.interval(11, 12, "c"),
+            self.interval(7, 13, "d"),
+            self.interval(14, 15, "e"),
+        ]
+        self.assertCountEqual(
+            [frozenset(pair) for pair in find_conflicts(intervals)],
+            [frozenset(pair) for pair in ["ad", "ab", "bd", "cd"]],
+        )
+        self.assertEqual(find_conflicts([self.interval(8, 9, "a"), self.interval(9, 10, "b")]), [])
+        self.assertEqual(find_conflicts([]), [])
+
+    def test_interval_index_checks_the_longest_earlier_interval(self):
+        index = IntervalIndex([self.interval(7, 13, "long"), self.interval(8, 9, "short")])
+        self.assertEqual(index.find_overlap(*self.interval(10, 11, None)[:2])[2], "long")
+        self.assertIsNone(index.find_overlap(*self.interval(13, 14, None)[:2]))
+        index.add(*self.interval(14, 16, "late"))
+        self.assertEqual(index.find_overlap(*self.interval(15, 17, None)[:2])[2], "late")
 
-# Create your tests here.
+    def test_duration_must_be_at_least_a_minute(self):
+        subject = Subject(name="Empty", schedule=timezone.now(), duration=timedelta(0))
+        with self.assertRaises(ValidationError):
+            subject.full_clean()
+        with self.assertRaises(IntegrityError):
+            subject.save()
@@ -0,0 +1,332 @@
+"""
+Timetable generation.
+
+Sections (subjects) that share a teacher or a student must not share a
+time slot, which makes timetabling a graph colouring problem: sections are
+vertices, shared people are edges and slots are colours. The solver builds
+an initial timetable with DSatur, repairs any remaining clashes with a
+tabu min-conflicts search and then spends the rest of its time budget
+spreading the sections of each grade level evenly over the slots.
+"""
+import heapq
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from school_management.account.models import StudentProfile, TeacherProfile
+from .models import Subject
+
+PROGRESS_INTERVAL = 2000
+
+REPAIR_SAMPLE = 8
+
+
+class TimetableProblem:
+    """The sections to place, their grade levels and who they share."""
+
+    def __init__(self, sections, grade_levels, groups, slot_count):
+        """
+        `sections` are the section ids, `grade_levels` maps each id to its
+        grade level and `groups` is an iterable of section id collections
+        that must all be in different slots (one per teacher or student).
+        """
+        self.sections = list(sections)
+        self.slot_count = slot_count
+        index = {section: position for position, section in enumerate(self.sections)}
+
+        level_ids = {}
+        self.levels = [
+            level_ids.setdefault(grade_levels.get(section, ""), len(level_ids))
+            for section in self.sections
+        ]
+        self.level_count = len(level_ids)
+
+        neighbors = [set() for _ in self.sections]
+        self.group_count = 0
+        for group in {frozenset(group) for group in groups}:
+            members = [index[section] for section in group if section in index]
+            self.group_count += 1
+            for member in members:
+                neighbors[member].update(members)
+        for position, adjacent in enumerate(neighbors):
+            adjacent.discard(position)
+        self.neighbors = [tuple(adjacent) for adjacent in neighbors]
+        self.edge_count = sum(len(adjacent) for adjacent in self.neighbors) // 2
+
+    def __len__(self):
+        return len(self.sections)
+
+
+class TimetableResult:
+    def __init__(self, problem, slots, metrics):
+        self.problem = problem
+        self.slots = slots
+        self.metrics = metrics
+
+    def assignment(self):
+        """Map each section id to its slot index."""
+        return dict(zip(self.problem.sections, self.slots))
+
+
+class TimetableSolver:
+    def __init__(self, problem, time_budget=10.0, progress=None, seed=None):
+        """
+        `progress` is called as `progress(phase, iteration, conflicts,
+        spread_cost)` while the search runs.
+        """
+        self.problem = problem
+        self.time_budget = time_budget
+        self.progress = progress
+        self.random = random.Random(seed)
+
+    def solve(self):
+        started = time.monotonic()
+        self.deadline = started + self.time_budget
+        problem = self.problem
+
+        self.slots = [-1] * len(problem)
+        self.level_load = [[0] * problem.slot_count for _ in range(problem.level_count)]
+        self._construct()
+        construction_time = time.monotonic() - started
+
+        self.conflicts = [
+            sum(1 for other in problem.neighbors[section] if self.slots[other] == self.slots[section])
+            for section in range(len(problem))
+        ]
+        self.iterations = 0
+        self._repair()
+        self._spread()
+
+        metrics = self._metrics()
+        metrics["construction_seconds"] = round(construction_time, 3)
+        metrics["seconds"] = round(time.monotonic() - started, 3)
+        return TimetableResult(problem, list(self.slots), metrics)
+
+    def _report(self, phase):
+        if self.progress is not None and self.iterations % PROGRESS_INTERVAL == 0:
+            self.progress(phase, self.iterations, self.conflict_count(), self.spread_cost())
+
+    def conflict_count(self):
+        return sum(self.conflicts) // 2
+
+    def spread_cost(self):
+        return sum(load * load for loads in self.level_load for load in loads)
+
+    def spread_lower_bound(self):
+        bound = 0
+        for loads in self.level_load:
+            quotient, remainder = divmod(sum(loads), self.problem.slot_count)
+            bound += remainder * (quotient + 1) ** 2 + (self.problem.slot_count - remainder) * quotient ** 2
+        return bound
+
+    def _move(self, section, slot):
+        problem = self.problem
+        previous = self.slots[section]
+        level = problem.levels[section]
+        for other in problem.neighbors[section]:
+            other_slot = self.slots[other]
+            if other_slot == previous:
+                self.conflicts[other] -= 1
+                self.conflicts[section] -= 1
+            elif other_slot == slot:
+                self.conflicts[other] += 1
+                self.conflicts[section] += 1
+        self.level_load[level][previous] -= 1
+        self.level_load[level][slot] += 1
+        self.slots[section] = slot
+
+    def _slot_clashes(self, section):
+        clashes = [0] * self.problem.slot_count
+        for other in self.problem.neighbors[section]:
+            slot = self.slots[other]
+            if slot >= 0:
+                clashes[slot] += 1
+        return clashes
+
+    def _construct(self):
+        """DSatur: always place the section with the most distinct busy slots."""
+        problem = self.problem
+        saturation = [set() for _ in range(len(problem))]
+        heap = [(0, -len(problem.neighbors[section]), section) for section in range(len(problem))]
+        heapq.heapify(heap)
+
+        while heap:
+            negative_saturation, _, section = heapq.heappop(heap)
+            if self.slots[section] >= 0 or -negative_saturation != len(saturation[section]):
+                continue
+
+            clashes = self._slot_clashes(section)
+            loads = self.level_load[problem.levels[section]]
+            slot = min(range(problem.slot_count), key=lambda candidate: (clashes[candidate], loads[candidate]))
+            self.slots[section] = slot
+            loads[slot] += 1
+
+            for other in problem.neighbors[section]:
+                if self.slots[other] < 0 and slot not in saturation[other]:
+                    saturation[other].add(slot)
+                    heapq.heappush(heap, (-len(saturation[other]), -len(problem.neighbors[other]), other))
+
+    def _repair(self):
+        """Tabu search: move the best of a few sampled clashing sections.
+
+        Each step samples up to REPAIR_SAMPLE clashing sections and makes
+        the move with the largest clash reduction, even if it is a
+        worsening one; recently vacated slots are tabu for the section
+        unless the move beats the best timetable seen so far.
+        """
+        problem = self.problem
+        conflicted = [section for section in range(len(problem)) if self.conflicts[section]]
+        tabu = {}
+        total = self.conflict_count()
+        best_total = total
+
+        while total and time.monotonic() < self.deadline:
+            self.iterations += 1
+            best_move = None
+            for _ in range(REPAIR_SAMPLE):
+                if not conflicted:
+                    break
+                position = self.random.randrange(len(conflicted))
+                section = conflicted[position]
+                if not self.conflicts[section]:
+                    conflicted[position] = conflicted[-1]
+                    conflicted.pop()
+                    continue
+
+                clashes = self._slot_clashes(section)
+                current = self.slots[section]
+                for slot in range(problem.slot_count):
+                    if slot == current:
+                        continue
+                    delta = clashes[slot] - clashes[current]
+                    if tabu.get((section, slot), 0) > self.iterations and total + delta >= best_total:
+                        continue
+                    if best_move is None or delta < best_move[0] or (
+                        delta == best_move[0] and self.random.random() < 0.5
+                    ):
+                        best_move = (delta, section, slot)
+            if best_move is None:
+                continue
+
+            delta, section, slot = best_move
+            tabu[(section, self.slots[section])] = self.iterations + int(0.6 * total) + self.random.randrange(10)
+            self._move(section, slot)
+            total += delta
+            best_total = min(best_total, total)
+            for other in problem.neighbors[section]:
+                if self.slots[other] == slot:
+                    conflicted.append(other)
+            self._report("repair")
+
+    def _spread(self):
+        """Move sections to emptier slots of their grade level without clashes."""
+        problem = self.problem
+        if not len(problem) or self.conflict_count():
+            return
+        bound = self.spread_lower_bound()
+        cost = self.spread_cost()
+        stale = 0
+
+        while cost > bound and stale < 50 * len(problem) and time.monotonic() < self.deadline:
+            self.iterations += 1
+            stale += 1
+            section = self.random.randrange(len(problem))
+            loads = self.level_load[problem.levels[section]]
+            current = self.slots[section]
+            clashes = self._slot_clashes(section)
+            slot = min(
+                (candidate for candidate in range(problem.slot_count) if not clashes[candidate]),
+                key=lambda candidate: loads[candidate],
+            )
+            delta = 2 * (loads[slot] - loads[current] + 1)
+            if delta < 0:
+                self._move(section, slot)
+                cost += delta
+                stale = 0
+            self._report("spread")
+
+    def _metrics(self):
+        problem = self.problem
+        used = set(self.slots)
+        per_slot = defaultdict(int)
+        for slot in self.slots:
+            per_slot[slot] += 1
+        return {
+            "sections": len(problem),
+            "groups": problem.group_count,
+            "edges": problem.edge_count,
+            "slots": problem.slot_count,
+            "slots_used": len(used),
+            "max_sections_per_slot": max(per_slot.values(), default=0),
+            "conflicts": self.conflict_count(),
+            "spread_cost": self.spread_cost(),
+            "spread_lower_bound": self.spread_lower_bound(),
+            "iterations": self.iterations,
+        }
+
+
+def build_slots(start, days, periods_per_day, period_length):
+    """Slot start times for `days` consecutive days of equal periods from `start`."""
+    return [
+        start + timedelta(days=day) + period * period_length
+        for day in range(days)
+        for period in range(periods_per_day)
+    ]
+
+
+def load_problem(slot_count, queryset=None):
+    """Build a problem from the subjects and their teachers and students."""
+    queryset = queryset if queryset is not None else Subject.objects.all()
+    grade_levels = dict(queryset.values_list("id", "grade_level"))
+
+    groups = []
+    for relation in (TeacherProfile.subjects, StudentProfile.subjects):
+        through = relation.through
+        source = through._meta.get_field(relation.field.m2m_field_name()).attname
+        target = through._meta.get_field(relation.field.m2m_reverse_field_name()).attname
+        members = defaultdict(list)
+        for profile_id, subject_id in through.objects.values_list(source, target).iterator():
+            members[profile_id].append(subject_id)
+        groups.extend(members.values())
+
+    return TimetableProblem(grade_levels.keys(), grade_levels, groups, slot_count)
+
+
+def synthetic_problem(sections, slot_count, grade_levels=4, sections_per_teacher=5,
+                      cohorts_per_level=800, subjects_per_cohort=8, seed=None):
+    """A random school for benchmarking: teachers and student cohorts each
+    take sections of a single grade level."""
+    rng = random.Random(seed)
+    levels = {section: section % grade_levels for section in range(sections)}
+    by_level = defaultdict(list)
+    for section, level in levels.items():
+        by_level[level].append(section)
+
+    groups = []
+    for level_sections in by_level.values():
+        shuffled = level_sections[:]
+        rng.shuffle(shuffled)
+        for start in range(0, len(shuffled), sections_per_teacher):
+            groups.append(shuffled[start:start + sections_per_teacher])
+        for _ in range(cohorts_per_level):
+            groups.append(rng.sample(level_sections, min(subjects_per_cohort, len(level_sections))))
+    return TimetableProblem(range(sections), levels, groups, slot_count)
+
+
+def apply_timetable(result, slot_times):
+    """Write the slot start times to `Subject.schedule`."""
+    subjects = [
+        Subject(pk=section, schedule=slot_times[slot])
+        for section, slot in result.assignment().items()
+    ]
+    Subject.objects.bulk_update(subjects, ["schedule"], batch_size=1000)
+    return len(subjects)
+
+
+def next_monday(hour=8):
+    today = timezone.localdate()
+    monday = today + timedelta(days=(7 - today.weekday()) % 7 or 7)
+    return timezone.make_aware(datetime(monday.year, monday.month, monday.day, hour))
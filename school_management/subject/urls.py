@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+  path('<int:subject_id>/grade_statistics', views.SubjectGradeStatistics.as_view(), name='subject-grade-statistics'),
+  path(
+    'grade_levels/<str:grade_level>/grade_statistics',
+    views.GradeLevelGradeStatistics.as_view(),
+    name='grade-level-grade-statistics'
+  )
+]
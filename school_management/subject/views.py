@@ -1,3 +1,27 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
 
-# Create your views here.
+from .models import GradeSummary
+from .serializers import GradeSummarySerializer
+from .statistics import get_bucket_edges
+
+
+class GradeStatisticsMixin:
+  serializer_class = GradeSummarySerializer
+  permission_classes = [IsAuthenticated]
+
+  def get_serializer_context(self):
+    context = super().get_serializer_context()
+    context['bucket_edges'] = get_bucket_edges()
+    return context
+
+
+class SubjectGradeStatistics(GradeStatisticsMixin, generics.RetrieveAPIView):
+  def get_object(self):
+    return get_object_or_404(GradeSummary, subject_id=self.kwargs['subject_id'])
+
+
+class GradeLevelGradeStatistics(GradeStatisticsMixin, generics.RetrieveAPIView):
+  def get_object(self):
+    return get_object_or_404(GradeSummary, subject__isnull=True, grade_level=self.kwargs['grade_level'])
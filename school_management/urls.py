@@ -17,8 +17,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.decorators.csrf import csrf_exempt
 
+from school_management.core.views import metrics
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
-    path('api/v1/', include('school_management.api.urls'))
+    path('api/v1/', include('school_management.api.urls')),
+    path('metrics', metrics, name='metrics')
 ]